@@ -15,10 +15,15 @@ from app.deps.users import AuthorizeCurrentUser
 from app.core.constants import role_authen
 from app import crud
 from app.utils import upload_multiple_file
+from app.utils.image_variants import thumbnail
 from app.models.users import User
 from app.models.farms import Farms
 from app.schemas.farms import Farm as FarmSchema
 from app.schemas.farms import FarmCreate, FarmUpdate
+from app.schemas.request_params import RequestParamsFarm
+from app.schemas.responses import ResponsePagination
+from app.deps.request_params import parse_filter_search_params_farm
+from app.crud.pagination import count_pages, next_cursor
 from app.core.constants import role_key, resource_type
 
 # Awards
@@ -43,9 +48,7 @@ async def get_farm(
             status_code=404,
             detail="Farm not found.",
         )
-    response = {**farm}
-    response.update({"resources": await crud.farm.get_resources(session, farm_id, resource_type.FARM)})
-    return response
+    return farm
 
 @router.get(
     "/list",
@@ -53,11 +56,14 @@ async def get_farm(
 )
 async def list_farm(
     get_all: bool,
+    request_params: RequestParamsFarm = Depends(
+        parse_filter_search_params_farm(Farms)
+    ),
     session: AsyncSession = Depends(get_async_session),
     user: User = Depends(AuthorizeCurrentUser(role_authen.roles_all)),
 ):
     """
-    get farm by id
+    Get a page of farms, every farm with get_all (admin only)
     """
     current_user_role = await crud.user.get_role_by_id(
         session, user.role_id
@@ -73,21 +79,22 @@ async def list_farm(
                 status_code=404,
                 detail="User do not have permission.",
             )
-        farms = await crud.farm.get_farms_by_user_id(session, user.id)
+        farms, total = await crud.farm.list_farms(session, request_params, user.id)
     else:
         if current_user_role.key != role_key.ADMIN:
             raise HTTPException(
                 status_code=404,
                 detail="User do not have permission.",
             )
-        farms = await crud.farm.get_all_farms(session)
+        farms, total = await crud.farm.list_farms(session, request_params)
 
-    responses = []
-    for farm in farms:
-        response = {**farm}
-        response.update({"resources": await crud.farm.get_resources(session, farm.Farms.id, resource_type.FARM)})
-        responses.append(response)
-    return responses
+    return ResponsePagination(
+        page_total=count_pages(total, request_params.limit),
+        page_size=request_params.limit,
+        page=request_params.skip / request_params.limit + 1,
+        data=[{**farm, "thumbnail": thumbnail(farm.resources)} for farm in farms],
+        next_cursor=next_cursor(request_params, farms, "Farms"),
+    )
 
 @router.post(
     "",
@@ -116,6 +123,8 @@ async def create_farm(
     if files:
         resources = await upload_multiple_file(session, files, updated_by=user.id)
         await crud.farm.add_resources(session, resources, farm.id, resource_type.FARM)
+        await crud.farm.refresh_summary(session, [farm.id])
+        await session.commit()
         response.resources = resources
     return response
 
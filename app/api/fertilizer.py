@@ -12,13 +12,16 @@ from fastapi import (
 from sqlalchemy.ext.asyncio import AsyncSession
 from app import crud
 from app.utils import upload_multiple_file
+from app.utils.image_variants import thumbnail
 from app.deps.db import get_async_session
 from app.deps.request_params import parse_filter_search_params_fertilizers
 from app.deps.users import AuthorizeCurrentUser
-from app.core.constants import role_authen, resource_type
+from app.core.constants import role_authen, resource_type, rfid_type
 from app.models.users import User
 from app.models.fertilizers import Fertilizers
 from app.schemas.request_params import RequestParamsFertilizer
+from app.schemas.responses import ResponseImport
+from app.utils.bulk_import import ImportFormat, import_rows
 from app.schemas.fertilizers import (
     Fertilizer as FertilizerSchema,
     FertilizerCreate,
@@ -42,16 +45,16 @@ async def get_list_fertilizers(
     Get list fertilizers
     """
     fertilizers = await crud.fertilizer.list_fertilizer(session, request_params)
+    resources = await crud.fertilizer.get_resources_for_items(
+        session, [fertilizer.Fertilizers.id for fertilizer in fertilizers], resource_type.FERTILIZER
+    )
     responses = []
     for fertilizer in fertilizers:
         response = {**fertilizer}
-        response.update(
-            {
-                "resources": await crud.fertilizer.get_resources(
-                    session, fertilizer.Fertilizers.id, resource_type.FERTILIZER
-                )
-            }
-        )
+        response.update({
+            "resources": resources[fertilizer.Fertilizers.id],
+            "thumbnail": thumbnail(resources[fertilizer.Fertilizers.id]),
+        })
         responses.append(response)
     return responses
 
@@ -94,6 +97,32 @@ async def create_fertilizer(
     return response
 
 
+@router.post(
+    "/import",
+    name=f"{name}:import",
+    response_model=ResponseImport,
+)
+async def import_fertilizers(
+    file: UploadFile = File(...),
+    format: ImportFormat = "csv",
+    session: AsyncSession = Depends(get_async_session),
+    user: User = Depends(AuthorizeCurrentUser(role_authen.roles_owner)),
+) -> Any:
+    """
+    Import fertilizers from a CSV or NDJSON file, one fertilizer per row.
+    Invalid rows are skipped and listed in the report.
+    """
+    return await import_rows(
+        session,
+        file,
+        format,
+        FertilizerCreate,
+        lambda db, objs_in: crud.fertilizer.create_many(
+            db, objs_in, rfid_type.FERTILIZER, updated_by=user.id
+        ),
+    )
+
+
 @router.get(
     "/{fertilizer_id}",
     name=f"{name}:one",
@@ -140,6 +169,8 @@ async def update_fertilizer_by_id(
     fertilizer = await crud.fertilizer.update(
         session, fertilizer, fertilizer_in, updated_by=user.id
     )
+    await crud.farm.refresh_summary_by_fertilizer(session, fertilizer.id)
+    await session.commit()
     return fertilizer
 
 
@@ -164,4 +195,6 @@ async def delete_fertilizer_by_id(
             detail="The fertilizer not found."
         )
     await crud.fertilizer.delete(session, fertilizer, updated_by=user.id)
+    await crud.farm.refresh_summary_by_fertilizer(session, fertilizer_id)
+    await session.commit()
     return "The fertilizer deleted successfully!"
\ No newline at end of file
@@ -1,17 +1,22 @@
 from decimal import Decimal
-import math
 from typing import Any, List, Optional
 import uuid
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+import json
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.product_history import ProductHistory
 from app.schemas.request_params import RequestParamsProduct, RequestParamsProductHistory
 from app.deps.request_params import parse_filter_search_params_product, parse_filter_search_params_product_history
 from app import crud
+from app.crud.pagination import count_pages, next_cursor
 from app.utils import upload_multiple_file
+from app.utils.image_variants import thumbnail
+from app.utils.export import ExportFormat, export_response
 from app.deps.db import get_async_session
 from app.deps.users import AuthorizeCurrentUser
-from app.core.constants import role_authen, resource_type
+from app.core.config import settings
+from app.core.constants import role_authen, resource_type, rfid_type
 from app.models.users import User
 from app.models.products import Products
 from app.schemas.products import (
@@ -19,7 +24,8 @@ from app.schemas.products import (
     ProductCreate,
     ProductUpdate
 )
-from app.schemas.responses import ResponsePagination
+from app.schemas.responses import ResponseImport, ResponsePagination
+from app.utils.bulk_import import ImportFormat, import_rows
 
 name = "product"
 router = APIRouter(prefix=f"/{name}s")
@@ -39,26 +45,64 @@ async def get_list_products(
     """
     Get list products
     """
-    total = await crud.product.total_products(session, user.id, request_params)
-    products = await crud.product.list_products(session, user.id, request_params)
+    products, total = await crud.product.list_products(session, user.id, request_params)
+    resources = await crud.product.get_resources_for_items(
+        session, [product.Products.id for product in products], resource_type.PRODUCT
+    )
     responses = []
     for product in products:
         response = {**product}
-        response.update({"resources": await crud.product.get_resources(session, product.Products.id, resource_type.PRODUCT)})
+        response.update({
+            "resources": resources[product.Products.id],
+            "thumbnail": thumbnail(resources[product.Products.id]),
+        })
         responses.append(response)
 
-    if not responses:
-        page_total = 1
-    else:
-        page_total = math.ceil(total/ request_params.limit)
-
     return ResponsePagination(
-        page_total=page_total,
+        page_total=count_pages(total, request_params.limit),
         page_size=request_params.limit,
         page=request_params.skip / request_params.limit + 1,
         data=responses,
+        next_cursor=next_cursor(request_params, products, "Products"),
     )
 
+@router.get(
+    "/export",
+    name=f"{name}:export",
+)
+async def export_products(
+    format: ExportFormat = "csv",
+    request_params: RequestParamsProduct = Depends(
+        parse_filter_search_params_product(Products)
+    ),
+    session: AsyncSession = Depends(get_async_session),
+    user: User = Depends(AuthorizeCurrentUser(role_authen.roles_all))
+) -> Any:
+    """
+    Export all products matching the list filters as CSV or NDJSON
+    """
+    query = await crud.product.query_products(session, user.id, request_params)
+    query = query.order_by(request_params.order_by, Products.id)
+    return export_response(query, format, "products")
+
+@router.get(
+    "/history/export",
+    name=f"{name}:history-export",
+)
+async def export_products_history(
+    format: ExportFormat = "csv",
+    request_params: RequestParamsProductHistory = Depends(
+        parse_filter_search_params_product_history(ProductHistory)
+    ),
+    user: User = Depends(AuthorizeCurrentUser(role_authen.roles_all))
+) -> Any:
+    """
+    Export all product histories matching the list filters as CSV or NDJSON
+    """
+    query = await crud.product_history.query_product_histories(request_params)
+    query = query.order_by(request_params.order_by, ProductHistory.id)
+    return export_response(query, format, "product_history")
+
 @router.get(
     "/history",
     name=f"{name}:history-list",
@@ -73,34 +117,26 @@ async def get_list_products_history(
     """
     Get list products
     """
-    total = await crud.product_history.total_product_histories_by_product(session, request_params)
-    histories = await crud.product_history.list_product_histories_by_product(session, request_params)
+    histories, total = await crud.product_history.list_product_histories_by_product(session, request_params)
 
+    parents = await crud.user.get_users_basic_info_by_ids(
+        session,
+        [history.buyer_created_by for history in histories]
+        + [history.seller_created_by for history in histories],
+    )
     responses = []
     for history in histories:
         response = {**history}
-        if history.buyer_created_by is not None:
-            response.update({"buyer_parent": await crud.user.get_user_basic_info_by_id(session, history.buyer_created_by)})
-        else: 
-            response.update({"buyer_parent": None})
-        if history.seller_created_by is not None:
-            response.update({"seller_parent": await crud.user.get_user_basic_info_by_id(session, history.seller_created_by)})
-        else: 
-            response.update({"seller_parent": None})
-
+        response.update({"buyer_parent": parents.get(history.buyer_created_by)})
+        response.update({"seller_parent": parents.get(history.seller_created_by)})
         responses.append(response)
         
-    if not responses:
-        page_total = 1
-    else:
-        page_total = math.ceil(total/ request_params.limit)
-
     return ResponsePagination(
-        page_total=page_total,
-        # page_total=math.ceil(total/ request_params.limit),
+        page_total=count_pages(total, request_params.limit),
         page_size=request_params.limit,
         page=request_params.skip / request_params.limit + 1,
         data=responses,
+        next_cursor=next_cursor(request_params, histories, "ProductHistory"),
     )
 
 @router.post(
@@ -137,6 +173,78 @@ async def create_product(
     return response
 
 
+@router.post(
+    "/bulk",
+    name=f"{name}:create-bulk",
+    status_code=201
+)
+async def create_products_bulk(
+    name: str,
+    quantity: int = Query(..., ge=1, le=settings.PRODUCT_BULK_MAX_QUANTITY),
+    farm_id: Optional[uuid.UUID] = None,
+    description:  Optional[str] = None,
+    price_in_retail: Optional[Decimal] = None,
+    files: Optional[List[UploadFile]] = File(None),
+    session: AsyncSession = Depends(get_async_session),
+    user: User = Depends(AuthorizeCurrentUser(role_authen.roles_owner))
+) -> Any:
+    """
+    Create a lot of identical products in one transaction,
+    stream back one {"id", "code"} JSON line per product
+    """
+    product_in = ProductCreate(
+        name=name,
+        farm_id=farm_id,
+        description=description,
+        price_in_retail=price_in_retail
+    )
+    products = await crud.product.create_many(
+        session, [product_in] * quantity, updated_by=user.id
+    )
+    if files:
+        resources = await upload_multiple_file(
+            session, files, updated_by=user.id, commit=False
+        )
+        await crud.product.add_resources_to_items(
+            session, resources, [product["id"] for product in products], resource_type.PRODUCT
+        )
+    await session.commit()
+
+    def lines():
+        for product in products:
+            yield json.dumps({"id": str(product["id"]), "code": product["code"]}) + "\n"
+
+    return StreamingResponse(
+        lines(), status_code=201, media_type="application/x-ndjson"
+    )
+
+
+@router.post(
+    "/import",
+    name=f"{name}:import",
+    response_model=ResponseImport,
+)
+async def import_products(
+    file: UploadFile = File(...),
+    format: ImportFormat = "csv",
+    session: AsyncSession = Depends(get_async_session),
+    user: User = Depends(AuthorizeCurrentUser(role_authen.roles_owner)),
+) -> Any:
+    """
+    Import products from a CSV or NDJSON file, one product per row.
+    Invalid rows are skipped and listed in the report.
+    """
+    return await import_rows(
+        session,
+        file,
+        format,
+        ProductCreate,
+        lambda db, objs_in: crud.product.create_many(
+            db, objs_in, rfid_type.PRODUCT, updated_by=user.id
+        ),
+    )
+
+
 @router.get(
     "/{product_id}",
     name=f"{name}:one",
@@ -1,7 +1,10 @@
 from datetime import datetime
+from pathlib import PurePosixPath
+import re
 from typing import Any, List, Literal, Optional
 import uuid
 from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query, Form
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from app import crud
 from app.core.constants import resource_type
@@ -14,13 +17,19 @@ from app.models.farms import Farms
 from app.models.trees import Trees
 from app.models.fertilizers import Fertilizers
 from app.models.products import Products
+from app.models.item_resources import ItemResources
 from app.models.resource import Resource
 from app.schemas.resource import Resource as ResourceSchema
+from app.utils.ids import uuid7
+from app.utils.storage import get_storage
+from app.utils import media_store
+from app.utils.upload_file import adopt_upload
 
 name = "resource"
 router = APIRouter(prefix=f"/{name}s")
 
 
+
 @router.post(
     "",
     name=f"{name}:create",
@@ -37,6 +46,62 @@ async def upload_file(
     return resources
 
 
+@router.post(
+    "/presign",
+    name=f"{name}:presign",
+)
+async def presign_upload(
+    file_name: str,
+    content_type: Optional[str] = None,
+    user: User = Depends(AuthorizeCurrentUser(role_authen.roles_all)),
+) -> Any:
+    """
+    Get a presigned URL to upload a file straight to the storage backend,
+    then register it with `/resources/confirm`
+    """
+    storage = get_storage()
+    key = f"{media_store.PRESIGNED_FOLDER}/{uuid7().hex}/{PurePosixPath(file_name).name}"
+    try:
+        presigned = await storage.presign(key, content_type)
+    except NotImplementedError as e:
+        raise HTTPException(400, str(e))
+    return {"key": key, **presigned}
+
+
+@router.post(
+    "/confirm",
+    name=f"{name}:confirm",
+    response_model=ResourceSchema,
+)
+async def confirm_upload(
+    key: str,
+    file_type: str,
+    session: AsyncSession = Depends(get_async_session),
+    user: User = Depends(AuthorizeCurrentUser(role_authen.roles_all)),
+) -> Any:
+    """
+    Create the resource of a file uploaded with a presigned URL. The file is
+    moved to the media store, deduplicated and gets its image variants like
+    any upload.
+    """
+    parts = PurePosixPath(key).parts
+    if (
+        len(parts) != 3
+        or parts[0] != media_store.PRESIGNED_FOLDER
+        or not re.fullmatch(r"[0-9a-f]{32}", parts[1])
+        or parts[2] in (".", "..")
+    ):
+        raise HTTPException(400, "Invalid upload key.")
+    storage = get_storage()
+    if not await storage.stat(key):
+        raise HTTPException(404, "The uploaded file not found.")
+    resource = await adopt_upload(storage, key, file_type, user.id)
+    session.add(resource)
+    await session.commit()
+    await storage.delete(key)
+    return resource
+
+
 @router.get(
     "/{resource_id}",
     name=f"{name}:one",
@@ -85,6 +150,8 @@ async def update_resource_of_item(
             raise HTTPException(400, "The farm not found.")
         await crud.farm.delete_resources(session, deleted_resource_ids, item.id, item_type)
         await crud.farm.add_resources(session, resources, item.id, item_type)
+        await crud.farm.refresh_summary(session, [item.id])
+        await session.commit()
         resources = await crud.farm.get_resources(session, item.id, item_type)
         response = {**item.__dict__}
         response.update({"resources": resources})
@@ -141,5 +208,14 @@ async def delete_resource_by_id(
     resource.deleted_at = datetime.utcnow()
     resource.updated_by = user.id
     session.add(resource)
+    await session.flush()
+    # Farm summaries embed their resources
+    await crud.farm.refresh_summary(
+        session,
+        select(ItemResources.item_id)
+        .filter(ItemResources.resource_id == resource.id)
+        .filter(ItemResources.item_type == resource_type.FARM)
+        .filter(ItemResources.deleted_at == None),
+    )
     await session.commit()
     return "The resource deleted successfully!"
\ No newline at end of file
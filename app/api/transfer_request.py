@@ -1,13 +1,12 @@
-import math
 from typing import Any, List
 import uuid
-from sqlalchemy import select
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.constants import role_key, transfer_status, role_authen, product_transfer_status, resource_type
-from app.core.firebase import _firebase
+from app.core.firebase import unique_topics
 from app.core.msg import msg
 from app import crud
+from app.crud.pagination import count_pages, next_cursor
 from app.deps.db import get_async_session
 from app.deps.users import AuthorizeCurrentUser
 from app.models.users import User
@@ -21,11 +20,12 @@ from app.schemas.transfer import (
     ProductHistoryCreate,
     ProductHistoryUpdate
 )
+from app.schemas.notifications import NotificationCreate
 from app.schemas.request_params import RequestParamsTransferRequest
 from app.deps.request_params import parse_filter_search_params_transfer_request
 from app.schemas.responses import ResponsePagination
-from app.models.resource import Resource
-from app.models.item_resources import ItemResources
+from app.utils.export import ExportFormat, export_response
+from app.utils.ids import uuid7
 
 
 name = "transfer-request"
@@ -46,29 +46,43 @@ async def get_list_transfer_request(
     """
     Get list transfer request
     """
-    total = await crud.transfer_request.total_transfer_requests_by_product(session, request_params)
-    transfer_request = await crud.transfer_request.list_transfer_requests_by_product(session, request_params)
-
-    if not transfer_request:
-        page_total = 1
-    else:
-        page_total = math.ceil(total/ request_params.limit)
+    transfer_request, total = await crud.transfer_request.list_transfer_requests_by_product(session, request_params)
 
     return ResponsePagination(
-        page_total=page_total,
+        page_total=count_pages(total, request_params.limit),
         page_size=request_params.limit,
         page=request_params.skip / request_params.limit + 1,
         data=transfer_request,
+        next_cursor=next_cursor(request_params, transfer_request, "TransferRequests"),
     )
 
 
+@router.get(
+    "/export",
+    name=f"{name}:export",
+)
+async def export_transfer_requests(
+    format: ExportFormat = "csv",
+    request_params: RequestParamsTransferRequest = Depends(
+        parse_filter_search_params_transfer_request(TransferRequests)
+    ),
+    session: AsyncSession = Depends(get_async_session),
+    user: User = Depends(AuthorizeCurrentUser(role_authen.roles_all))
+) -> Any:
+    """
+    Export all transfer requests matching the list filters as CSV or NDJSON
+    """
+    query = await crud.transfer_request.query_transfer_requests(session, request_params)
+    query = query.order_by(request_params.order_by, TransferRequests.id)
+    return export_response(query, format, "transfer_requests")
+
+
 @router.post(
     "",
     name=f"{name}:create",
     status_code=201,
 )
 async def create_transfer_request(
-    background_tasks: BackgroundTasks,
     transfer_request_in: TransferRequestCreate,
     session: AsyncSession = Depends(get_async_session),
     user: User = Depends(AuthorizeCurrentUser(role_authen.roles_all)),
@@ -117,57 +131,58 @@ async def create_transfer_request(
             status_code=403,
             detail=f"User have already requested for this product."
         )
+    first_image_path = await crud.product.get_thumbnail(session, product.id, resource_type.PRODUCT)
+
+    # Notifications are written to the outbox in the same transaction
+    # Send notification to requester
+    crud.notification_outbox.enqueue(
+        session,
+        NotificationCreate(
+            title=msg.YOU_HAVE_CREATED_A_NEW_TRANSFER_REQUEST,
+            body=f"Bạn đã tạo một yêu cầu cho sản phẩm {product.name}",
+            data={
+                "event": "add_transfer_request", 
+                "product_id": str(product.id), 
+                "to_user_id": str(transfer_request_in.transfer_to_user_id), 
+                "from_user_id": str(transfer_request_in.transfer_from_user_id)
+            },
+            topics=[f"user_{transfer_request_in.transfer_to_user_id}"],
+            image_url=first_image_path,
+        ),
+        updated_by=user.id,
+    )
+
+    # Send notification to owner
+    crud.notification_outbox.enqueue(
+        session,
+        NotificationCreate(
+            title=msg.YOU_HAVE_A_NEW_TRANSFER_REQUEST,
+            body=f"Sản phẩm {product.name} được yêu cầu",
+            data={
+                "event": "receive_transfer_request", 
+                "product_id": str(product.id), 
+                "to_user_id": str(transfer_request_in.transfer_to_user_id), 
+                "from_user_id": str(transfer_request_in.transfer_from_user_id)
+            },
+            topics=[f"user_{transfer_request_in.transfer_from_user_id}"],
+            image_url=first_image_path,
+        ),
+        updated_by=user.id,
+    )
+
     status_id = await crud.transfer_request.get_status(session, transfer_status.PENDING)
     transfer_request = await crud.transfer_request.create(
-        session, transfer_request_in, status_id=status_id, updated_by=transfer_request_in.transfer_to_user_id
+        session, transfer_request_in, status_id=status_id, updated_by=transfer_request_in.transfer_to_user_id, commit=False
     )
     # Update product status of owner
     await crud.product.update_product_status(
-        session, transfer_request_in.product_id, product_status=product_transfer_status.PENDING, updated_by=transfer_request.transfer_from_user_id
+        session, transfer_request_in.product_id, product_status=product_transfer_status.PENDING, updated_by=transfer_request.transfer_from_user_id, commit=False
     )
     # Update product status of buyer
     await crud.product.update_product_status(
-        session, transfer_request_in.product_id, product_status=product_transfer_status.PENDING, updated_by=transfer_request.transfer_to_user_id
-    )
-
-    first_image_path = (
-        await session.execute(
-            select(Resource.file_path)
-            .filter(ItemResources.item_id == product.id)
-            .filter(ItemResources.item_type == resource_type.PRODUCT)
-            .filter(Resource.id == ItemResources.resource_id)
-        )
-    ).scalars().first()
-
-    # Send notification to requester
-    background_tasks.add_task(
-        _firebase.send_to_topics,
-        title=msg.YOU_HAVE_CREATED_A_NEW_TRANSFER_REQUEST,
-        body=f"Bạn đã tạo một yêu cầu cho sản phẩm {product.name}",
-        data={
-            "event": "add_transfer_request", 
-            "product_id": str(product.id), 
-            "to_user_id": str(transfer_request_in.transfer_to_user_id), 
-            "from_user_id": str(transfer_request_in.transfer_from_user_id)
-        },
-        topics=[f"user_{transfer_request_in.transfer_to_user_id}"],
-        imageUrl=first_image_path,
-    )
-
-    # Send notification to owner
-    background_tasks.add_task(
-        _firebase.send_to_topics,
-        title=msg.YOU_HAVE_A_NEW_TRANSFER_REQUEST,
-        body=f"Sản phẩm {product.name} được yêu cầu",
-        data={
-            "event": "receive_transfer_request", 
-            "product_id": str(product.id), 
-            "to_user_id": str(transfer_request_in.transfer_to_user_id), 
-            "from_user_id": str(transfer_request_in.transfer_from_user_id)
-        },
-        topics=[f"user_{transfer_request_in.transfer_from_user_id}"],
-        imageUrl=first_image_path,
+        session, transfer_request_in.product_id, product_status=product_transfer_status.PENDING, updated_by=transfer_request.transfer_to_user_id, commit=False
     )
+    await session.commit()
 
     return transfer_request
 
@@ -197,7 +212,6 @@ async def get_transfer_request_by_id(
     name=f"{name}:update",
 )
 async def update_transfer_request_by_id(
-    background_tasks: BackgroundTasks,
     transfer_request_id: uuid.UUID,
     transfer_request_status: str,
     session: AsyncSession = Depends(get_async_session),
@@ -230,6 +244,12 @@ async def update_transfer_request_by_id(
                 detail="User do not have permission.",
             )
     
+    # The whole update runs in one transaction. Lock the product first so
+    # concurrent updates of its requests run one after another, then reload
+    # the request under lock, a concurrent accept may have closed it.
+    product = await crud.product.get_for_update(session, transfer_request.product_id)
+    transfer_request = await crud.transfer_request.get_for_update(session, transfer_request_id)
+
     pending_id = await crud.transfer_request.get_status(session, product_transfer_status .PENDING)
     if transfer_request.transfer_status_id == pending_id:
         new_status_id = await crud.transfer_request.get_status(session, transfer_request_status)
@@ -239,125 +259,125 @@ async def update_transfer_request_by_id(
                 detail="Transfer status not found."
             )
 
-        product = await crud.product.get(session, transfer_request.product_id)
         if not product:
             raise HTTPException(
                 status_code=404,
                 detail="Product not found or was deleted."
             )
-        first_image_path = (
-            await session.execute(
-                select(Resource.file_path)
-                .filter(ItemResources.item_id == product.id)
-                .filter(ItemResources.item_type == resource_type.PRODUCT)
-                .filter(Resource.id == ItemResources.resource_id)
-            )
-        ).scalars().first()   
+        first_image_path = await crud.product.get_thumbnail(session, product.id, resource_type.PRODUCT)
 
         # Request accepted then update request status and product status, owner
         # And change all other pending requests to failed
         if transfer_request_status == transfer_status.ACCEPTED: 
-            await crud.product.update_product_owner(session, product, updated_by=transfer_request.transfer_to_user_id)
+            await crud.product.update_product_owner(session, product, updated_by=transfer_request.transfer_to_user_id, commit=False)
             # Update product status of buyer
-            await crud.product.update_product_status(session, product.id, product_status=product_transfer_status.NORMAL , updated_by=transfer_request.transfer_to_user_id)
+            await crud.product.update_product_status(session, product.id, product_status=product_transfer_status.NORMAL , updated_by=transfer_request.transfer_to_user_id, commit=False)
             # Update product status of seller
-            await crud.product.update_product_status(session, product.id, product_status=product_transfer_status.ACCEPTED , updated_by=transfer_request.transfer_from_user_id)
+            await crud.product.update_product_status(session, product.id, product_status=product_transfer_status.ACCEPTED , updated_by=transfer_request.transfer_from_user_id, commit=False)
             transfer_history = ProductHistoryCreate(
-                id = uuid.uuid4(),
+                id = uuid7(),
                 product_id = transfer_request.product_id,
                 transfer_from_user_id = transfer_request.transfer_from_user_id,
                 transfer_to_user_id =transfer_request.transfer_to_user_id
             )
-            await crud.product_history.create(session, transfer_history, user.id)
+            await crud.product_history.create(session, transfer_history, user.id, commit=False)
 
             denied_id = await crud.transfer_request.get_status(session, transfer_status.DENIED)
-            # Update transfer request status of product
+            # Deny the other pending requests of the product
             updated_requests = await crud.transfer_request.update_transfer_requests_status_by_product(
-                session, product.id, denied_id, updated_by=transfer_request.transfer_to_user_id
+                session, product.id, denied_id, updated_by=transfer_request.transfer_to_user_id,
+                exclude_id=transfer_request.id, commit=False
             )
             transfer_request = await crud.transfer_request.update_transfer_request_status(
-                session, transfer_request, new_status_id, updated_by=user.id
+                session, transfer_request, new_status_id, updated_by=user.id, commit=False
             )
-            await crud.product.update_products_status(
-                session, product.id, from_status=product_transfer_status.PENDING, to_status=product_transfer_status.DENIED
+            # Resolve the parent user of everyone notified in one query
+            involved_users = await crud.user.get_users_basic_info_by_ids(
+                session,
+                [request.transfer_to_user_id for request in updated_requests]
+                + [transfer_request.transfer_from_user_id, transfer_request.transfer_to_user_id],
             )
 
             # Send notification to seller who can't buy
             topics = []
             for request in updated_requests:
-                transfer_user = await crud.user.get_user_basic_info_by_id(session, request.transfer_to_user_id)
-                if transfer_user.created_by:
+                transfer_user = involved_users.get(request.transfer_to_user_id)
+                if transfer_user and transfer_user.created_by:
                     topics.append(f"user_{transfer_user.created_by}")
                 topics.append(f"user_{request.transfer_to_user_id}")
 
-            background_tasks.add_task(
-                _firebase.send_to_topics,
-                title=msg.A_TRANSFER_REQUEST_HAVE_BEEN_DENIED,
-                body=f"Sản phẩm {product.name} đã bị từ chối",
-                data={
-                    "event": "denied_transfer_request", 
-                    "product_id": str(product.id), 
-                    "to_user_id": str(transfer_request.transfer_to_user_id), 
-                    "from_user_id": str(transfer_request.transfer_from_user_id)
-                },
-                topics=topics,
-                imageUrl=first_image_path,
+            crud.notification_outbox.enqueue(
+                session,
+                NotificationCreate(
+                    title=msg.A_TRANSFER_REQUEST_HAVE_BEEN_DENIED,
+                    body=f"Sản phẩm {product.name} đã bị từ chối",
+                    data={
+                        "event": "denied_transfer_request", 
+                        "product_id": str(product.id), 
+                        "to_user_id": str(transfer_request.transfer_to_user_id), 
+                        "from_user_id": str(transfer_request.transfer_from_user_id)
+                    },
+                    topics=unique_topics(topics),
+                    image_url=first_image_path,
+                ),
+                updated_by=user.id,
             )
             
             # Send notification to seller
             seller_topics = []
-            transfer_user = await crud.user.get_user_basic_info_by_id(session, transfer_request.transfer_from_user_id)
-            if transfer_user.created_by:
+            transfer_user = involved_users.get(transfer_request.transfer_from_user_id)
+            if transfer_user and transfer_user.created_by:
                 seller_topics.append(f"user_{transfer_user.created_by}")
             seller_topics.append(f"user_{transfer_request.transfer_from_user_id}") 
             
-            background_tasks.add_task(
-                _firebase.send_to_topics,
-                title=msg.YOU_HAVE_ACCEPTED_A_TRANSFER_REQUEST,
-                body=f"Sản phẩm {product.name} đã được chuyển giao",
-                data={
-                    "event": "accepted_transfer_request", 
-                    "product_id": str(product.id), 
-                    "to_user_id": str(transfer_request.transfer_to_user_id), 
-                    "from_user_id": str(transfer_request.transfer_from_user_id)
-                },
-                topics=seller_topics,
-                imageUrl=first_image_path,
+            crud.notification_outbox.enqueue(
+                session,
+                NotificationCreate(
+                    title=msg.YOU_HAVE_ACCEPTED_A_TRANSFER_REQUEST,
+                    body=f"Sản phẩm {product.name} đã được chuyển giao",
+                    data={
+                        "event": "accepted_transfer_request", 
+                        "product_id": str(product.id), 
+                        "to_user_id": str(transfer_request.transfer_to_user_id), 
+                        "from_user_id": str(transfer_request.transfer_from_user_id)
+                    },
+                    topics=seller_topics,
+                    image_url=first_image_path,
+                ),
+                updated_by=user.id,
             )
 
             # Send notification to buyer
             buyer_topics = []
-            transfer_user = await crud.user.get_user_basic_info_by_id(session, transfer_request.transfer_to_user_id)
-            if transfer_user.created_by:
+            transfer_user = involved_users.get(transfer_request.transfer_to_user_id)
+            if transfer_user and transfer_user.created_by:
                 buyer_topics.append(f"user_{transfer_user.created_by}")
             buyer_topics.append(f"user_{transfer_request.transfer_to_user_id}") 
 
-            background_tasks.add_task(
-                _firebase.send_to_topics,
-                title=msg.YOUR_TRANSFER_REQUEST_HAVE_BEEN_ACCEPTED,
-                body=f"Sản phẩm {product.name} đã được chuyển giao",
-                data={
-                    "event": "accepted_transfer_request", 
-                    "product_id": str(product.id), 
-                    "to_user_id": str(transfer_request.transfer_to_user_id), 
-                    "from_user_id": str(transfer_request.transfer_from_user_id)
-                },
-                topics=buyer_topics,
-                imageUrl=first_image_path,
+            crud.notification_outbox.enqueue(
+                session,
+                NotificationCreate(
+                    title=msg.YOUR_TRANSFER_REQUEST_HAVE_BEEN_ACCEPTED,
+                    body=f"Sản phẩm {product.name} đã được chuyển giao",
+                    data={
+                        "event": "accepted_transfer_request", 
+                        "product_id": str(product.id), 
+                        "to_user_id": str(transfer_request.transfer_to_user_id), 
+                        "from_user_id": str(transfer_request.transfer_from_user_id)
+                    },
+                    topics=buyer_topics,
+                    image_url=first_image_path,
+                ),
+                updated_by=user.id,
             )
 
-        elif transfer_request_status == transfer_status.DENIED:
-            transfer_request = await crud.transfer_request.update_transfer_request_status(
-                session, transfer_request, new_status_id, updated_by=user.id
+            await crud.product.update_products_status(
+                session, product.id, from_status=product_transfer_status.PENDING, to_status=product_transfer_status.DENIED, commit=False
             )
+            # The notifications above are committed with the transfer
+            await session.commit()
 
-            # Update product status of buyer
-            await crud.product.update_product_status(session, product.id, product_status=product_transfer_status.DENIED ,updated_by=transfer_request.transfer_to_user_id)
-            product_status = await crud.product.check_pending_product_status(session, product.id)
-            if not product_status:
-                # Update product status of seller
-                await crud.product.update_product_status(session, product.id, product_status=product_transfer_status.NORMAL ,updated_by=transfer_request.transfer_from_user_id)
-
+        elif transfer_request_status == transfer_status.DENIED:
             # Send notification to seller and buyer
             buyer_topics = []
             transfer_user = await crud.user.get_user_basic_info_by_id(session, transfer_request.transfer_to_user_id)
@@ -378,35 +398,53 @@ async def update_transfer_request_by_id(
                 seller_topics.append(f"user_{transfer_user.created_by}")
             seller_topics.append(f"user_{transfer_request.transfer_from_user_id}") 
             
-            
-            background_tasks.add_task(
-                _firebase.send_to_topics,
-                title=msg.YOU_HAVE_DENIED_A_TRANSFER_REQUEST,
-                body=f"Yêu cầu tới sản phẩm {product.name} đã được hủy",
-                data={
-                    "event": "denied_transfer_request", 
-                    "product_id": str(product.id), 
-                    "to_user_id": str(transfer_request.transfer_to_user_id), 
-                    "from_user_id": str(transfer_request.transfer_from_user_id)
-                },
-                topics=seller_topics,
-                imageUrl=first_image_path,
+            crud.notification_outbox.enqueue(
+                session,
+                NotificationCreate(
+                    title=msg.YOU_HAVE_DENIED_A_TRANSFER_REQUEST,
+                    body=f"Yêu cầu tới sản phẩm {product.name} đã được hủy",
+                    data={
+                        "event": "denied_transfer_request", 
+                        "product_id": str(product.id), 
+                        "to_user_id": str(transfer_request.transfer_to_user_id), 
+                        "from_user_id": str(transfer_request.transfer_from_user_id)
+                    },
+                    topics=seller_topics,
+                    image_url=first_image_path,
+                ),
+                updated_by=user.id,
             )
 
-            background_tasks.add_task(
-                _firebase.send_to_topics,
-                title=buyer_title,
-                body=buyer_body,
-                data={
-                    "event": "denied_transfer_request", 
-                    "product_id": str(product.id), 
-                    "to_user_id": str(transfer_request.transfer_to_user_id), 
-                    "from_user_id": str(transfer_request.transfer_from_user_id)
-                },
-                topics=buyer_topics,
-                imageUrl=first_image_path,
+            crud.notification_outbox.enqueue(
+                session,
+                NotificationCreate(
+                    title=buyer_title,
+                    body=buyer_body,
+                    data={
+                        "event": "denied_transfer_request", 
+                        "product_id": str(product.id), 
+                        "to_user_id": str(transfer_request.transfer_to_user_id), 
+                        "from_user_id": str(transfer_request.transfer_from_user_id)
+                    },
+                    topics=buyer_topics,
+                    image_url=first_image_path,
+                ),
+                updated_by=user.id,
             )
 
+            transfer_request = await crud.transfer_request.update_transfer_request_status(
+                session, transfer_request, new_status_id, updated_by=user.id, commit=False
+            )
+
+            # Update product status of buyer
+            await crud.product.update_product_status(session, product.id, product_status=product_transfer_status.DENIED ,updated_by=transfer_request.transfer_to_user_id, commit=False)
+            product_status = await crud.product.check_pending_product_status(session, product.id)
+            if not product_status:
+                # Update product status of seller
+                await crud.product.update_product_status(session, product.id, product_status=product_transfer_status.NORMAL ,updated_by=transfer_request.transfer_from_user_id, commit=False)
+            # The notifications above are committed with the status change
+            await session.commit()
+
         else:
             pass
     else:
@@ -5,12 +5,15 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import crud
 from app.utils import upload_multiple_file
-from app.core.constants import role_key, resource_type
+from app.utils.image_variants import thumbnail
+from app.core.constants import role_key, resource_type, rfid_type
 from app.deps.db import get_async_session
 from app.deps.request_params import parse_filter_search_params_trees
 from app.deps.users import AuthorizeCurrentUser
 from app.models.users import User
 from app.schemas.request_params import RequestParamsTree
+from app.schemas.responses import ResponseImport
+from app.utils.bulk_import import ImportFormat, import_rows
 from app.schemas.trees import (
     Tree as TreeSchema,
     TreeCreate,
@@ -36,10 +39,16 @@ async def get_list_trees(
     Get list trees
     """
     trees = await crud.tree.list_tree(session, request_params)
+    resources = await crud.tree.get_resources_for_items(
+        session, [tree.Trees.id for tree in trees], resource_type.TREE
+    )
     responses = []
     for tree in trees:
         response = {**tree}
-        response.update({"resources": await crud.tree.get_resources(session, tree.Trees.id, resource_type.TREE)})
+        response.update({
+            "resources": resources[tree.Trees.id],
+            "thumbnail": thumbnail(resources[tree.Trees.id]),
+        })
         responses.append(response)
     return responses
 
@@ -72,6 +81,32 @@ async def create_tree(
     return response
 
 
+@router.post(
+    "/import",
+    name=f"{name}:import",
+    response_model=ResponseImport,
+)
+async def import_trees(
+    file: UploadFile = File(...),
+    format: ImportFormat = "csv",
+    session: AsyncSession = Depends(get_async_session),
+    user: User = Depends(AuthorizeCurrentUser(role_authen.roles_owner)),
+) -> Any:
+    """
+    Import trees from a CSV or NDJSON file, one tree per row.
+    Invalid rows are skipped and listed in the report.
+    """
+    return await import_rows(
+        session,
+        file,
+        format,
+        TreeCreate,
+        lambda db, objs_in: crud.tree.create_many(
+            db, objs_in, rfid_type.TREE, updated_by=user.id
+        ),
+    )
+
+
 @router.get(
     "/{tree_id}",
     name=f"{name}:one",
@@ -119,6 +154,8 @@ async def update_tree_by_id(
     tree = await crud.tree.update(
         session, tree, tree_in, updated_by=user.id
     )
+    await crud.farm.refresh_summary_by_tree(session, tree.id)
+    await session.commit()
     response = TreeSchema.from_orm(tree)
     response.resources = await crud.tree.get_resources(session, tree_id, resource_type.TREE)
     return response
@@ -145,4 +182,6 @@ async def delete_tree_by_id(
             detail="The tree not found."
         )
     await crud.tree.delete(session, tree, updated_by=user.id)
+    await crud.farm.refresh_summary_by_tree(session, tree_id)
+    await session.commit()
     return "The tree deleted successfully!"
\ No newline at end of file
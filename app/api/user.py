@@ -1,9 +1,5 @@
-from datetime import datetime
-import math
-from pathlib import Path
 from typing import Any, Optional
 import uuid
-import aiofiles
 import filetype
 from fastapi import BackgroundTasks, Depends, Form, HTTPException, Request, UploadFile, status
 from fastapi.routing import APIRouter
@@ -21,14 +17,15 @@ from app.deps.db import get_async_session
 from app.deps.request_params import parse_filter_search_params_users
 from app.deps.users import AuthorizeCurrentUser, get_topics_by_role, get_user_manager
 from app import crud
+from app.crud.pagination import count_pages, next_cursor
 from app.models.users import User
-from app.core.firebase import _firebase
+from app.core.firebase import async_firebase
+from app.core.password import password_pool
 from app.schemas.request_params import RequestParamsUser
 from app.schemas.users import User as UserSchema
 from app.schemas.users import UserChagePassword, UserUpdate
-from app.core.config import settings
-from app.models.resource import Resource
 from app.core.constants import role_authen, role_key
+from app.utils.upload_file import save_upload
 
 name="user"
 router = APIRouter(prefix=f"/{name}")
@@ -47,19 +44,14 @@ async def list_sub_users(
     """
     List your sub users
     """
-    total = await crud.user.total_sub_user(session, user.id, request_params)
-    users = await crud.user.get_sub_customers(session, user.id, request_params)
-
-    if not users:
-        page_total = 1
-    else:
-        page_total = math.ceil(total/ request_params.limit)
+    users, total = await crud.user.get_sub_customers(session, user.id, request_params)
 
     return ResponsePagination(
-        page_total=page_total,
+        page_total=count_pages(total, request_params.limit),
         page_size=request_params.limit,
         page=request_params.skip / request_params.limit + 1,
         data=users,
+        next_cursor=next_cursor(request_params, users),
     )
 
 @router.get(
@@ -75,27 +67,22 @@ async def search_users(
     """
     List your search users
     """
-    total = await crud.user.total_user(session, request_params)
-    users = await crud.user.search_user(session, request_params)
+    users, total = await crud.user.search_user(session, request_params)
+    parents = await crud.user.get_users_basic_info_by_ids(
+        session, [user.created_by for user in users]
+    )
     responses = []
     for user in users:
         response = {**user}
-        if user.created_by is not None:
-            response.update({"parent": await crud.user.get_user_basic_info_by_id(session, user.created_by)})
-        else: 
-            response.update({"parent": None})
+        response.update({"parent": parents.get(user.created_by)})
         responses.append(response)
 
-    if not responses:
-        page_total = 1
-    else:
-        page_total = math.ceil(total/ request_params.limit)
-
     return ResponsePagination(
-        page_total=page_total,
+        page_total=count_pages(total, request_params.limit),
         page_size=request_params.limit,
         page=request_params.skip / request_params.limit + 1,
         data=responses,
+        next_cursor=next_cursor(request_params, users),
     )
 
 @router.get(
@@ -176,33 +163,15 @@ async def update_avatar(
     user: User = Depends(AuthorizeCurrentUser(role_authen.roles_all)),
     session: AsyncSession = Depends(get_async_session),
 ):
-    ts = int(float(datetime.now().strftime('%s.%f')) * 1e3)
-    filename = f"""{ts}_{file.filename}"""
-    Path(f"""{settings.STATIC_PATH}/media""").mkdir(parents=True, exist_ok=True)
-    destination_file_path = f"""{settings.STATIC_PATH}/media/{filename}"""
-    _size: int = 0
-    async with aiofiles.open(destination_file_path, 'wb') as out_file:
-        while content := await file.read(1024):  # async read file chunk
-            _size += len(content)
-            await out_file.write(content)  # async write file chunk
-    media = Resource(
-            id = uuid.uuid4(),
-            name = filename,
-            file_path = f"/static/media/{filename}",
-            file_size = str(_size),
-            file_type = file.content_type,
-            updated_by = user.id
-    )
-    session.add(media)
-    await session.commit()
-
-    if filetype.is_image(destination_file_path):
-        pass
-    else:
+    # filetype only needs the first bytes to recognise the format
+    header = await file.read(261)
+    if not filetype.is_image(header):
         raise HTTPException(
             status_code=400,
             detail="Only image type allowed",
         )
+    media = await save_upload(file, user.id)
+    session.add(media)
 
     _user: Optional[User] = await session.get(User, user.id)
     _user.avatar_id = media.id
@@ -224,7 +193,7 @@ async def change_password(
 ):
     # Check current password
     user_manager = next(get_user_manager())
-    verified, updated_password_hash = user_manager.password_helper.verify_and_update(
+    verified, updated_password_hash = await password_pool.verify_and_update(
         obj_in.current_password, user.hashed_password
     )
     if not verified:
@@ -238,7 +207,7 @@ async def change_password(
             detail="New password not match",
         )
     await user_manager.validate_password(obj_in.new_password, user)
-    hashed_password = user_manager.password_helper.hash(obj_in.new_password)
+    hashed_password = await password_pool.hash(obj_in.new_password)
 
     _user: Optional[User] = await session.get(User, user.id)
     _user.hashed_password = hashed_password
@@ -294,10 +263,10 @@ async def update_me(
         user_mana = await user_manager.update(user_update, user, safe=True, request=request)
         # Subscribe topic
         try:
-            topics = get_topics_by_role(user)
+            topics = await get_topics_by_role(user)
             if user_mana.firebase_register_token:
                 background_tasks.add_task(
-                    _firebase.subscribe,
+                    async_firebase.subscribe,
                     tokens=[user_mana.firebase_register_token], 
                     topics=topics,
                 )
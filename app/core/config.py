@@ -16,6 +16,18 @@ class Settings(BaseSettings):
     DATABASE_URL: PostgresDsn
     ASYNC_DATABASE_URL: Optional[PostgresDsn]
     STATIC_PATH: str = "./static"
+    UPLOAD_CHUNK_SIZE: int = 256 * 1024
+    UPLOAD_MAX_CONCURRENCY: int = 8
+    IMAGE_VARIANTS_ENABLED: bool = True
+    # "WEBP" or "JPEG"
+    IMAGE_VARIANT_FORMAT: str = "WEBP"
+    IMAGE_VARIANT_QUALITY: int = 80
+    IMAGE_VARIANT_WORKERS: int = 2
+    MEDIA_GC_ENABLED: bool = True
+    MEDIA_GC_INTERVAL_MINUTES: int = 60
+    # Blobs younger than this are never collected, covers in-flight uploads
+    MEDIA_GC_GRACE_SECONDS: int = 3600
+    MEDIA_GC_BATCH_SIZE: int = 1000
 
     @validator("DATABASE_URL", pre=True)
     def change_database_url(cls, v: Optional[str], values: Dict[str, Any]):  
@@ -41,14 +53,47 @@ class Settings(BaseSettings):
     EMAILS_FROM_NAME: Optional[str] = None
     PAGING_DEFAULT_SKIP: int = 0
     PAGING_DEFAULT_LIMIT: int = 10
+    PRODUCT_BULK_MAX_QUANTITY: int = 1000
+    EXPORT_YIELD_PER: int = 500
+    IMPORT_BATCH_SIZE: int = 1000
+    IMPORT_MAX_ERRORS: int = 1000
+    LOOKUP_CACHE_TTL_SECONDS: int = 300
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_CONCURRENCY: int = 4
+    PASSWORD_HASH_USE_PROCESSES: bool = False
     FIREBASE_CERT: dict = {}
+    # "fcm" or "fake"
+    FIREBASE_TRANSPORT: str = "fcm"
+    FIREBASE_WORKERS: int = 4
+    FIREBASE_MAX_CONCURRENT_BATCHES: int = 4
+    NOTIFICATION_WORKER_ENABLED: bool = True
+    NOTIFICATION_WORKERS: int = 2
+    NOTIFICATION_BATCH_SIZE: int = 100
+    NOTIFICATION_POLL_INTERVAL_SECONDS: float = 2
+    NOTIFICATION_MAX_ATTEMPTS: int = 8
+    NOTIFICATION_RETRY_DELAY_SECONDS: float = 30
+    # "local" or "s3", where new uploads are stored
+    STORAGE_BACKEND: str = "local"
+    S3_BUCKET: str = ""
+    S3_ENDPOINT_URL: Optional[str] = None
+    S3_REGION: Optional[str] = None
+    S3_ACCESS_KEY_ID: Optional[str] = None
+    S3_SECRET_ACCESS_KEY: Optional[str] = None
+    # Base URL objects are served from, e.g. https://<bucket>.s3.amazonaws.com
+    S3_PUBLIC_URL: str = ""
+    S3_MULTIPART_CHUNK_SIZE: int = 8 * 1024 * 1024
+    S3_PRESIGN_EXPIRES_SECONDS: int = 3600
     SERVER_NAME: str = ""
     SERVER_HOST: AnyHttpUrl = ""
     MEDIA_HOSTS: dict = {}
 
-    @validator("MEDIA_HOSTS", check_fields=False)
+    @validator("MEDIA_HOSTS", always=True, check_fields=False)
     def get_media_hosts(cls, v: Optional[str], values: Dict[str, Any]) -> dict:
-        return {"local": values["SERVER_HOST"], "s3": "", "youtube": ""}
+        return {
+            "local": values.get("SERVER_HOST") or "",
+            "s3": values.get("S3_PUBLIC_URL") or "",
+            "youtube": "",
+        }
 
 
 settings = Settings()
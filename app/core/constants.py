@@ -62,6 +62,14 @@ class ProductStatus:
 product_transfer_status = ProductStatus()
 
 
+class NotificationStatus:
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+
+notification_status = NotificationStatus()
+
+
 class RoleAuthentication:
     roles_all = [role_key.ADMIN, role_key.OWNER, role_key.CUSTOMER]
     roles_admin = [role_key.ADMIN]
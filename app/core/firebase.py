@@ -1,103 +1,343 @@
+import asyncio
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
 from firebase_admin import messaging
 
-class FireBase():
+from app.core.config import settings
+from app.core.logger import logger
+
+
+class FCMTransport():
+    """
+    Talks to Firebase Cloud Messaging through the Admin SDK
+    """
+
+    name = "fcm"
+
+    def send_all(self, messages: List[messaging.Message]) -> List[Optional[str]]:
+        """
+            Send up to 500 messages in one batch request
+            Return the error of each message, None when it was delivered
+        """
+        response = messaging.send_all(messages)
+        return [
+            None if result.success else str(result.exception)
+            for result in response.responses
+        ]
+
+    def subscribe(self, tokens: List[str], topic: str) -> List[str]:
+        response = messaging.subscribe_to_topic(tokens, topic)
+        return [error.reason for error in response.errors]
+
+    def unsubscribe(self, tokens: List[str], topic: str) -> List[str]:
+        response = messaging.unsubscribe_from_topic(tokens, topic)
+        return [error.reason for error in response.errors]
+
+
+class FakeTransport():
+    """
+    In-memory stand-in for FCM, for tests and local development
+    """
+
+    name = "fake"
 
     def __init__(self) -> None:
-        pass
+        self.sent: List[messaging.Message] = []
+        self.subscriptions: Dict[str, set] = defaultdict(set)
+
+    def send_all(self, messages: List[messaging.Message]) -> List[Optional[str]]:
+        self.sent.extend(messages)
+        return [None for _ in messages]
+
+    def subscribe(self, tokens: List[str], topic: str) -> List[str]:
+        self.subscriptions[topic].update(tokens)
+        return []
+
+    def unsubscribe(self, tokens: List[str], topic: str) -> List[str]:
+        self.subscriptions[topic].difference_update(tokens)
+        return []
+
+
+TRANSPORTS = {
+    FCMTransport.name: FCMTransport,
+    FakeTransport.name: FakeTransport,
+}
+
+
+class FireBase():
+    # FCM rejects batches of more than 500 messages
+    MAX_BATCH_SIZE = 500
+
+    def __init__(self, transport=None) -> None:
+        self.transport = transport or FCMTransport()
 
     def subscribe(self, **kwargs):
         """
             Multiple tokens subscribe multiple topics
         """
-        print("subscribe", kwargs)
+        logger.info(f"subscribe {kwargs}")
         tokens = kwargs.get("tokens", [])
         topics = kwargs.get("topics", [])
         try:
             for topic in topics:
-                response = messaging.subscribe_to_topic(tokens, topic)
-                if response.failure_count > 0:
-                    print(
-                        f"Failed to subscribe to topic {topic} due to {list(map(lambda e: e.reason,response.errors))}")
-        except Exception as e:
-            print(e)
+                errors = self.transport.subscribe(tokens, topic)
+                if errors:
+                    logger.warning(f"Failed to subscribe to topic {topic} due to {errors}")
+        except Exception:
+            logger.exception("Failed to subscribe to topics")
+
     def unsubscribe(self, **kwargs):
         """
             Multiple tokens unsubscribe multiple topics
         """
-        print("unsubscribe", kwargs)
+        logger.info(f"unsubscribe {kwargs}")
         tokens = kwargs.get("tokens", [])
         topics = kwargs.get("topics", [])
         try:
             for topic in topics:
-                response = messaging.unsubscribe_from_topic(tokens, topic)
-                if response.failure_count > 0:
-                    print(
-                        f"Failed to unsubscribe from topic {topic} due to {list(map(lambda e: e.reason,response.errors))}")
-        except Exception as e:
-            print(e)
+                errors = self.transport.unsubscribe(tokens, topic)
+                if errors:
+                    logger.warning(f"Failed to unsubscribe from topic {topic} due to {errors}")
+        except Exception:
+            logger.exception("Failed to unsubscribe from topics")
+
+    def build_message(
+        self,
+        title: str,
+        body: str,
+        data: dict,
+        topic: Optional[str] = None,
+        token: Optional[str] = None,
+        image_url: Optional[str] = None,
+    ) -> messaging.Message:
+        # FCM only accepts absolute image urls
+        if image_url and not image_url.startswith("http"):
+            image_url = None
+        return messaging.Message(
+            data=data,
+            notification=messaging.Notification(
+                title=title,
+                body=body,
+                image=image_url,
+            ),
+            topic=topic,
+            token=token,
+            apns=messaging.APNSConfig(
+                payload=messaging.APNSPayload(aps=messaging.Aps(content_available=True))
+            ),
+            android=messaging.AndroidConfig(
+                priority="high",
+                notification=messaging.AndroidNotification(
+                    priority="max",
+                    # channel_id="high_importance_channel"
+                )
+            )
+        )
+
+    def send_all(self, messages: List[messaging.Message]) -> List[Optional[str]]:
+        """
+            Send messages in batches of at most MAX_BATCH_SIZE
+            Return the error of each message, None when it was delivered
+        """
+        errors = []
+        for start in range(0, len(messages), self.MAX_BATCH_SIZE):
+            errors.extend(self.transport.send_all(messages[start:start + self.MAX_BATCH_SIZE]))
+        return errors
+
     def send_to_topics(self, **kwargs):
         """
-            Send to multiple topics  
-            **kwargs:  
+            Send to multiple topics
+            **kwargs:
                 - title: Title
                 - body: Content
                 - data: Dict of data
                 - topics: Dict of data
         """
-        print("send_to_topics", kwargs)
+        logger.info(f"send_to_topics {kwargs}")
         title = kwargs.get("title", "")
         body = kwargs.get("body", "")
         data = kwargs.get("data", {})
         topics = kwargs.get("topics", [])
+        messages = [
+            self.build_message(title, body, data, topic=topic)
+            for topic in topics
+        ]
         try:
-            for topic in topics:
-                message = messaging.Message(
-                    data=data,
-                    notification=messaging.Notification(
-                        title=title,
-                        body=body,
-                    ),
-                    topic=topic,
-                    apns=messaging.APNSConfig(
-                        payload=messaging.APNSPayload(aps=messaging.Aps(content_available=True))
-                    ),
-                    android=messaging.AndroidConfig(
-                        priority="high",
-                        notification=messaging.AndroidNotification(
-                            priority="max", 
-                            # channel_id="high_importance_channel"
-                        )
-                    )
-                )
-                messaging.send(message)
-        except Exception as e:
-            print(e)
+            errors = self.send_all(messages)
+            failed = [error for error in errors if error is not None]
+            if failed:
+                logger.warning(f"Failed to send {len(failed)} messages due to {failed}")
+        except Exception:
+            logger.exception("Failed to send to topics")
 
     def send_to_tokens(self, **kwargs):
         data = kwargs.get("data", {})
         title = kwargs.get("title", "")
         body = kwargs.get("body", "")
         tokens = kwargs.get("tokens", [])
-        message = messaging.MulticastMessage(
-            data=data,
-            notification=messaging.Notification(
-                title=title,
-                body=body
-            ),
-            tokens=tokens
-        )
-        messaging.send_multicast(message)
+        messages = [
+            self.build_message(title, body, data, token=token)
+            for token in tokens
+        ]
+        self.send_all(messages)
 
     def send_to_token(self, **kwargs):
         title = kwargs.get("title", "")
         body = kwargs.get("body", "")
         token = kwargs.get("token", "")
-        message = messaging.Message(
-            notification=messaging.Notification(
-                title=title,
-                body=body
-            ),
-            token=token
+        self.send_all([self.build_message(title, body, {}, token=token)])
+
+
+class AsyncFireBase():
+    """
+    Non-blocking facade over `FireBase`.
+
+    The blocking SDK calls run in a dedicated thread pool, at most
+    `max_concurrent_batches` of them at once. Messages are sent in batches of
+    `FireBase.MAX_BATCH_SIZE` and duplicate topics of one event are sent once.
+    `stats()` reports batch and message counters and batch latency.
+    """
+
+    def __init__(
+        self, firebase: FireBase, workers: int, max_concurrent_batches: int
+    ) -> None:
+        self.firebase = firebase
+        self.workers = workers
+        self.max_concurrent_batches = max_concurrent_batches
+        self.batches_sent = 0
+        self.batches_failed = 0
+        self.messages_sent = 0
+        self.messages_failed = 0
+        self.last_batch_latency = 0.0
+        self.max_batch_latency = 0.0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="firebase"
+            )
+        return self._executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent_batches)
+        return self._semaphore
+
+    async def _run(self, func: Callable, *args: Any) -> Any:
+        async with self._get_semaphore():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+
+    async def _send_batch(self, messages: List[messaging.Message]) -> List[Optional[str]]:
+        started = time.monotonic()
+        try:
+            errors = await self._run(self.firebase.transport.send_all, messages)
+        except Exception as e:
+            logger.exception(f"Failed to send a batch of {len(messages)} messages")
+            errors = [str(e) for _ in messages]
+        latency = time.monotonic() - started
+
+        failed = len([error for error in errors if error is not None])
+        self.last_batch_latency = latency
+        self.max_batch_latency = max(self.max_batch_latency, latency)
+        self.messages_sent += len(messages) - failed
+        self.messages_failed += failed
+        if failed:
+            self.batches_failed += 1
+            logger.warning(
+                f"Sent batch of {len(messages)} messages in {latency * 1000:.0f}ms, {failed} failed"
+            )
+        else:
+            self.batches_sent += 1
+            logger.info(f"Sent batch of {len(messages)} messages in {latency * 1000:.0f}ms")
+        return errors
+
+    async def send_all(self, messages: List[messaging.Message]) -> List[Optional[str]]:
+        """
+            Send messages in concurrent batches of at most MAX_BATCH_SIZE
+            Return the error of each message, None when it was delivered
+        """
+        size = self.firebase.MAX_BATCH_SIZE
+        results = await asyncio.gather(*[
+            self._send_batch(messages[start:start + size])
+            for start in range(0, len(messages), size)
+        ])
+        return [error for errors in results for error in errors]
+
+    async def send_to_topics(
+        self,
+        title: str,
+        body: str,
+        data: dict,
+        topics: Iterable[str],
+        image_url: Optional[str] = None,
+    ) -> List[Optional[str]]:
+        messages = [
+            self.firebase.build_message(title, body, data, topic=topic, image_url=image_url)
+            for topic in unique_topics(topics)
+        ]
+        return await self.send_all(messages)
+
+    async def _update_subscriptions(
+        self, func: Callable, action: str, tokens: List[str], topics: Iterable[str]
+    ) -> None:
+        topics = unique_topics(topics)
+        results = await asyncio.gather(
+            *[self._run(func, tokens, topic) for topic in topics],
+            return_exceptions=True,
         )
-        messaging.send(message)
-_firebase = FireBase()
+        for topic, result in zip(topics, results):
+            if isinstance(result, Exception):
+                logger.error(f"Failed to {action} topic {topic}: {result}")
+            elif result:
+                logger.warning(f"Failed to {action} topic {topic} due to {result}")
+
+    async def subscribe(self, tokens: List[str], topics: Iterable[str]) -> None:
+        await self._update_subscriptions(
+            self.firebase.transport.subscribe, "subscribe to", tokens, topics
+        )
+
+    async def unsubscribe(self, tokens: List[str], topics: Iterable[str]) -> None:
+        await self._update_subscriptions(
+            self.firebase.transport.unsubscribe, "unsubscribe from", tokens, topics
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches_sent": self.batches_sent,
+            "batches_failed": self.batches_failed,
+            "messages_sent": self.messages_sent,
+            "messages_failed": self.messages_failed,
+            "last_batch_latency": self.last_batch_latency,
+            "max_batch_latency": self.max_batch_latency,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+def unique_topics(topics: Iterable[str]) -> List[str]:
+    """
+        Drop empty and duplicate topics, keeping their order
+    """
+    return list(dict.fromkeys(topic for topic in topics if topic))
+
+
+def get_transport(name: str):
+    return TRANSPORTS[name]()
+
+
+_firebase = FireBase(transport=get_transport(settings.FIREBASE_TRANSPORT))
+async_firebase = AsyncFireBase(
+    _firebase,
+    workers=settings.FIREBASE_WORKERS,
+    max_concurrent_batches=settings.FIREBASE_MAX_CONCURRENT_BATCHES,
+)
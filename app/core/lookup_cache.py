@@ -0,0 +1,88 @@
+import asyncio
+import time
+import uuid
+from typing import Dict, Optional
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.db import async_session_maker
+from app.models.role import Role
+from app.models.transfer_status import TransferStatus
+from app.schemas.roles import Role as RoleSchema
+from app.schemas.transfer import TransferStatus as TransferStatusSchema
+
+
+class LookupCache():
+    """
+    Process-wide cache of the small lookup tables `role` and `transfer_status`.
+
+    The tables are loaded at startup and reloaded on the next read once
+    `ttl` seconds have passed or `invalidate()` has been called.
+    """
+
+    def __init__(self, ttl: int) -> None:
+        self.ttl = ttl
+        self._roles_by_id: Dict[uuid.UUID, RoleSchema] = {}
+        self._roles_by_key: Dict[str, RoleSchema] = {}
+        self._statuses_by_id: Dict[uuid.UUID, TransferStatusSchema] = {}
+        self._statuses_by_name: Dict[str, TransferStatusSchema] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def load(self) -> None:
+        async with async_session_maker() as session:
+            roles = (await session.execute(select(Role))).scalars().all()
+            statuses = (await session.execute(select(TransferStatus))).scalars().all()
+
+        roles = [RoleSchema.from_orm(role) for role in roles]
+        statuses = [TransferStatusSchema.from_orm(status) for status in statuses]
+        self._roles_by_id = {role.id: role for role in roles}
+        self._roles_by_key = {role.key: role for role in roles}
+        self._statuses_by_id = {status.id: status for status in statuses}
+        self._statuses_by_name = {status.name.lower(): status for status in statuses}
+        self._loaded_at = time.monotonic()
+        logger.info(f"Lookup cache loaded {len(roles)} roles, {len(statuses)} transfer statuses")
+
+    def invalidate(self) -> None:
+        self._loaded_at = None
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._loaded_at is not None
+            and time.monotonic() - self._loaded_at < self.ttl
+        )
+
+    async def _ensure_fresh(self) -> None:
+        if self._is_fresh():
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            # Another coroutine may have reloaded while we were waiting
+            if not self._is_fresh():
+                await self.load()
+
+    async def get_role_by_id(self, role_id: uuid.UUID) -> Optional[RoleSchema]:
+        await self._ensure_fresh()
+        return self._roles_by_id.get(role_id)
+
+    async def get_role_by_key(self, key: str) -> Optional[RoleSchema]:
+        await self._ensure_fresh()
+        return self._roles_by_key.get(key)
+
+    async def get_transfer_status_by_id(
+        self, status_id: uuid.UUID
+    ) -> Optional[TransferStatusSchema]:
+        await self._ensure_fresh()
+        return self._statuses_by_id.get(status_id)
+
+    async def get_transfer_status_by_name(
+        self, name: str
+    ) -> Optional[TransferStatusSchema]:
+        await self._ensure_fresh()
+        return self._statuses_by_name.get(name.lower())
+
+
+lookup_cache = LookupCache(ttl=settings.LOOKUP_CACHE_TTL_SECONDS)
@@ -0,0 +1,50 @@
+from typing import Optional
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.db import async_session_maker
+from app.utils import media_store
+from app.utils.storage import get_storage
+
+
+class MediaGarbageCollector():
+    """
+    Periodically deletes the media blobs no live Resource references,
+    see `media_store.collect_garbage`
+    """
+
+    def __init__(self, interval_minutes: int) -> None:
+        self.interval_minutes = interval_minutes
+        self._scheduler: Optional[AsyncIOScheduler] = None
+
+    def start(self) -> None:
+        self._scheduler = AsyncIOScheduler()
+        self._scheduler.add_job(
+            self.run_once,
+            "interval",
+            minutes=self.interval_minutes,
+            max_instances=1,
+            coalesce=True,
+        )
+        self._scheduler.start()
+
+    def stop(self) -> None:
+        if self._scheduler is not None:
+            self._scheduler.shutdown(wait=False)
+            self._scheduler = None
+
+    async def run_once(self) -> int:
+        try:
+            deleted = 0
+            async with async_session_maker() as session:
+                for name in {"local", settings.STORAGE_BACKEND}:
+                    deleted += await media_store.collect_garbage(session, get_storage(name))
+            return deleted
+        except Exception:
+            logger.exception("Media garbage collector failed")
+            return 0
+
+
+media_gc = MediaGarbageCollector(settings.MEDIA_GC_INTERVAL_MINUTES)
@@ -0,0 +1,131 @@
+import asyncio
+from typing import Dict, List, Optional
+
+from app import crud
+from app.core.config import settings
+from app.core.firebase import AsyncFireBase, async_firebase, unique_topics
+from app.core.logger import logger
+from app.db import async_session_maker
+
+
+class NotificationOutboxWorker():
+    """
+    Drains the `notification_outbox` table and pushes the notifications
+    through AsyncFireBase.
+
+    Each of the `workers` coroutines claims a batch with
+    SELECT ... FOR UPDATE SKIP LOCKED, so several workers, in one or many
+    processes, never send the same row twice. Failed topics are retried with
+    exponential backoff.
+    """
+
+    def __init__(
+        self,
+        firebase: AsyncFireBase,
+        workers: int,
+        batch_size: int,
+        poll_interval: float,
+        max_attempts: int,
+        retry_delay: float,
+    ) -> None:
+        self.firebase = firebase
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        for _ in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._run()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                processed = await self.drain_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Notification outbox worker failed")
+                processed = 0
+            if not processed:
+                await asyncio.sleep(self.poll_interval)
+
+    async def drain_once(self) -> int:
+        """
+        Send one batch of due notifications, return how many were claimed
+        """
+        async with async_session_maker() as session:
+            notifications = await crud.notification_outbox.claim_batch(session, self.batch_size)
+            if not notifications:
+                await session.commit()
+                return 0
+
+            messages = []
+            owners = []
+            for notification in notifications:
+                for topic in unique_topics(notification.topics):
+                    messages.append(
+                        self.firebase.firebase.build_message(
+                            notification.title,
+                            notification.body,
+                            notification.data or {},
+                            topic=topic,
+                            image_url=notification.image_url,
+                        )
+                    )
+                    owners.append((notification, topic))
+
+            errors = await self.firebase.send_all(messages)
+
+            failures: Dict[object, List[str]] = {}
+            last_errors: Dict[object, Optional[str]] = {}
+            for (notification, topic), error in zip(owners, errors):
+                if error is not None:
+                    failures.setdefault(notification.id, []).append(topic)
+                    last_errors[notification.id] = error
+
+            for notification in notifications:
+                if notification.id in failures:
+                    crud.notification_outbox.mark_failed(
+                        session,
+                        notification,
+                        last_errors[notification.id],
+                        failures[notification.id],
+                        self.max_attempts,
+                        self.retry_delay,
+                    )
+                else:
+                    crud.notification_outbox.mark_sent(session, notification)
+            await session.commit()
+        return len(notifications)
+
+
+notification_worker = NotificationOutboxWorker(
+    firebase=async_firebase,
+    workers=settings.NOTIFICATION_WORKERS,
+    batch_size=settings.NOTIFICATION_BATCH_SIZE,
+    poll_interval=settings.NOTIFICATION_POLL_INTERVAL_SECONDS,
+    max_attempts=settings.NOTIFICATION_MAX_ATTEMPTS,
+    retry_delay=settings.NOTIFICATION_RETRY_DELAY_SECONDS,
+)
+
+
+async def main() -> None:
+    from app.factory import init_firebase
+
+    init_firebase()
+    notification_worker.start()
+    await asyncio.gather(*notification_worker._tasks)
+
+
+if __name__ == "__main__":
+    # Run the worker pool as its own process: python -m app.core.notification_worker
+    asyncio.run(main())
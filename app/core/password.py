@@ -0,0 +1,104 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi_users.password import PasswordHelper
+
+from app.core.config import settings
+from app.core.logger import logger
+
+password_helper = PasswordHelper()
+
+
+def _hash(password: str) -> str:
+    return password_helper.hash(password)
+
+
+def _verify_and_update(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    return password_helper.verify_and_update(plain_password, hashed_password)
+
+
+class PasswordHashPool():
+    """
+    Runs password hashing and verification in a worker pool so bcrypt never
+    blocks the event loop.
+
+    At most `max_concurrency` jobs are handed to the pool at once, the others
+    wait in line; `stats()` reports how many are waiting and running.
+    """
+
+    def __init__(
+        self, workers: int, max_concurrency: int, use_processes: bool = False
+    ) -> None:
+        self.workers = workers
+        self.max_concurrency = max_concurrency
+        self.use_processes = use_processes
+        self.waiting = 0
+        self.in_flight = 0
+        self.completed = 0
+        self._executor: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.use_processes:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="password-hash"
+                )
+        return self._executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _run(self, func: Callable, *args: Any) -> Any:
+        semaphore = self._get_semaphore()
+        self.waiting += 1
+        if self.waiting > self.max_concurrency:
+            logger.warning(f"Password hash queue depth is {self.waiting}")
+        try:
+            await semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            semaphore.release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password)
+
+    async def verify_and_update(
+        self, plain_password: str, hashed_password: str
+    ) -> Tuple[bool, Optional[str]]:
+        return await self._run(_verify_and_update, plain_password, hashed_password)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queue_depth": self.waiting,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "max_concurrency": self.max_concurrency,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+password_pool = PasswordHashPool(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_concurrency=settings.PASSWORD_HASH_MAX_CONCURRENCY,
+    use_processes=settings.PASSWORD_HASH_USE_PROCESSES,
+)
@@ -6,4 +6,5 @@ from .crud_fertilizer import fertilizer
 from .crud_tree import tree
 from .crud_transfer_status import transfer_status
 from .crud_transfer_request import transfer_request
-from .crud_product_history import product_history
\ No newline at end of file
+from .crud_product_history import product_history
+from .crud_notification_outbox import notification_outbox
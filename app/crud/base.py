@@ -1,16 +1,22 @@
 from datetime import datetime
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+from typing import Any, Dict, Generic, List, Optional, Tuple, Type, TypeVar, Union
 import uuid
 
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
-from sqlalchemy import select
+from sqlalchemy import func, insert, select, text
 from sqlalchemy.orm import Session
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import BinaryExpression, BooleanClauseList, Null
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db import Base
 from app.models.item_resources import ItemResources
 from app.models.resource import Resource
+from app.models.rfids import Rfids, rfid_code_seq
+from app.utils.codes import encode_code
+from app.utils.ids import uuid7
+from app.utils.storage import media_url
 
 ModelType = TypeVar("ModelType", bound=Base)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
@@ -73,6 +79,179 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     #     db.commit()
     #     return obj
 
+    async def unique_code(self, db: AsyncSession) -> str:
+        """
+        Allocate an item code from `rfid_code_seq`. Codes never repeat, the
+        unique constraint on `rfids.code` guards against clashes with codes
+        generated before the sequence existed.
+        """
+        return encode_code(await db.scalar(select(rfid_code_seq.next_value())))
+
+    async def unique_codes(self, db: AsyncSession, count: int) -> List[str]:
+        """
+        Allocate `count` item codes in one round trip
+        """
+        if count <= 0:
+            return []
+        numbers = (
+            await db.execute(
+                select(rfid_code_seq.next_value())
+                .select_from(func.generate_series(1, count))
+            )
+        ).scalars().all()
+        return [encode_code(number) for number in numbers]
+
+    async def estimated_count(self, db: AsyncSession) -> Optional[int]:
+        """
+        Row count of the model's table estimated by the planner, None when
+        the table has not been analyzed yet
+        """
+        total = await db.scalar(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:table AS regclass)"),
+            {"table": self.model.__tablename__},
+        )
+        if total is None or total < 0:
+            return None
+        return total
+
+    def is_unfiltered(self, query) -> bool:
+        """
+        Whether `query` has no WHERE criteria but the soft delete filter of
+        the model, i.e. whether the table estimate can stand for its count
+        """
+        criteria = query.whereclause
+        if criteria is None:
+            return True
+        if isinstance(criteria, BooleanClauseList) and criteria.operator is operators.and_:
+            criteria = criteria.clauses
+        else:
+            criteria = [criteria]
+        return all(
+            isinstance(criterion, BinaryExpression)
+            and criterion.operator is operators.is_
+            and isinstance(criterion.right, Null)
+            and getattr(criterion.left, "table", None) is self.model.__table__
+            and criterion.left.name == "deleted_at"
+            for criterion in criteria
+        )
+
+    async def fetch_page(
+        self, db: AsyncSession, query, request_params
+    ) -> Tuple[List[Any], int]:
+        """
+        Run a paginated query and return its rows with the total number of
+        matching rows, counted in the same statement by count(*) OVER ().
+
+        With `count=estimated` the total is the planner's estimate of the
+        whole table, meant for large unfiltered listings. Filtered, searched
+        or user scoped queries are always counted exactly.
+        """
+        if request_params.count == "estimated" and self.is_unfiltered(query):
+            total = await self.estimated_count(db)
+            if total is not None:
+                rows = (await db.execute(query)).all()
+                return rows, total
+
+        result = await db.execute(
+            query.add_columns(func.count().over().label("total_count"))
+        )
+        frozen = result.freeze()
+        rows = frozen().all()
+        if rows:
+            total = rows[0].total_count
+            # Hand back the rows without the total column
+            rows = frozen().columns(*range(len(rows[0]) - 1)).all()
+        elif request_params.skip:
+            # Past the last page, count without the page window
+            total = await db.scalar(
+                select(func.count()).select_from(
+                    query.order_by(None).limit(None).offset(None).subquery()
+                )
+            )
+        else:
+            total = 0
+        return rows, total
+
+    async def commit_or_flush(self, db: AsyncSession, commit: bool = True) -> None:
+        """
+        Commit, or only flush when the caller owns the transaction and
+        commits it once at the end (`commit=False`).
+        """
+        if commit:
+            await db.commit()
+        else:
+            await db.flush()
+
+    async def bulk_insert(
+        self, db: AsyncSession, model: Type[Base], rows: List[Dict[str, Any]]
+    ) -> None:
+        """
+        Multi-row INSERT of `rows`, split so one statement stays under the
+        Postgres limit of 32767 bind parameters
+        """
+        if not rows:
+            return
+        chunk_size = max(32767 // len(rows[0]), 1)
+        for start in range(0, len(rows), chunk_size):
+            await db.execute(insert(model).values(rows[start:start + chunk_size]))
+
+    async def create_many(
+        self, db: AsyncSession, objs_in: List[CreateSchemaType], item_type: str, **kwargs
+    ) -> List[Dict[str, Any]]:
+        """
+        Insert one row and its RFID per item of `objs_in` with multi-row
+        INSERTs, codes are allocated in one round trip. Return the id and
+        code of each row. The caller commits.
+        """
+        updated_by = kwargs.get("updated_by")
+        codes = await self.unique_codes(db, len(objs_in))
+        rows = [
+            {**obj_in.dict(), "id": uuid7(), "code": code, "updated_by": updated_by}
+            for obj_in, code in zip(objs_in, codes)
+        ]
+        await self.bulk_insert(db, self.model, rows)
+        await self.bulk_insert(
+            db,
+            Rfids,
+            [
+                {
+                    "id": uuid7(),
+                    "code": row["code"],
+                    "item_id": row["id"],
+                    "item_type": item_type,
+                    "updated_by": updated_by,
+                }
+                for row in rows
+            ],
+        )
+        return [{"id": row["id"], "code": row["code"]} for row in rows]
+
+    async def add_resources_to_items(
+        self,
+        db: AsyncSession,
+        resources: List[Resource],
+        item_ids: List[uuid.UUID],
+        item_type: str,
+    ) -> None:
+        """
+        Attach the same resources to every item, without committing
+        """
+        await self.bulk_insert(
+            db,
+            ItemResources,
+            [
+                {
+                    "id": uuid7(),
+                    "item_type": item_type,
+                    "item_id": item_id,
+                    "resource_id": resource.id,
+                    "updated_by": resource.updated_by,
+                }
+                for item_id in item_ids
+                for resource in resources
+            ],
+        )
+
     async def add_resources(
         self, db: AsyncSession, resources: List[Resource], item_id: uuid.UUID, item_type: str
     ) -> List[Resource]:
@@ -81,7 +260,7 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         items = []
         for obj in resources:
             item = ItemResources(
-                id=uuid.uuid4(),
+                id=uuid7(),
                 item_type=item_type,
                 item_id=item_id,
                 resource_id=obj.id,
@@ -104,6 +283,7 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
                         ItemResources.item_type == item_type,
                         Resource.id == ItemResources.resource_id,
                         ItemResources.deleted_at == None,
+                        Resource.deleted_at == None,
                     )
                 )
             )
@@ -112,6 +292,58 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         )
         return resources
 
+    async def get_thumbnail(
+        self, db: AsyncSession, item_id: uuid.UUID, item_type: str
+    ) -> Optional[str]:
+        """
+        Thumbnail URL of an item, e.g. for notification images
+        """
+        row = (
+            await db.execute(
+                select(Resource.file_path, Resource.storage, Resource.variants)
+                .filter(
+                    ItemResources.item_id == item_id,
+                    ItemResources.item_type == item_type,
+                    Resource.id == ItemResources.resource_id,
+                    ItemResources.deleted_at == None,
+                    Resource.deleted_at == None,
+                )
+                .limit(1)
+            )
+        ).first()
+        if not row:
+            return None
+        return media_url((row.variants or {}).get("thumb") or row.file_path, row.storage)
+
+    async def get_resources_for_items(
+        self, db: AsyncSession, item_ids: List[uuid.UUID], item_type: str
+    ) -> Dict[uuid.UUID, List[Resource]]:
+        """
+        Batched version of `get_resources`: load resources of every item in
+        one query and group them by item id. Items without resources map to
+        an empty list.
+        """
+        resources_by_item: Dict[uuid.UUID, List[Resource]] = {
+            item_id: [] for item_id in item_ids
+        }
+        if not resources_by_item:
+            return resources_by_item
+        rows = (
+            await db.execute(
+                select(ItemResources.item_id, Resource)
+                .filter(
+                    ItemResources.item_id.in_(list(resources_by_item)),
+                    ItemResources.item_type == item_type,
+                    Resource.id == ItemResources.resource_id,
+                    ItemResources.deleted_at == None,
+                    Resource.deleted_at == None,
+                )
+            )
+        ).all()
+        for row in rows:
+            resources_by_item[row.item_id].append(row.Resource)
+        return resources_by_item
+
     async def delete_resources(
         self, db: AsyncSession, resource_ids: List[uuid.UUID], item_id: uuid.UUID, item_type: str
     ) -> None:
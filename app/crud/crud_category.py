@@ -7,6 +7,7 @@ from app.models.categories import Categories
 from app.schemas.categories import CategoryCreate, CategoryUpdate
 
 from app.db import Base
+from app.utils.ids import uuid7
 
 
 class CRUDCategory(CRUDBase[Categories, CategoryCreate, CategoryUpdate]):
@@ -35,7 +36,7 @@ class CRUDCategory(CRUDBase[Categories, CategoryCreate, CategoryUpdate]):
     async def create_category(self, db: AsyncSession, category_in: CategoryCreate
     ) -> Any:
         new_category = Categories(
-            id = uuid.uuid4(),
+            id = uuid7(),
             name = category_in.name,
             description = category_in.description,
         )
@@ -1,12 +1,16 @@
 from datetime import datetime
-from typing import Any, List
+from typing import Any, List, Optional
 import uuid
-from sqlalchemy import select, func, and_
+from sqlalchemy import select, func, and_, text, update
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio.session import AsyncSession
 from app.crud.base import CRUDBase
+from app.crud.pagination import paginate
+from app.crud.search import search_filter, search_rank
 from app.models.farm_fertilizers import FarmFertilizers
 from app.models.farm_trees import FarmTrees
 from app.models.farms import Farms
+from app.models.farm_summary import FarmSummary
 from app.models.fertilizers import Fertilizers
 from app.models.rfids import Rfids
 from app.models.trees import Trees
@@ -15,12 +19,14 @@ from app.schemas.farms import FarmCreate, FarmUpdate
 from app.models.users import User
 from app.schemas.item_resources import ItemResource as ItemResourceSchema
 from app.models.item_resources import ItemResources
-from app.schemas.farm_fertilizers import FarmFertilizer as FarmFertilizerSchema
-from app.schemas.farm_trees import FarmTree as FarmTreeSchema
 from app.core.constants import resource_type, rfid_type
-from app.utils.random import random_string_and_number
+from app.utils.ids import uuid7
+
+EMPTY_JSON_ARRAY = text("'[]'::jsonb")
+
 
 class CRUDFarm(CRUDBase[Farms, FarmCreate, FarmUpdate]):
+    search_columns = (Farms.name, Farms.code)
 
     async def get_only_farm_by_id(self, db: AsyncSession, farm_id: uuid.UUID
     ) -> Any:
@@ -33,52 +39,24 @@ class CRUDFarm(CRUDBase[Farms, FarmCreate, FarmUpdate]):
         ).scalars().first()
         return farm
 
+    def _summary_query(self) -> Any:
+        return (
+            select(
+                Farms,
+                FarmSummary.fertilizers.label("fertilizers"),
+                FarmSummary.trees.label("trees"),
+                FarmSummary.rfid.label("Rfids"),
+                FarmSummary.resources.label("resources"),
+            )
+            .outerjoin(FarmSummary, FarmSummary.farm_id == Farms.id)
+            .filter(Farms.deleted_at == None)
+        )
+
     async def get_farm_by_id(self, db: AsyncSession, farm_id: uuid.UUID
     ) -> Any:
-        fertilizers = func.array_agg(
-            func.distinct(Fertilizers.id.label("id"), Fertilizers.name.label("name"))
-        ).label("fertilizers")
-        trees = func.array_agg(
-            func.distinct(Trees.id.label("id"), Trees.name.label("name"))
-        ).label("trees")
         farm = (
             await db.execute(
-                select(
-                    Farms,
-                    fertilizers,
-                    trees,
-                    Rfids
-                )
-                .filter(Farms.id == farm_id)
-                .filter(Farms.deleted_at == None)
-                .outerjoin(FarmFertilizers, and_(
-                    FarmFertilizers.farm_id == Farms.id,
-                    FarmFertilizers.deleted_at == None
-                    )
-                )
-                .outerjoin(Fertilizers, and_(
-                    FarmFertilizers.fertilizer_id == Fertilizers.id,
-                    Fertilizers.deleted_at == None
-                    )
-                )
-                .outerjoin(FarmTrees, and_(
-                    FarmTrees.farm_id == Farms.id,
-                    FarmTrees.deleted_at == None
-                )
-                )
-                .outerjoin(Trees, and_(
-                    FarmTrees.tree_id == Trees.id,
-                    Trees.deleted_at == None
-                    )
-                )
-                .outerjoin(Rfids, and_(
-                    Rfids.item_type == rfid_type.FARM,
-                    Rfids.item_id == Farms.id,
-                    Rfids.deleted_at == None
-                    )
-                )
-                .group_by(Farms.id)
-                .group_by(Rfids.id)
+                self._summary_query().filter(Farms.id == farm_id)
             )
         ).first()
 
@@ -86,127 +64,160 @@ class CRUDFarm(CRUDBase[Farms, FarmCreate, FarmUpdate]):
 
     async def get_all_farms(self, db: AsyncSession
     ) -> Any:
-        fertilizers = func.array_agg(
-            func.distinct(Fertilizers.id.label("id"), Fertilizers.name.label("name"))
-        ).label("fertilizers")
-        trees = func.array_agg(
-            func.distinct(Trees.id.label("id"), Trees.name.label("name"))
-        ).label("trees")
         farms = (
-            await db.execute(
-                select(
-                    Farms,
-                    fertilizers,
-                    trees,
-                    Rfids
-                )
-                .filter(Farms.deleted_at == None)
-                .outerjoin(FarmFertilizers, and_(
-                    FarmFertilizers.farm_id == Farms.id,
-                    FarmFertilizers.deleted_at == None
-                    )
-                )
-                .outerjoin(Fertilizers, and_(
-                    FarmFertilizers.fertilizer_id == Fertilizers.id,
-                    Fertilizers.deleted_at == None
-                    )
-                )
-                .outerjoin(FarmTrees, and_(
-                    FarmTrees.farm_id == Farms.id,
-                    FarmTrees.deleted_at == None
-                )
-                )
-                .outerjoin(Trees, and_(
-                    FarmTrees.tree_id == Trees.id,
-                    Trees.deleted_at == None
-                    )
-                )
-                .outerjoin(Rfids, and_(
-                    Rfids.item_type == rfid_type.FARM,
-                    Rfids.item_id == Farms.id,
-                    Rfids.deleted_at == None
-                    )
-                )
-                .group_by(Farms.id)
-                .group_by(Rfids.id)
-            )
+            await db.execute(self._summary_query())
         ).all()
 
         return farms
 
     async def get_farms_by_user_id(self, db: AsyncSession, user_id: uuid.UUID
     ) -> Any:
-        fertilizers = func.array_agg(
-            func.distinct(Fertilizers.id.label("id"), Fertilizers.name.label("name"))
-        ).label("fertilizers")
-        trees = func.array_agg(
-            func.distinct(Trees.id.label("id"), Trees.name.label("name"))
-        ).label("trees")
         farms = (
             await db.execute(
-                select(
-                    Farms,
-                    fertilizers,
-                    trees,
-                    Rfids
-                )
-                .filter(Farms.user_id == user_id)
-                .filter(Farms.deleted_at == None)
-                .outerjoin(FarmFertilizers, and_(
-                    FarmFertilizers.farm_id == Farms.id,
-                    FarmFertilizers.deleted_at == None
-                    )
-                )
-                .outerjoin(Fertilizers, and_(
-                    FarmFertilizers.fertilizer_id == Fertilizers.id,
-                    Fertilizers.deleted_at == None
-                    )
-                )
-                .outerjoin(FarmTrees, and_(
-                    FarmTrees.farm_id == Farms.id,
-                    FarmTrees.deleted_at == None
-                )
-                )
-                .outerjoin(Trees, and_(
-                    FarmTrees.tree_id == Trees.id,
-                    Trees.deleted_at == None
-                    )
-                )
-                .outerjoin(Rfids, and_(
-                    Rfids.item_type == rfid_type.FARM,
-                    Rfids.item_id == Farms.id,
-                    Rfids.deleted_at == None
-                    )
-                )
-                .group_by(Farms.id)
-                .group_by(Rfids.id)
+                self._summary_query().filter(Farms.user_id == user_id)
             )
         ).all()
 
         return farms
 
-    async def unique_code(self, db: AsyncSession) -> str:
-        while True:
-            code = random_string_and_number(6)
-            # print(f"{code}\n")
-            db_obj = (
-                (
-                    await db.execute(
-                        select(self.model)
-                        .filter(self.model.code == code)
-                    )
-                )
-                .scalars()
-                .first()
+    async def list_farms(
+        self, db: AsyncSession, request_params, user_id: Optional[uuid.UUID] = None
+    ) -> Any:
+        """
+        Return a page of farms with their summary and the total number of
+        matching farms, only the farms of `user_id` when given
+        """
+        query = self._summary_query()
+        if user_id:
+            query = query.filter(Farms.user_id == user_id)
+        if request_params.search:
+            query = query.filter(
+                search_filter(self.search_columns, request_params.search)
+            )
+        if request_params.name:
+            query = query.filter(
+                search_filter([Farms.name], request_params.name)
             )
-            if not db_obj:
-                return code
+        query = paginate(query, request_params, Farms.id)
+        if request_params.search and not request_params.cursor:
+            # Best matches first, a cursor pages in the plain sort order
+            query = query.order_by(None).order_by(
+                search_rank(self.search_columns, request_params.search).desc(),
+                request_params.order_by,
+                Farms.id,
+            )
+        return await self.fetch_page(db, query, request_params)
+
+    async def refresh_summary(self, db: AsyncSession, farm_ids: Any
+    ) -> None:
+        """
+        Rebuild the `farm_summary` rows of `farm_ids` (a list or a select of
+        ids) with one INSERT ... SELECT ... ON CONFLICT. Pending changes must
+        be flushed first, the caller commits.
+        """
+        fertilizers = (
+            select(func.coalesce(
+                func.jsonb_agg(func.distinct(func.jsonb_build_object(
+                    "id", Fertilizers.id, "name", Fertilizers.name
+                ))),
+                EMPTY_JSON_ARRAY,
+            ))
+            .filter(FarmFertilizers.farm_id == Farms.id)
+            .filter(FarmFertilizers.deleted_at == None)
+            .filter(Fertilizers.id == FarmFertilizers.fertilizer_id)
+            .filter(Fertilizers.deleted_at == None)
+            .scalar_subquery()
+        )
+        trees = (
+            select(func.coalesce(
+                func.jsonb_agg(func.distinct(func.jsonb_build_object(
+                    "id", Trees.id, "name", Trees.name
+                ))),
+                EMPTY_JSON_ARRAY,
+            ))
+            .filter(FarmTrees.farm_id == Farms.id)
+            .filter(FarmTrees.deleted_at == None)
+            .filter(Trees.id == FarmTrees.tree_id)
+            .filter(Trees.deleted_at == None)
+            .scalar_subquery()
+        )
+        rfid = (
+            select(func.jsonb_build_object(
+                "id", Rfids.id,
+                "code", Rfids.code,
+                "item_id", Rfids.item_id,
+                "item_type", Rfids.item_type,
+            ))
+            .filter(Rfids.item_type == rfid_type.FARM)
+            .filter(Rfids.item_id == Farms.id)
+            .filter(Rfids.deleted_at == None)
+            .limit(1)
+            .scalar_subquery()
+        )
+        resources = (
+            select(func.coalesce(
+                func.jsonb_agg(func.jsonb_build_object(
+                    "id", Resource.id,
+                    "name", Resource.name,
+                    "file_size", Resource.file_size,
+                    "file_path", Resource.file_path,
+                    "file_type", Resource.file_type,
+                    "storage", Resource.storage,
+                    "variants", Resource.variants,
+                    "deleted_at", Resource.deleted_at,
+                    "created_at", Resource.created_at,
+                    "updated_at", Resource.updated_at,
+                    "updated_by", Resource.updated_by,
+                )),
+                EMPTY_JSON_ARRAY,
+            ))
+            .filter(ItemResources.item_id == Farms.id)
+            .filter(ItemResources.item_type == resource_type.FARM)
+            .filter(ItemResources.deleted_at == None)
+            .filter(Resource.id == ItemResources.resource_id)
+            .filter(Resource.deleted_at == None)
+            .scalar_subquery()
+        )
+        stmt = insert(FarmSummary).from_select(
+            ["farm_id", "fertilizers", "trees", "rfid", "resources"],
+            select(Farms.id, fertilizers, trees, rfid, resources)
+            .filter(Farms.id.in_(farm_ids)),
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[FarmSummary.farm_id],
+            set_={
+                "fertilizers": stmt.excluded.fertilizers,
+                "trees": stmt.excluded.trees,
+                "rfid": stmt.excluded.rfid,
+                "resources": stmt.excluded.resources,
+                "refreshed_at": func.now(),
+            },
+        )
+        await db.execute(stmt)
+
+    async def refresh_summary_by_fertilizer(self, db: AsyncSession, fertilizer_id: uuid.UUID
+    ) -> None:
+        await self.refresh_summary(
+            db,
+            select(FarmFertilizers.farm_id)
+            .filter(FarmFertilizers.fertilizer_id == fertilizer_id)
+            .filter(FarmFertilizers.deleted_at == None)
+        )
+
+    async def refresh_summary_by_tree(self, db: AsyncSession, tree_id: uuid.UUID
+    ) -> None:
+        await self.refresh_summary(
+            db,
+            select(FarmTrees.farm_id)
+            .filter(FarmTrees.tree_id == tree_id)
+            .filter(FarmTrees.deleted_at == None)
+        )
 
     async def create(self, db: AsyncSession, farm_in: FarmCreate, user_id: uuid.UUID
     ) -> Farms:
         #create farm
         new_farm = Farms(
-            id = uuid.uuid4(),
+            id = uuid7(),
             name = farm_in.name,
             user_id = user_id,
             area = farm_in.area,
@@ -214,81 +225,90 @@ class CRUDFarm(CRUDBase[Farms, FarmCreate, FarmUpdate]):
             updated_by = user_id
         )
         db.add(new_farm)
-        await db.commit()
+        await db.flush()
 
         rfid = Rfids(
-            id = uuid.uuid4(),
+            id = uuid7(),
             item_id = new_farm.id,
             item_type = rfid_type.FARM,
             code = await self.unique_code(db),
             updated_by = user_id
         )
         db.add(rfid)
-
+        await db.flush()
+        await self.refresh_summary(db, [new_farm.id])
+        # One commit, a farm never exists without its RFID and summary row
         await db.commit()
         return new_farm
 
-    async def update_farm_fertilizer(
-        self, db: AsyncSession, farm_id: uuid.UUID, fertilizers: List[uuid.UUID], user_id: uuid.UUID
-    )->Any:
-        farm_fertilizers = (
+    async def _reconcile_farm_items(
+        self, db: AsyncSession, model: Any, item_column: Any, farm_id: uuid.UUID,
+        item_ids: List[uuid.UUID], user_id: uuid.UUID
+    ) -> List[Any]:
+        """
+        Make the live associations of a farm match `item_ids`: soft delete the
+        removed ones with one UPDATE, insert the added ones with one multi-row
+        INSERT and keep unchanged rows as they are. One commit.
+        """
+        current = set(
+            (
+                await db.execute(
+                    select(item_column)
+                    .filter(model.farm_id == farm_id)
+                    .filter(model.deleted_at == None)
+                )
+            ).scalars().all()
+        )
+        wanted = list(dict.fromkeys(item_ids))
+        removed = current.difference(wanted)
+        added = [item_id for item_id in wanted if item_id not in current]
+        if removed:
             await db.execute(
-                select(FarmFertilizers)
-                .filter(FarmFertilizers.farm_id == Farms.id)
-                .filter(Farms.id == farm_id)
-                .filter(FarmFertilizers.deleted_at == None)
+                update(model)
+                .where(model.farm_id == farm_id)
+                .where(model.deleted_at == None)
+                .where(item_column.in_(removed))
+                .values(deleted_at=func.now(), updated_by=user_id)
+                .execution_options(synchronize_session=False)
             )
-        ).scalars().all()
-        for farm_fertilizer in farm_fertilizers:
-            farm_fertilizer.deleted_at = datetime.utcnow()
-            db.add(farm_fertilizer)
+        await self.bulk_insert(
+            db,
+            model,
+            [
+                {
+                    "id": uuid7(),
+                    "farm_id": farm_id,
+                    item_column.key: item_id,
+                    "updated_by": user_id,
+                }
+                for item_id in added
+            ],
+        )
+        if removed or added:
+            await self.refresh_summary(db, [farm_id])
         await db.commit()
 
-        farm_fertilizers: List[FarmFertilizerSchema] = list()
-        for fertilizer in fertilizers:
-            farm_fertilizers.append(
-                FarmFertilizers(
-                    id = uuid.uuid4(),
-                    farm_id = farm_id,
-                    fertilizer_id = fertilizer,
-                    updated_by = user_id,
-                )
+        return (
+            await db.execute(
+                select(model)
+                .filter(model.farm_id == farm_id)
+                .filter(model.deleted_at == None)
             )
-        db.add_all(farm_fertilizers)
-        await db.commit()
+        ).scalars().all()
 
-        return farm_fertilizers
+    async def update_farm_fertilizer(
+        self, db: AsyncSession, farm_id: uuid.UUID, fertilizers: List[uuid.UUID], user_id: uuid.UUID
+    )->Any:
+        return await self._reconcile_farm_items(
+            db, FarmFertilizers, FarmFertilizers.fertilizer_id, farm_id, fertilizers, user_id
+        )
 
     async def update_farm_tree(
         self, db: AsyncSession, farm_id: uuid.UUID, trees: List[uuid.UUID], user_id: uuid.UUID
     )->Any:
-        farm_trees = (
-            await db.execute(
-                select(FarmTrees)
-                .filter(FarmTrees.farm_id == Farms.id)
-                .filter(Farms.id == farm_id)
-                .filter(FarmTrees.deleted_at == None)
-            )
-        ).scalars().all()
-        for farm_tree in farm_trees:
-            farm_tree.deleted_at = datetime.utcnow()
-            db.add(farm_tree)
-        await db.commit()
-
-        farm_trees: List[FarmTreeSchema] = list()
-        for tree in trees:
-            farm_trees.append(
-                FarmTrees(
-                    id = uuid.uuid4(),
-                    farm_id = farm_id,
-                    tree_id = tree,
-                    updated_by = user_id,
-                )
-            )
-        db.add_all(farm_trees)
-        await db.commit()
-
-        return farm_trees
+        return await self._reconcile_farm_items(
+            db, FarmTrees, FarmTrees.tree_id, farm_id, trees, user_id
+        )
 
     async def update_farm(
         self, db: AsyncSession, farm_in: Farms, user_id: uuid.UUID
@@ -304,9 +324,9 @@ class CRUDFarm(CRUDBase[Farms, FarmCreate, FarmUpdate]):
         rfid = (
             await db.execute(
                 select(Rfids)
-                .filter(Rfids.item_id == Farms.id)
+                .filter(Rfids.item_id == farm_id)
                 .filter(Rfids.item_type == rfid_type.FARM)
-                .filter(FarmTrees.deleted_at == None)
+                .filter(Rfids.deleted_at == None)
             )
         ).scalars().first()
         if rfid:
@@ -340,6 +360,8 @@ class CRUDFarm(CRUDBase[Farms, FarmCreate, FarmUpdate]):
             farm_tree.deleted_at = datetime.utcnow()
             db.add(farm_tree)
 
+        await db.flush()
+        await self.refresh_summary(db, [farm_id])
         await db.commit()
         return {"success": True}
 
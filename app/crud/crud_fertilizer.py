@@ -7,8 +7,9 @@ from fastapi.encoders import jsonable_encoder
 from app.models.rfids import Rfids
 from app.core.constants import rfid_type
 
-from app.utils import random_string_and_number
 from app.crud.base import CRUDBase
+from app.utils.ids import uuid7
+from app.crud.search import search_filter, search_rank
 from app.models.fertilizers import Fertilizers
 from app.schemas.fertilizers import (
     FertilizerCreate,
@@ -17,6 +18,8 @@ from app.schemas.fertilizers import (
 
 
 class CRUDFertilizer(CRUDBase[Fertilizers, FertilizerCreate, FertilizerUpdate]):
+    search_columns = (Fertilizers.code, Fertilizers.name, Fertilizers.manufacturer)
+
     async def get(
         self, db: AsyncSession, id: uuid.UUID
     ) -> Optional[Fertilizers]:
@@ -58,23 +61,19 @@ class CRUDFertilizer(CRUDBase[Fertilizers, FertilizerCreate, FertilizerUpdate]):
     def add_filter(self, query, request_params) -> Any:
         if request_params.search:
             query = query.filter(
-                or_(
-                    func.lower(self.model.code).contains(request_params.search),
-                    func.lower(self.model.name).contains(request_params.search),
-                    func.lower(self.model.manufacturer).contains(request_params.search),
-                )
+                search_filter(self.search_columns, request_params.search)
             )
         if request_params.name:
             query = query.filter(
-                func.lower(self.model.name).contains(request_params.name),
+                search_filter([self.model.name], request_params.name),
             )
         if request_params.manufacturer:
             query = query.filter(
-                func.lower(self.model.manufacturer).contains(request_params.manufacturer),
+                search_filter([self.model.manufacturer], request_params.manufacturer),
             )
         if request_params.code:
             query = query.filter(
-                func.lower(self.model.code).contains(request_params.code),
+                search_filter([self.model.code], request_params.code),
             )
         if request_params.updated_by:
             query = query.filter(
@@ -124,6 +123,11 @@ class CRUDFertilizer(CRUDBase[Fertilizers, FertilizerCreate, FertilizerUpdate]):
             )
         ).filter(Fertilizers.deleted_at == None)
         query = self.add_filter(query, request_params)
+        if request_params.search:
+            # Best matches first
+            query = query.order_by(
+                search_rank(self.search_columns, request_params.search).desc()
+            )
         datas = (
             (
                 await db.execute(query)
@@ -132,34 +136,17 @@ class CRUDFertilizer(CRUDBase[Fertilizers, FertilizerCreate, FertilizerUpdate]):
         )
         return datas
 
-    async def unique_code(self, db: AsyncSession) -> str:
-        while True:
-            code = random_string_and_number(6)
-            # print(f"{code}\n")
-            db_obj = (
-                (
-                    await db.execute(
-                        select(self.model)
-                        .filter(self.model.code == code)
-                    )
-                )
-                .scalars()
-                .first()
-            )
-            if not db_obj:
-                return code
-
     async def create(
         self, db: AsyncSession, obj_in: FertilizerCreate, **kwargs
     ) -> Fertilizers:
-        db_obj = self.model(**obj_in.dict(), id=uuid.uuid4()) 
+        db_obj = self.model(**obj_in.dict(), id=uuid7()) 
         db_obj.updated_by = kwargs.get("updated_by")
         db_obj.code = await self.unique_code(db)
         db.add(db_obj)
         await db.commit()
 
         rfid = Rfids(
-            id=uuid.uuid4(),
+            id=uuid7(),
             code = db_obj.code,
             item_id = db_obj.id,
             item_type = rfid_type.FERTILIZER,
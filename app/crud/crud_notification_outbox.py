@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta
+from typing import List, Optional
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio.session import AsyncSession
+from app.crud.base import CRUDBase
+from app.core.constants import notification_status
+from app.models.notification_outbox import NotificationOutbox
+from app.schemas.notifications import NotificationCreate
+from app.utils.ids import uuid7
+
+
+class CRUDNotificationOutbox(CRUDBase[NotificationOutbox, NotificationCreate, NotificationCreate]):
+    def enqueue(
+        self, db: AsyncSession, obj_in: NotificationCreate, **kwargs
+    ) -> Optional[NotificationOutbox]:
+        """
+        Stage a notification in the caller's session. It is written by the
+        caller's next commit, together with the state change it announces.
+        """
+        if not obj_in.topics:
+            return None
+        db_obj = self.model(
+            **obj_in.dict(),
+            id=uuid7(),
+            status=notification_status.PENDING,
+            attempts=0,
+            updated_by=kwargs.get("updated_by"),
+        )
+        db.add(db_obj)
+        return db_obj
+
+    async def claim_batch(
+        self, db: AsyncSession, limit: int
+    ) -> List[NotificationOutbox]:
+        """
+        Lock up to `limit` due notifications. Rows locked by another worker
+        are skipped, so concurrent workers never claim the same row.
+        """
+        notifications = (
+            await db.execute(
+                select(NotificationOutbox)
+                .filter(NotificationOutbox.status == notification_status.PENDING)
+                .filter(NotificationOutbox.next_attempt_at <= func.now())
+                .filter(NotificationOutbox.deleted_at == None)
+                .order_by(NotificationOutbox.next_attempt_at)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+            )
+        ).scalars().all()
+        return notifications
+
+    def mark_sent(self, db: AsyncSession, db_obj: NotificationOutbox) -> NotificationOutbox:
+        db_obj.status = notification_status.SENT
+        db_obj.attempts += 1
+        db_obj.sent_at = datetime.utcnow()
+        db_obj.last_error = None
+        db.add(db_obj)
+        return db_obj
+
+    def mark_failed(
+        self,
+        db: AsyncSession,
+        db_obj: NotificationOutbox,
+        error: str,
+        failed_topics: List[str],
+        max_attempts: int,
+        retry_delay: float,
+    ) -> NotificationOutbox:
+        """
+        Keep only the topics that failed and schedule a retry with
+        exponential backoff, or give up after `max_attempts`.
+        """
+        db_obj.attempts += 1
+        db_obj.last_error = error
+        db_obj.topics = failed_topics
+        if db_obj.attempts >= max_attempts:
+            db_obj.status = notification_status.FAILED
+        else:
+            delay = retry_delay * 2 ** (db_obj.attempts - 1)
+            db_obj.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+        db.add(db_obj)
+        return db_obj
+
+
+notification_outbox = CRUDNotificationOutbox(NotificationOutbox)
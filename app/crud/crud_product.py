@@ -2,14 +2,15 @@ from datetime import datetime
 from typing import Any, List, Optional, Union, Dict
 import uuid
 from fastapi import HTTPException
-from sqlalchemy import select, and_, func, or_
+from sqlalchemy import select, and_, or_, update
 from sqlalchemy.ext.asyncio.session import AsyncSession
 from fastapi.encoders import jsonable_encoder
 from app.core.constants import rfid_type
 from app.models.rfids import Rfids
 from app.models.product_transfer_status import ProductTransferStatus
-from app.utils import random_string_and_number
 from app.crud.base import CRUDBase
+from app.crud.pagination import paginate
+from app.crud.search import search_filter, search_rank
 from app.models.products import Products
 from app.schemas.products import (
     ProductCreate,
@@ -19,9 +20,12 @@ from app.models.users import User
 from app.models.transfer_request import TransferRequests
 from app.models.transfer_status import TransferStatus
 from app.core.constants import product_transfer_status
+from app.utils.ids import uuid7
 
 
 class CRUDProduct(CRUDBase[Products, ProductCreate, ProductUpdate]):
+    search_columns = (Products.name, Products.code)
+
     async def get(
         self, db: AsyncSession, id: uuid.UUID
     ) -> Optional[Products]:
@@ -37,6 +41,26 @@ class CRUDProduct(CRUDBase[Products, ProductCreate, ProductUpdate]):
             .first()
         )
 
+    async def get_for_update(
+        self, db: AsyncSession, id: uuid.UUID
+    ) -> Optional[Products]:
+        """
+        Lock the product row until the end of the transaction
+        """
+        return (
+            (
+                await db.execute(
+                    select(self.model)
+                    .filter(self.model.id == id)
+                    .filter(self.model.deleted_at == None)
+                    .with_for_update()
+                    .execution_options(populate_existing=True)
+                )
+            )
+            .scalars()
+            .first()
+        )
+
     async def get_multi(
         self, db: AsyncSession
     ) -> List[Products]:
@@ -88,23 +112,27 @@ class CRUDProduct(CRUDBase[Products, ProductCreate, ProductUpdate]):
         ).first()
         return product
 
-    async def total_products(self, db: AsyncSession, user_id:uuid.UUID, request_params
+    async def list_products(self, db: AsyncSession, user_id:uuid.UUID, request_params
     )->Any:
-        query = (
-            select(func.count(Products.id))
-            .filter(User.id == Products.updated_by)
-            .outerjoin(ProductTransferStatus, and_(
-                    Products.id == ProductTransferStatus.product_id,
-                    ProductTransferStatus.updated_by == user_id
-                    )
-                )
+        """
+        Return a page of products and the total number of matching products
+        """
+        query = await self.query_products(db, user_id, request_params)
+        query = paginate(query, request_params, Products.id)
+        if request_params.search and not request_params.cursor:
+            # Best matches first, a cursor pages in the plain sort order
+            query = query.order_by(None).order_by(
+                search_rank(self.search_columns, request_params.search).desc(),
+                request_params.order_by,
+                Products.id,
             )
-        query = await self.add_filter_to_product_query(db, request_params, query)
-        total = await db.scalar(query)
-        return total
+        return await self.fetch_page(db, query, request_params)
 
-    async def list_products(self, db: AsyncSession, user_id:uuid.UUID, request_params
+    async def query_products(self, db: AsyncSession, user_id:uuid.UUID, request_params
     )->Any:
+        """
+        Filtered, unpaginated products query shared by the list and the export
+        """
         query = (
             select(
                 Products,
@@ -113,9 +141,9 @@ class CRUDProduct(CRUDBase[Products, ProductCreate, ProductUpdate]):
                 User.name.label("user_name"),
                 User.avatar_id.label("user_avatar")
                 )
-            .offset(request_params.skip)
-            .limit(request_params.limit)
-            .order_by(request_params.order_by)
+            # A join rather than a WHERE predicate, so that an unfiltered
+            # listing can use the estimated count, see CRUDBase.is_unfiltered
+            .join(User, User.id == Products.updated_by)
             .outerjoin(ProductTransferStatus, and_(
                 Products.id == ProductTransferStatus.product_id,
                 ProductTransferStatus.updated_by == user_id
@@ -125,18 +153,13 @@ class CRUDProduct(CRUDBase[Products, ProductCreate, ProductUpdate]):
             .group_by(ProductTransferStatus.id)
             .group_by(User.id)
             )
-        query = await self.add_filter_to_product_query(db, request_params, query)
-        products = (await db.execute(query)).all()
-        return products
+        return await self.add_filter_to_product_query(db, request_params, query)
 
     async def add_filter_to_product_query(self, db: AsyncSession, request_params, query
     )-> Any:
         if request_params.search:
             query = query.filter(
-                or_(
-                    func.lower(Products.name).contains(request_params.search),
-                    func.lower(Products.code).contains(request_params.search),
-                )
+                search_filter(self.search_columns, request_params.search)
             )
         if request_params.user_id:
             user = (
@@ -149,17 +172,13 @@ class CRUDProduct(CRUDBase[Products, ProductCreate, ProductUpdate]):
                 )
             ).first()
             if user.created_by is None:
-                query = query.filter(User.id == Products.updated_by)
                 query = query.filter(
                     User.id == request_params.user_id
                 )
             else:
-                query = query.filter(user.created_by == Products.updated_by)
                 query = query.filter(
                     User.id == user.created_by
                 )
-        else:
-            query = query.filter(User.id == Products.updated_by)
         if request_params.farm_id:
             query = query.filter(
                 Products.farm_id == request_params.farm_id
@@ -197,34 +216,17 @@ class CRUDProduct(CRUDBase[Products, ProductCreate, ProductUpdate]):
             )
         return query
 
-    async def unique_code(self, db: AsyncSession) -> str:
-        while True:
-            code = random_string_and_number(6)
-            # print(f"{code}\n")
-            db_obj = (
-                (
-                    await db.execute(
-                        select(self.model)
-                        .filter(self.model.code == code)
-                    )
-                )
-                .scalars()
-                .first()
-            )
-            if not db_obj:
-                return code
-
     async def create(
         self, db: AsyncSession, obj_in: ProductCreate, **kwargs
     ) -> Products:
-        db_obj = self.model(**obj_in.dict(), id=uuid.uuid4()) 
+        db_obj = self.model(**obj_in.dict(), id=uuid7()) 
         db_obj.updated_by = kwargs.get("updated_by")
         db_obj.code = await self.unique_code(db)
         db.add(db_obj)
         await db.commit()
 
         product_status = ProductTransferStatus(
-            id=uuid.uuid4(),
+            id=uuid7(),
             product_id = db_obj.id,
             transfer_status = product_transfer_status.NORMAL,
             updated_by = kwargs.get("updated_by")
@@ -232,7 +234,7 @@ class CRUDProduct(CRUDBase[Products, ProductCreate, ProductUpdate]):
         db.add(product_status)
 
         rfid = Rfids(
-            id=uuid.uuid4(),
+            id=uuid7(),
             code = db_obj.code,
             item_id = db_obj.id,
             item_type = rfid_type.PRODUCT,
@@ -243,6 +245,29 @@ class CRUDProduct(CRUDBase[Products, ProductCreate, ProductUpdate]):
         await db.commit()
         return db_obj
 
+    async def create_many(
+        self, db: AsyncSession, objs_in: List[ProductCreate], item_type: str = rfid_type.PRODUCT, **kwargs
+    ) -> List[Dict[str, Any]]:
+        """
+        Multi-row insert of products with their RFID and NORMAL transfer
+        status. The caller commits.
+        """
+        products = await super().create_many(db, objs_in, item_type, **kwargs)
+        await self.bulk_insert(
+            db,
+            ProductTransferStatus,
+            [
+                {
+                    "id": uuid7(),
+                    "product_id": product["id"],
+                    "transfer_status": product_transfer_status.NORMAL,
+                    "updated_by": kwargs.get("updated_by"),
+                }
+                for product in products
+            ],
+        )
+        return products
+
     async def get_product_transfer_status(
         self, db: AsyncSession, product_id: uuid.UUID, user_id: uuid.UUID
     )->Any:
@@ -296,62 +321,60 @@ class CRUDProduct(CRUDBase[Products, ProductCreate, ProductUpdate]):
     async def update_product_status(
         self, db: AsyncSession, product_id: uuid.UUID, **kwargs
     )->Any:
+        """
+        Set the product status seen by `updated_by` and by its parent user
+        """
         updated_by = kwargs.get("updated_by")
-        user = (await db.execute(
-                select(User)
+        created_by = (await db.execute(
+                select(User.created_by)
                 .filter(User.id == updated_by)
             )
         ).scalars().first()
-        if user.created_by != None:
-            status = await self.get_product_transfer_status(db, product_id, user.created_by)
+        user_ids = [updated_by]
+        if created_by != None:
+            user_ids.insert(0, created_by)
+
+        statuses = (
+            await db.execute(
+                select(ProductTransferStatus)
+                .filter(ProductTransferStatus.product_id == product_id)
+                .filter(ProductTransferStatus.updated_by.in_(user_ids))
+            )
+        ).scalars().all()
+        statuses_by_user = {}
+        for status in statuses:
+            statuses_by_user.setdefault(status.updated_by, status)
+
+        for user_id in user_ids:
+            status = statuses_by_user.get(user_id)
             if not status:
                 product_transfer_status = ProductTransferStatus(
-                    id = uuid.uuid4(),
+                    id = uuid7(),
                     product_id = product_id,
                     transfer_status = kwargs.get("product_status"),
-                    updated_by = user.created_by
+                    updated_by = user_id
                 )
                 db.add(product_transfer_status)
             else:
                 status.transfer_status = kwargs.get("product_status")
                 db.add(status)
-
-        status = await self.get_product_transfer_status(db, product_id, updated_by)
-        if not status:
-            product_transfer_status = ProductTransferStatus(
-                id = uuid.uuid4(),
-                product_id = product_id,
-                transfer_status = kwargs.get("product_status"),
-                updated_by = updated_by
-            )
-            db.add(product_transfer_status)
-        else:
-            status.transfer_status = kwargs.get("product_status")
-            db.add(status)
-        await db.commit()  
+        await self.commit_or_flush(db, kwargs.get("commit", True))
 
 
     async def update_products_status(
         self, db: AsyncSession, product_id: uuid.UUID, **kwargs
     )->Any:
-        statuses = (
-            await db.execute(
-                select(
-                    ProductTransferStatus
-                )
-                .filter(ProductTransferStatus.product_id == Products.id)
-                .filter(ProductTransferStatus.product_id == product_id)
-                .filter(ProductTransferStatus.transfer_status == kwargs.get("from_status"))
-            )
-        ).scalars().all()
-
-        status_list = []
-        for status in statuses:
-            status.transfer_status = kwargs.get("to_status")
-            status_list.append(status)
-        db.add_all(status_list)
-        await db.commit()
-        return status_list
+        """
+        Move every `from_status` status of the product to `to_status` in one UPDATE
+        """
+        result = await db.execute(
+            update(ProductTransferStatus)
+            .where(ProductTransferStatus.product_id == product_id)
+            .where(ProductTransferStatus.transfer_status == kwargs.get("from_status"))
+            .values(transfer_status=kwargs.get("to_status"))
+        )
+        await self.commit_or_flush(db, kwargs.get("commit", True))
+        return result.rowcount
 
     async def update_product_owner(
         self, db: AsyncSession, db_obj: Products, **kwargs
@@ -368,7 +391,7 @@ class CRUDProduct(CRUDBase[Products, ProductCreate, ProductUpdate]):
         db_obj.updated_at = datetime.utcnow()
         db_obj.updated_by = updated_by
         db.add(db_obj)
-        await db.commit()
+        await self.commit_or_flush(db, kwargs.get("commit", True))
         return db_obj
 
     async def update(
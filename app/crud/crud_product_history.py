@@ -1,11 +1,12 @@
 from datetime import datetime
 from typing import Any, Dict, List, Optional, Union
 import uuid
-from sqlalchemy import select, or_, func, tuple_
+from sqlalchemy import select, or_, tuple_
 from sqlalchemy.orm import aliased
 from sqlalchemy.ext.asyncio.session import AsyncSession
 from fastapi.encoders import jsonable_encoder
 from app.crud.base import CRUDBase
+from app.crud.pagination import paginate
 from app.models.product_history import ProductHistory
 from app.schemas.transfer import (
     ProductHistoryCreate,
@@ -13,6 +14,7 @@ from app.schemas.transfer import (
 )
 from app.models.users import User
 from app.models.products import Products
+from app.utils.ids import uuid7
 
 
 class CRUDProductHistory(CRUDBase[ProductHistory, ProductHistoryCreate, ProductHistoryUpdate]):
@@ -45,23 +47,17 @@ class CRUDProductHistory(CRUDBase[ProductHistory, ProductHistoryCreate, ProductH
         )
         return datas
 
-    async def total_product_histories_by_product(self, db: AsyncSession, request_params
+    async def list_product_histories_by_product(self, db: AsyncSession, request_params
     ) -> Any:
-        buyer = aliased(User, name='buyer')
-        seller = aliased(User, name='seller')
-        query = (
-                select(func.count(ProductHistory.id))
-                .filter(buyer.id == ProductHistory.transfer_to_user_id)
-                .filter(seller.id == ProductHistory.transfer_from_user_id)
-                .filter(Products.id == ProductHistory.product_id)
-                .filter(ProductHistory.deleted_at == None)
-            )
-        query = await self.add_filter_to_list_product_histories(query, request_params)
-        total = await db.scalar(query)
-        return total
+        query = await self.query_product_histories(request_params)
+        query = paginate(query, request_params, ProductHistory.id)
+        return await self.fetch_page(db, query, request_params)
 
-    async def list_product_histories_by_product(self, db: AsyncSession, request_params
+    async def query_product_histories(self, request_params
     ) -> Any:
+        """
+        Filtered, unpaginated history query shared by the list and the export
+        """
         buyer = aliased(User, name='buyer')
         seller = aliased(User, name='seller')
         query = (
@@ -80,17 +76,12 @@ class CRUDProductHistory(CRUDBase[ProductHistory, ProductHistoryCreate, ProductH
                     seller.avatar_id.label('seller_avatar_id'),
                     seller.created_by.label('seller_created_by'),
                 )
-                .offset(request_params.skip)
-                .limit(request_params.limit)
-                .order_by(request_params.order_by)
                 .filter(buyer.id == ProductHistory.transfer_to_user_id)
                 .filter(seller.id == ProductHistory.transfer_from_user_id)
                 .filter(Products.id == ProductHistory.product_id)
                 .filter(ProductHistory.deleted_at == None)
             )
-        query = await self.add_filter_to_list_product_histories(query, request_params)
-        product_history = (await db.execute(query)).all()
-        return product_history
+        return await self.add_filter_to_list_product_histories(query, request_params)
 
     async def add_filter_to_list_product_histories(
         self, query, request_params
@@ -102,11 +93,11 @@ class CRUDProductHistory(CRUDBase[ProductHistory, ProductHistoryCreate, ProductH
         return query
 
     async def create(
-        self, db: AsyncSession, obj_in: ProductHistoryCreate, user_id: uuid.UUID
+        self, db: AsyncSession, obj_in: ProductHistoryCreate, user_id: uuid.UUID, **kwargs
     ) -> ProductHistory:
-        db_obj = self.model(**obj_in.dict(), id=uuid.uuid4(), updated_by = user_id) 
+        db_obj = self.model(**obj_in.dict(), id=uuid7(), updated_by = user_id) 
         db.add(db_obj)
-        await db.commit()
+        await self.commit_or_flush(db, kwargs.get("commit", True))
         return db_obj
 
     async def update(
@@ -1,20 +1,23 @@
 from datetime import datetime
 from typing import Any, Dict, List, Optional, Union
 import uuid
-from sqlalchemy import select, or_, func
+from sqlalchemy import select, or_, update
 from sqlalchemy.ext.asyncio.session import AsyncSession
 from fastapi import HTTPException
 from fastapi.encoders import jsonable_encoder
 from app.crud.base import CRUDBase
+from app.crud.pagination import paginate
 from app.models.transfer_status import TransferStatus
 from app.models.transfer_request import TransferRequests
 from app.core.constants import transfer_status
+from app.core.lookup_cache import lookup_cache
 from app.schemas.transfer import (
     TransferRequestCreate,
     TransferRequestUpdate
 )
 from app.models.users import User
 from app.models.products import Products
+from app.utils.ids import uuid7
 
 
 class CRUDTransferRequest(CRUDBase[TransferRequests, TransferRequestCreate, TransferRequestUpdate]):
@@ -32,6 +35,26 @@ class CRUDTransferRequest(CRUDBase[TransferRequests, TransferRequestCreate, Tran
             .first()
         )
 
+    async def get_for_update(
+        self, db: AsyncSession, id: uuid.UUID
+    ) -> Optional[TransferRequests]:
+        """
+        Reload the request with SELECT ... FOR UPDATE, overwriting the copy
+        already in the session, so its status can be checked under lock.
+        """
+        return (
+            (
+                await db.execute(
+                    select(self.model)
+                    .filter(self.model.id == id)
+                    .with_for_update()
+                    .execution_options(populate_existing=True)
+                )
+            )
+            .scalars()
+            .first()
+        )
+
     async def get_multi(
         self, db: AsyncSession
     ) -> List[TransferRequests]:
@@ -61,31 +84,22 @@ class CRUDTransferRequest(CRUDBase[TransferRequests, TransferRequestCreate, Tran
         ).first()
         return transfer_request
 
-    async def total_transfer_requests_by_product(
-        self, db: AsyncSession, request_params
-    )->Any:
-        query = (
-                select(
-                    func.count(TransferRequests.id)
-                )
-                .filter(Products.id == TransferRequests.product_id)
-                .group_by(TransferRequests.id)
-                .group_by(Products.id)
-            )
-        query = await self.add_filter_to_transfer_request_query(db, request_params, query)
-        total = await db.scalar(query)
-        return total
-
     async def list_transfer_requests_by_product( self, db: AsyncSession, request_params
     )-> Any:
+        query = await self.query_transfer_requests(db, request_params)
+        query = paginate(query, request_params, TransferRequests.id)
+        return await self.fetch_page(db, query, request_params)
+
+    async def query_transfer_requests(self, db: AsyncSession, request_params
+    )-> Any:
+        """
+        Filtered, unpaginated transfer requests query shared by the list and the export
+        """
         query = (
                 select(
                     TransferRequests,
                     TransferStatus
                 )
-                .offset(request_params.skip)
-                .limit(request_params.limit)
-                .order_by(request_params.order_by)
                 .filter(Products.id == TransferRequests.product_id)
                 .outerjoin(TransferStatus, 
                 TransferStatus.id == TransferRequests.transfer_status_id)
@@ -93,9 +107,7 @@ class CRUDTransferRequest(CRUDBase[TransferRequests, TransferRequestCreate, Tran
                 .group_by(Products.id)
                 .group_by(TransferStatus.id)
             )
-        query = await self.add_filter_to_transfer_request_query(db, request_params, query)
-        transfer_request = (await db.execute(query)).all()
-        return transfer_request
+        return await self.add_filter_to_transfer_request_query(db, request_params, query)
 
     async def add_filter_to_transfer_request_query(self, db: AsyncSession, request_params, query
     )-> Any:
@@ -112,12 +124,7 @@ class CRUDTransferRequest(CRUDBase[TransferRequests, TransferRequestCreate, Tran
                 TransferRequests.transfer_to_user_id == request_params.transfer_to_user_id
             )
         if request_params.transfer_status:
-            status = (
-                await db.execute(
-                    select(TransferStatus.id)
-                    .filter(func.lower(TransferStatus.name) == request_params.transfer_status)
-                )
-            ).scalars().first()
+            status = await lookup_cache.get_transfer_status_by_name(request_params.transfer_status)
             if not status:
                 raise HTTPException(
                     status_code=404,
@@ -125,7 +132,7 @@ class CRUDTransferRequest(CRUDBase[TransferRequests, TransferRequestCreate, Tran
                 )
             else:
                 query = query.filter(
-                    TransferRequests.transfer_status_id == status
+                    TransferRequests.transfer_status_id == status.id
                 )
         if request_params.is_deleted == False:
             query = query.filter(
@@ -134,22 +141,19 @@ class CRUDTransferRequest(CRUDBase[TransferRequests, TransferRequestCreate, Tran
         return query
 
     async def get_status(self, db: AsyncSession, status: str
-    )-> Any:
-        status_id = (
-            await db.execute(
-                select(TransferStatus.id)
-                .filter(TransferStatus.name == status)
-            )
-        ).scalars().first()
-        return status_id
+    )-> Optional[uuid.UUID]:
+        transfer_status = await lookup_cache.get_transfer_status_by_name(status)
+        if not transfer_status:
+            return None
+        return transfer_status.id
 
     async def create(
         self, db: AsyncSession, obj_in: TransferRequestCreate, **kwargs
     ) -> TransferRequests:
-        db_obj = self.model(**obj_in.dict(), id=uuid.uuid4(), transfer_status_id=kwargs.get("status_id")) 
+        db_obj = self.model(**obj_in.dict(), id=uuid7(), transfer_status_id=kwargs.get("status_id")) 
         db_obj.updated_by = kwargs.get("updated_by")
         db.add(db_obj)
-        await db.commit()
+        await self.commit_or_flush(db, kwargs.get("commit", True))
         return db_obj
 
     async def check_existed_transfer_request(
@@ -167,22 +171,23 @@ class CRUDTransferRequest(CRUDBase[TransferRequests, TransferRequestCreate, Tran
     async def update_transfer_requests_status_by_product(
         self, db: AsyncSession, product_id: uuid.UUID, status: uuid.UUID, **kwargs
     )-> Any:
+        """
+        Move every pending request of the product, except `exclude_id`, to
+        `status` in one UPDATE. Return their `transfer_to_user_id`.
+        """
         pending_id = await self.get_status(db, transfer_status.PENDING)
-        transfer_requests = (
-            await db.execute(
-                select(TransferRequests)
-                .filter(TransferRequests.product_id == Products.id)
-                .filter(Products.id == product_id)
-                .filter(TransferRequests.transfer_status_id == pending_id)
-            )
-        ).scalars().all()
-        updated_request = []
-        for transfer_request in transfer_requests:
-            transfer_request.transfer_status_id = status
-            transfer_request.updated_by = kwargs.get("updated_by")
-            updated_request.append(transfer_request)
-        db.add_all( updated_request)
-        await db.commit()
+        query = (
+            update(TransferRequests)
+            .where(TransferRequests.product_id == product_id)
+            .where(TransferRequests.transfer_status_id == pending_id)
+            .values(transfer_status_id=status, updated_by=kwargs.get("updated_by"))
+            .returning(TransferRequests.transfer_to_user_id)
+            .execution_options(synchronize_session=False)
+        )
+        if kwargs.get("exclude_id"):
+            query = query.where(TransferRequests.id != kwargs.get("exclude_id"))
+        updated_request = (await db.execute(query)).all()
+        await self.commit_or_flush(db, kwargs.get("commit", True))
         return updated_request
 
     async def update_transfer_request_status(
@@ -191,7 +196,7 @@ class CRUDTransferRequest(CRUDBase[TransferRequests, TransferRequestCreate, Tran
         db_obj.transfer_status_id = status
         db_obj.updated_by = kwargs.get("updated_by")
         db.add(db_obj)
-        await db.commit()
+        await self.commit_or_flush(db, kwargs.get("commit", True))
         return db_obj
 
     async def update(
@@ -5,6 +5,8 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio.session import AsyncSession
 from fastapi.encoders import jsonable_encoder
 from app.crud.base import CRUDBase
+from app.utils.ids import uuid7
+from app.core.lookup_cache import lookup_cache
 from app.models.transfer_status import TransferStatus
 from app.schemas.transfer import (
     TransferStatusCreate,
@@ -44,10 +46,11 @@ class CRUDTransferStatus(CRUDBase[TransferStatus, TransferStatusCreate, Transfer
     async def create(
         self, db: AsyncSession, obj_in: TransferStatusCreate, **kwargs
     ) -> TransferStatus:
-        db_obj = self.model(**obj_in.dict(), id=uuid.uuid4()) 
+        db_obj = self.model(**obj_in.dict(), id=uuid7()) 
         db_obj.updated_by = kwargs.get("updated_by")
         db.add(db_obj)
         await db.commit()
+        lookup_cache.invalidate()
         return db_obj
 
     async def update(
@@ -69,6 +72,7 @@ class CRUDTransferStatus(CRUDBase[TransferStatus, TransferStatusCreate, Transfer
                 setattr(db_obj, field, update_data[field])
         db.add(db_obj)
         await db.commit()
+        lookup_cache.invalidate()
         return db_obj
 
     async def delete(
@@ -78,6 +82,7 @@ class CRUDTransferStatus(CRUDBase[TransferStatus, TransferStatusCreate, Transfer
         db_obj.updated_by = kwargs.get("updated_by")
         db.add(db_obj)
         await db.commit()
+        lookup_cache.invalidate()
         return 
 
 
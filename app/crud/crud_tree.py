@@ -7,8 +7,9 @@ from fastapi.encoders import jsonable_encoder
 from app.core.constants import rfid_type
 from app.models.rfids import Rfids
 
-from app.utils import random_string_and_number
 from app.crud.base import CRUDBase
+from app.utils.ids import uuid7
+from app.crud.search import search_filter, search_rank
 from app.core.constants import resource_type
 from app.models.trees import Trees
 from app.models.resource import Resource
@@ -20,6 +21,8 @@ from app.schemas.trees import (
 
 
 class CRUDTree(CRUDBase[Trees, TreeCreate, TreeUpdate]):
+    search_columns = (Trees.code, Trees.name)
+
     async def get(
         self, db: AsyncSession, id: uuid.UUID
     ) -> Any:
@@ -62,18 +65,15 @@ class CRUDTree(CRUDBase[Trees, TreeCreate, TreeUpdate]):
     def add_filter(self, query, request_params) -> Any:
         if request_params.search:
             query = query.filter(
-                or_(
-                    func.lower(self.model.code).contains(request_params.search),
-                    func.lower(self.model.name).contains(request_params.search),
-                )
+                search_filter(self.search_columns, request_params.search)
             )
         if request_params.name:
             query = query.filter(
-                func.lower(self.model.name).contains(request_params.name),
+                search_filter([self.model.name], request_params.name),
             )
         if request_params.code:
             query = query.filter(
-                func.lower(self.model.code).contains(request_params.code),
+                search_filter([self.model.code], request_params.code),
             )
         if request_params.updated_by:
             query = query.filter(
@@ -109,6 +109,11 @@ class CRUDTree(CRUDBase[Trees, TreeCreate, TreeUpdate]):
         ).filter(Trees.deleted_at == None)
         
         query = self.add_filter(query, request_params)
+        if request_params.search:
+            # Best matches first
+            query = query.order_by(
+                search_rank(self.search_columns, request_params.search).desc()
+            )
         datas = (
             (
                 await db.execute(query)
@@ -117,34 +122,17 @@ class CRUDTree(CRUDBase[Trees, TreeCreate, TreeUpdate]):
         )
         return datas
 
-    async def unique_code(self, db: AsyncSession) -> str:
-        while True:
-            code = random_string_and_number(6)
-            # print(f"{code}\n")
-            db_obj = (
-                (
-                    await db.execute(
-                        select(self.model)
-                        .filter(self.model.code == code)
-                    )
-                )
-                .scalars()
-                .first()
-            )
-            if not db_obj:
-                return code
-
     async def create(
         self, db: AsyncSession, obj_in: TreeCreate, **kwargs
     ) -> Trees:
-        db_obj = self.model(**obj_in.dict(exclude={"resources"}), id=uuid.uuid4()) 
+        db_obj = self.model(**obj_in.dict(exclude={"resources"}), id=uuid7()) 
         db_obj.updated_by = kwargs.get("updated_by")
         db_obj.code = await self.unique_code(db)
         db.add(db_obj)
         await db.commit()
 
         rfid = Rfids(
-            id=uuid.uuid4(),
+            id=uuid7(),
             code = db_obj.code,
             item_id = db_obj.id,
             item_type = rfid_type.TREE,
@@ -1,32 +1,37 @@
 from re import A
-from typing import Any
+from typing import Any, Dict, List, Optional
 import uuid
 from fastapi import HTTPException
 from sqlalchemy.ext.asyncio.session import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import or_, func
+from sqlalchemy import or_
 from app.crud.base import CRUDBase
-from app.deps.users import get_user_manager
+from app.crud.pagination import paginate
+from app.crud.search import search_filter, search_rank
+from app.core.password import password_pool
 from app.models.users import User
 from app.schemas.users import UserCreate, UserUpdate
 from app.models.role import Role
+from app.core.lookup_cache import lookup_cache
+from app.schemas.roles import Role as RoleSchema
+from app.utils.ids import uuid7
 
 
 class CRUDUser(CRUDBase[User,UserCreate,UserUpdate]
 ):
+    search_columns = (User.name, User.address, User.email)
 
     async def create_sub_customers(
         self, db: AsyncSession, my_user_id: uuid.UUID, role_id: uuid.UUID, name: str, email: str, address: str, password: str,
     ) -> User:
-        user_manager = next(get_user_manager())
         new_user = User(
-            id=uuid.uuid4(),
+            id=uuid7(),
             created_by = my_user_id,
             role_id = role_id,
             name = name,
             email = email,
             address = address,
-            hashed_password = user_manager.password_helper.hash(password),
+            hashed_password = await password_pool.hash(password),
         )
         try:
             db.add(new_user)
@@ -38,34 +43,6 @@ class CRUDUser(CRUDBase[User,UserCreate,UserUpdate]
             )
         return new_user
 
-    async def total_user(
-        self, db: AsyncSession, request_params
-    ) -> Any:
-        query = (
-            select(func.count(User.id))
-            .outerjoin(Role, Role.id == User.role_id)
-            .group_by(User.id)
-            .group_by(Role.id)
-        )
-        query = await self.add_filter_to_search_user_query(request_params, query)
-        total = await db.scalar(query)
-        return total
-
-    async def total_sub_user(
-        self, db: AsyncSession, my_user_id: uuid.UUID, request_params
-    ) -> Any:
-        query = (
-            select(func.count(User.id))
-            .outerjoin(Role, Role.id == User.role_id)
-            .filter(User.created_by == my_user_id)
-            .filter(User.is_active == True)
-            .group_by(User.id)
-            .group_by(Role.id)
-        )
-        query = await self.add_filter_to_search_user_query(request_params, query)
-        total = await db.scalar(query)
-        return total
-
     async def search_user(
         self, db: AsyncSession, request_params
     ) -> User:
@@ -84,27 +61,27 @@ class CRUDUser(CRUDBase[User,UserCreate,UserUpdate]
                     User.updated_by,
                     Role
                 )
-                .offset(request_params.skip)
-                .limit(request_params.limit)
-                .order_by(request_params.order_by)
                 .outerjoin(Role, Role.id == User.role_id)
                 .group_by(User.id)
                 .group_by(Role.id)
             )
         query = await self.add_filter_to_search_user_query(request_params, query)
-        users = (await db.execute(query)).all()
-        return users
+        query = paginate(query, request_params, User.id)
+        if request_params.search and not request_params.cursor:
+            # Best matches first, a cursor pages in the plain sort order
+            query = query.order_by(None).order_by(
+                search_rank(self.search_columns, request_params.search).desc(),
+                request_params.order_by,
+                User.id,
+            )
+        return await self.fetch_page(db, query, request_params)
 
     async def add_filter_to_search_user_query(
         self, request_params, query
     )-> User:
         if request_params.search:
             query = query.filter(
-                or_(
-                    func.lower(User.name).contains(request_params.search),
-                    func.lower(User.address).contains(request_params.search),
-                    func.lower(User.email).contains(request_params.search),
-                )
+                search_filter(self.search_columns, request_params.search)
             )
         if request_params.role_id:
             query = query.filter(
@@ -146,9 +123,6 @@ class CRUDUser(CRUDBase[User,UserCreate,UserUpdate]
                         User.updated_by,
                         Role
                     )
-                    .offset(request_params.skip)
-                    .limit(request_params.limit)
-                    .order_by(request_params.order_by)
                     .outerjoin(Role, Role.id == User.role_id)
                     .filter(User.created_by == my_user_id)
                     .filter(User.is_active == True)
@@ -156,15 +130,20 @@ class CRUDUser(CRUDBase[User,UserCreate,UserUpdate]
                     .group_by(Role.id)
             )
         query = await self.add_filter_to_search_user_query(request_params, query)
-        users = (await db.execute(query)).all()
-        return users
+        query = paginate(query, request_params, User.id)
+        if request_params.search and not request_params.cursor:
+            # Best matches first, a cursor pages in the plain sort order
+            query = query.order_by(None).order_by(
+                search_rank(self.search_columns, request_params.search).desc(),
+                request_params.order_by,
+                User.id,
+            )
+        return await self.fetch_page(db, query, request_params)
 
     async def get_role_by_id(
         self, db: AsyncSession, role_id: uuid.UUID
-    ) -> Role:
-        result = await db.execute(select(Role).where(Role.id == role_id))
-        role = result.scalars().first()
-        return role
+    ) -> Optional[RoleSchema]:
+        return await lookup_cache.get_role_by_id(role_id)
 
     async def get_user_detail_by_id(
         self, db: AsyncSession, user_id: uuid.UUID
@@ -224,4 +203,29 @@ class CRUDUser(CRUDBase[User,UserCreate,UserUpdate]
         user = result.first()
         return user
 
+    async def get_users_basic_info_by_ids(
+        self, db: AsyncSession, user_ids: List[uuid.UUID]
+    )->Dict[uuid.UUID, Any]:
+        """
+        Batched version of `get_user_basic_info_by_id`, keyed by user id.
+        None ids are ignored and missing users are left out of the result.
+        """
+        user_ids = {user_id for user_id in user_ids if user_id is not None}
+        if not user_ids:
+            return {}
+        result = await db.execute(
+            select(
+                User.id,
+                User.name,
+                User.email,
+                User.address,
+                User.dob,
+                User.avatar_id,
+                User.created_by
+            )
+            .filter(User.id.in_(user_ids))
+            .filter(User.is_active == True)
+            )
+        return {user.id: user for user in result.all()}
+
 user = CRUDUser(User)
@@ -0,0 +1,97 @@
+import base64
+import json
+import math
+from typing import Any, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, cast, literal, or_
+from sqlalchemy.sql import operators
+
+
+# Label of the sort column when the query does not select it, see paginate
+SORT_KEY = "sort_key"
+
+
+def _sort_key(request_params) -> Any:
+    """
+    Column and direction of the `order_by` built by the request params parsers
+    """
+    order_by = request_params.order_by
+    return order_by.element, order_by.modifier is operators.desc_op
+
+
+def encode_cursor(value: Any, id: Any) -> str:
+    data = json.dumps([value, id], default=str)
+    return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, str]:
+    try:
+        value, id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise HTTPException(400, "Invalid cursor")
+    return value, id
+
+
+def _seek(column, id_column, value, id, descending: bool) -> Any:
+    """
+    Rows after (value, id) in `column, id_column` order. Postgres puts NULLs
+    last in ascending order and first in descending order.
+    """
+    id = cast(literal(id), id_column.type)
+    if descending:
+        if value is None:
+            return or_(
+                and_(column == None, id_column < id),
+                column != None,
+            )
+        value = cast(literal(value), column.type)
+        return or_(column < value, and_(column == value, id_column < id))
+    if value is None:
+        return and_(column == None, id_column > id)
+    value = cast(literal(value), column.type)
+    return or_(
+        column > value,
+        and_(column == value, id_column > id),
+        column == None,
+    )
+
+
+def paginate(query, request_params, id_column) -> Any:
+    """
+    Order by the requested column then `id_column`, and page with the cursor
+    when one is given, else with skip/limit.
+    """
+    column, descending = _sort_key(request_params)
+    if not any(selected.compare(column) for selected in query.selected_columns):
+        # next_cursor reads the sort value of the last row
+        query = query.add_columns(column.label(SORT_KEY))
+    tiebreaker = id_column.desc() if descending else id_column.asc()
+    query = query.order_by(request_params.order_by, tiebreaker).limit(request_params.limit)
+    if request_params.cursor:
+        value, id = decode_cursor(request_params.cursor)
+        return query.filter(_seek(column, id_column, value, id, descending))
+    return query.offset(request_params.skip)
+
+
+def count_pages(total: int, limit: int) -> int:
+    return math.ceil(total / limit) or 1
+
+
+def next_cursor(request_params, rows: List[Any], entity: Optional[str] = None) -> Optional[str]:
+    """
+    Cursor of the page after `rows`, None on the last page.
+    `entity` names the row item holding the sort column, e.g. "Products".
+    """
+    if len(rows) < request_params.limit:
+        return None
+    if getattr(request_params, "search", None) and not request_params.cursor:
+        # Ranked search results are paged with skip/limit
+        return None
+    last = rows[-1]
+    column, _ = _sort_key(request_params)
+    if entity:
+        last = getattr(last, entity)
+    elif not hasattr(last, column.key):
+        return encode_cursor(getattr(last, SORT_KEY), last.id)
+    return encode_cursor(getattr(last, column.key), last.id)
@@ -0,0 +1,41 @@
+import unicodedata
+from typing import Any, Sequence
+
+from sqlalchemy import func, or_
+
+
+def normalize_search(search: str) -> str:
+    """
+    Lowercase and strip Vietnamese diacritics the way `immutable_unaccent`
+    does, so "phan bon" matches "Phân bón".
+    """
+    search = search.lower().replace("đ", "d")
+    search = unicodedata.normalize("NFD", search)
+    return "".join(char for char in search if not unicodedata.combining(char))
+
+
+def normalize(column) -> Any:
+    """
+    The indexed expression, see the `immutable_unaccent` trigram indexes
+    """
+    return func.immutable_unaccent(func.lower(column))
+
+
+def search_filter(columns: Sequence, search: str) -> Any:
+    """
+    Substring match on any of `columns`, served by the trigram indexes
+    """
+    term = normalize_search(search)
+    return or_(
+        *[normalize(column).contains(term, autoescape=True) for column in columns]
+    )
+
+
+def search_rank(columns: Sequence, search: str) -> Any:
+    """
+    Best trigram similarity of `search` to any of `columns`, for ordering
+    """
+    term = normalize_search(search)
+    return func.greatest(
+        *[func.similarity(normalize(column), term) for column in columns]
+    )
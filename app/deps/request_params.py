@@ -18,7 +18,8 @@ from app.schemas.request_params import (
     RequestParamsFertilizer,
     RequestParamsTree,
     RequestParamsProduct,
-    RequestParamsTransferRequest
+    RequestParamsTransferRequest,
+    RequestParamsFarm
 )
 
 
@@ -95,6 +96,14 @@ def parse_filter_search_params_users(model: DeclarativeMeta) -> RequestParamsUse
         skip: Optional[int] = settings.PAGING_DEFAULT_SKIP,
         limit: Optional[int] = settings.PAGING_DEFAULT_LIMIT,
         order_by: Optional[str] = "id DESC",
+        cursor: Optional[str] = Query(
+            None,
+            description="next_cursor of the previous page, used instead of skip",
+        ),
+        count: Literal["exact", "estimated"] = Query(
+            "exact",
+            description="estimated: planner row estimate, for large unfiltered lists",
+        ),
         email: Optional[str] = Query(
             None,
             description="Find user have email equal query value",
@@ -135,6 +144,9 @@ def parse_filter_search_params_users(model: DeclarativeMeta) -> RequestParamsUse
             direction = desc
         else:
             raise HTTPException(400, f"Invalid sort direction {sort_order}")
+        if sort_column == "hashed_password":
+            # The sort column ends up in the rows and the cursor
+            raise HTTPException(400, f"Invalid sort field {sort_column}")
         try:
             order_by = direction(model.__table__.c[sort_column])
         except:
@@ -145,6 +157,8 @@ def parse_filter_search_params_users(model: DeclarativeMeta) -> RequestParamsUse
             skip=skip,
             limit=limit,
             order_by=order_by,
+            cursor=cursor,
+            count=count,
             email=email,
             name=name,
             role_id=role_id,
@@ -226,6 +240,14 @@ def parse_filter_search_params_product(model: DeclarativeMeta) -> RequestParamsP
         skip: Optional[int] = settings.PAGING_DEFAULT_SKIP,
         limit: Optional[int] = settings.PAGING_DEFAULT_LIMIT,
         order_by: Optional[str] = "id DESC",
+        cursor: Optional[str] = Query(
+            None,
+            description="next_cursor of the previous page, used instead of skip",
+        ),
+        count: Literal["exact", "estimated"] = Query(
+            "exact",
+            description="estimated: planner row estimate, for large unfiltered lists",
+        ),
         name: Optional[str] = Query(
             None,
             description="Find product have name equal query value",
@@ -284,6 +306,8 @@ def parse_filter_search_params_product(model: DeclarativeMeta) -> RequestParamsP
             skip=skip,
             limit=limit,
             order_by=order_by,
+            cursor=cursor,
+            count=count,
             name=name,
             farm_id=farm_id,
             user_id=user_id,
@@ -295,11 +319,70 @@ def parse_filter_search_params_product(model: DeclarativeMeta) -> RequestParamsP
 
     return inner
 
+def parse_filter_search_params_farm(model: DeclarativeMeta) -> RequestParamsFarm:
+    def inner(
+        search: Optional[str] = Query(
+            None, description="Search in name, code", example="string"
+        ),
+        skip: Optional[int] = settings.PAGING_DEFAULT_SKIP,
+        limit: Optional[int] = settings.PAGING_DEFAULT_LIMIT,
+        order_by: Optional[str] = "id DESC",
+        cursor: Optional[str] = Query(
+            None,
+            description="next_cursor of the previous page, used instead of skip",
+        ),
+        count: Literal["exact", "estimated"] = Query(
+            "exact",
+            description="estimated: planner row estimate, for large unfiltered lists",
+        ),
+        name: Optional[str] = Query(
+            None,
+            description="Find farm have name contains query value",
+            example="",
+        ),
+    ):
+        if search:
+            search = unquote(search)
+            search = search.lower()
+        if name:
+            name = name.lower()
+        sort_column, sort_order = order_by.split(" ")[0], order_by.split(" ")[1]
+        if sort_order.lower() == "asc":
+            direction = asc
+        elif sort_order.lower() == "desc":
+            direction = desc
+        else:
+            raise HTTPException(400, f"Invalid sort direction {sort_order}")
+        try:
+            order_by = direction(model.__table__.c[sort_column])
+        except:
+            raise HTTPException(400, f"Invalid sort field {sort_column}")
+
+        return RequestParamsFarm(
+            search=search,
+            skip=skip,
+            limit=limit,
+            order_by=order_by,
+            cursor=cursor,
+            count=count,
+            name=name,
+        )
+
+    return inner
+
 def parse_filter_search_params_transfer_request(model: DeclarativeMeta) -> RequestParamsTransferRequest:
     def inner(
         skip: Optional[int] = settings.PAGING_DEFAULT_SKIP,
         limit: Optional[int] = settings.PAGING_DEFAULT_LIMIT,
         order_by: Optional[str] = "id DESC",
+        cursor: Optional[str] = Query(
+            None,
+            description="next_cursor of the previous page, used instead of skip",
+        ),
+        count: Literal["exact", "estimated"] = Query(
+            "exact",
+            description="estimated: planner row estimate, for large unfiltered lists",
+        ),
         product_id: Optional[uuid.UUID] = Query(
             None,
             description="Find user have product_id equal query value",
@@ -342,6 +425,8 @@ def parse_filter_search_params_transfer_request(model: DeclarativeMeta) -> Reque
             skip=skip,
             limit=limit,
             order_by=order_by,
+            cursor=cursor,
+            count=count,
             product_id=product_id,
             transfer_to_user_id=transfer_to_user_id,
             transfer_from_user_id=transfer_from_user_id,
@@ -357,6 +442,14 @@ def parse_filter_search_params_product_history(model: DeclarativeMeta) -> Reques
         skip: Optional[int] = settings.PAGING_DEFAULT_SKIP,
         limit: Optional[int] = settings.PAGING_DEFAULT_LIMIT,
         order_by: Optional[str] = "id DESC",
+        cursor: Optional[str] = Query(
+            None,
+            description="next_cursor of the previous page, used instead of skip",
+        ),
+        count: Literal["exact", "estimated"] = Query(
+            "exact",
+            description="estimated: planner row estimate, for large unfiltered lists",
+        ),
         product_id: Optional[uuid.UUID] = Query(
             None,
             description="Find product history have product_id equal query value",
@@ -379,6 +472,8 @@ def parse_filter_search_params_product_history(model: DeclarativeMeta) -> Reques
             skip=skip,
             limit=limit,
             order_by=order_by,
+            cursor=cursor,
+            count=count,
             product_id=product_id
         )
 
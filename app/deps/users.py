@@ -1,4 +1,4 @@
-from typing import Any, List, Optional, Union
+from typing import Any, Dict, List, Optional, Union
 
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi import Depends, HTTPException, Request, Response, BackgroundTasks
@@ -12,23 +12,24 @@ from fastapi_users.authentication.strategy import (
     Strategy,
     StrategyDestroyNotSupportedError,
 )
-from fastapi_users.manager import BaseUserManager
+from fastapi_users.manager import BaseUserManager, UserAlreadyExists, UserNotExists
 from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase
+from sqlalchemy import update
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
 
 from app.core.config import settings
 from app.core.constants import (
     role_key, 
     # member_status_constants, 
 )
-from app.core.exceptions import UserNotExists
-from app.db import SessionLocal
-from app.deps.db import get_async_session, get_db
+from app.db import async_session_maker
+from app.deps.db import get_async_session
 from app.models.users import User as UserModel
-from app.models.role import Role
+from app.schemas.roles import Role
 from app.schemas.users import User, UserCreate, UserDB, UserGetMe, UserUpdate
-from app.core.firebase import _firebase
+from app.core.firebase import async_firebase
+from app.core.lookup_cache import lookup_cache
+from app.core.password import password_pool
 
 
 bearer_transport = BearerTransport(tokenUrl=f"{settings.API_PATH}/auth/jwt/login")
@@ -60,28 +61,24 @@ class NormalAuthentication(AuthenticationBackend):
         token: str,
         response: Response,
     ) -> Any:
-        # # Remove firebase token
-        # db = SessionLocal()
-        # user_info = db.get(UserModel, user.id)
-        # user_info.firebase_register_token = ""
-        # db.add(user_info)
-        # db.commit()
         # unsubscribe from firebase
         try:
-            topics = get_topics_by_role(user)
+            topics = await get_topics_by_role(user)
             if user.firebase_register_token is not None:
-                _firebase.unsubscribe(
+                await async_firebase.unsubscribe(
                     tokens=[user.firebase_register_token], 
                     topics=topics
                 )
         except Exception as e:
             print("ERROR", str(e))
         # Remove firebase token
-        db = SessionLocal()
-        user_info = db.get(UserModel, user.id)
-        user_info.firebase_register_token = ""
-        db.add(user_info)
-        db.commit()
+        async with async_session_maker() as session:
+            await session.execute(
+                update(UserModel)
+                .where(UserModel.id == user.id)
+                .values(firebase_register_token="")
+            )
+            await session.commit()
 
         return {"success": True}
 
@@ -100,7 +97,7 @@ class MemberLoginAuthentication(AuthenticationBackend):
         user: models.UD,
         response: Response
     ) -> Any:
-        role = get_role_by_user(user)
+        role = await get_role_by_user(user)
         if role is None or role.key not in ALLOW_APP_LOGIN_keyS:
             raise HTTPException(
                 status_code=403,
@@ -108,12 +105,8 @@ class MemberLoginAuthentication(AuthenticationBackend):
         token = await strategy.write_token(user)
         return await self.transport.get_login_response(token, response)
 
-def get_role_by_user(user: User) -> Role:
-    db = SessionLocal()
-    result = db.execute(select(Role).where(Role.id == user.role_id))
-    role = result.scalars().first()
-
-    return role
+async def get_role_by_user(user: User) -> Optional[Role]:
+    return await lookup_cache.get_role_by_id(user.role_id)
 
 member_authentication = MemberLoginAuthentication(
     name="member_app_jwt",
@@ -142,11 +135,7 @@ class UserManager(BaseUserManager[UserCreate, UserDB]):
             )
         # add validate user type here
         if not user.role_id:
-            db = SessionLocal()
-            result = db.execute(
-                select(Role).where(Role.key == user.role_key)
-            )
-            role = result.scalars().first()
+            role = await lookup_cache.get_role_by_key(user.role_key)
 
             if not role:
                 raise HTTPException(
@@ -161,6 +150,43 @@ class UserManager(BaseUserManager[UserCreate, UserDB]):
                     )
                 user.role_id = role.id
 
+    async def create(
+        self, user: UserCreate, safe: bool = False, request: Optional[Request] = None
+    ) -> UserDB:
+        """
+        Same as `BaseUserManager.create`, but hashes the password in the
+        password pool instead of on the event loop.
+        """
+        await self.validate_password(user.password, user)
+
+        existing_user = await self.user_db.get_by_email(user.email)
+        if existing_user is not None:
+            raise UserAlreadyExists()
+
+        hashed_password = await password_pool.hash(user.password)
+        user_dict = (
+            user.create_update_dict() if safe else user.create_update_dict_superuser()
+        )
+        db_user = self.user_db_model(**user_dict, hashed_password=hashed_password)
+
+        created_user = await self.user_db.create(db_user)
+
+        await self.on_after_register(created_user, request)
+
+        return created_user
+
+    async def _update(self, user: UserDB, update_dict: Dict[str, Any]) -> UserDB:
+        """
+        Hash a new password in the password pool, then let
+        `BaseUserManager._update` apply the other fields.
+        """
+        update_dict = dict(update_dict)
+        password = update_dict.pop("password", None)
+        if password is not None:
+            await self.validate_password(password, user)
+            user.hashed_password = await password_pool.hash(password)
+        return await super()._update(user, update_dict)
+
     async def on_after_forgot_password(
         self, user: User, token: str, request: Optional[Request] = None
     ):
@@ -184,10 +210,10 @@ class UserManager(BaseUserManager[UserCreate, UserDB]):
         except UserNotExists:
             # Run the hasher to mitigate timing attack
             # Inspired from Django: https://code.djangoproject.com/ticket/20760
-            self.password_helper.hash(credentials.password)
+            await password_pool.hash(credentials.password)
             return None
 
-        verified, updated_password_hash = self.password_helper.verify_and_update(
+        verified, updated_password_hash = await password_pool.verify_and_update(
             credentials.password, user.hashed_password
         )
         if not verified:
@@ -196,24 +222,14 @@ class UserManager(BaseUserManager[UserCreate, UserDB]):
         if updated_password_hash is not None:
             user.hashed_password = updated_password_hash
             await self.user_db.update(user)
-        db = SessionLocal()
-        db.commit()
         return user
 
-def get_topics_by_role(user: UserModel) -> List[str]:
-    db = SessionLocal()
-    result = db.execute(
-        select(
-            Role.key
-        )
-        .filter(UserModel.role_id == Role.id)
-        .filter(UserModel.id == user.id)
-    )
-    role = result.scalars().first()
+async def get_topics_by_role(user: UserModel) -> List[str]:
+    role = await lookup_cache.get_role_by_id(user.role_id)
 
     result_topics = []
     result_topics.append(f"user_{user.id}")
-    result_topics.append(f"role_{role}")
+    result_topics.append(f"role_{role.key if role else None}")
             
     return result_topics
 
@@ -245,10 +261,9 @@ class AuthorizeCurrentUser:
     async def __call__(
         self, 
         user: UserModel = Depends(current_user),
-        session: AsyncSession = Depends(get_async_session)
     ):
-        role: Role = await session.get(Role, user.role_id)
-        if role.key not in self.roles:
+        role = await lookup_cache.get_role_by_id(user.role_id)
+        if role is None or role.key not in self.roles:
             raise HTTPException(403, "The user doesn't have enough privileges.")
         return user
 
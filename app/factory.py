@@ -107,16 +107,34 @@ def use_route_names_as_operation_ids(app: FastAPI) -> None:
             route_names.add(route.name)
 
 def init_firebase():
+    if settings.FIREBASE_TRANSPORT != "fcm":
+        return
     firebase_cred = firebase_admin.credentials.Certificate(settings.FIREBASE_CERT)
     firebase_admin.initialize_app(firebase_cred)
 
 def init_db_hooks(app: FastAPI) -> None:
     from app.db import database
+    from app.core.lookup_cache import lookup_cache
+    from app.core.password import password_pool
+    from app.core.notification_worker import notification_worker
+    from app.core.firebase import async_firebase
+    from app.core.media_gc import media_gc
+    from app.utils import image_variants
 
     @app.on_event("startup")
     async def startup():
         await database.connect()
+        await lookup_cache.load()
+        if settings.NOTIFICATION_WORKER_ENABLED:
+            notification_worker.start()
+        if settings.MEDIA_GC_ENABLED:
+            media_gc.start()
 
     @app.on_event("shutdown")
     async def shutdown():
-        await database.disconnect()
\ No newline at end of file
+        await notification_worker.stop()
+        media_gc.stop()
+        image_variants.shutdown()
+        await database.disconnect()
+        password_pool.shutdown()
+        async_firebase.shutdown()
\ No newline at end of file
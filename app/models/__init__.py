@@ -16,4 +16,6 @@ from app.models.item_resources import ItemResources
 from app.models.rfids import Rfids
 from app.models.transfer_status import TransferStatus
 from app.models.transfer_request import TransferRequests
-from app.models.product_history import ProductHistory
\ No newline at end of file
+from app.models.product_history import ProductHistory
+from app.models.notification_outbox import NotificationOutbox
+from app.models.farm_summary import FarmSummary
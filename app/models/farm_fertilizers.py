@@ -1,5 +1,6 @@
 from sqlalchemy import Column, ForeignKey, DateTime
 from sqlalchemy.sql.functions import func
+from sqlalchemy import Index, text
 from fastapi_users_db_sqlalchemy import GUID
 
 
@@ -8,6 +9,13 @@ from app.db import Base
 
 class FarmFertilizers(Base):
     __tablename__ = "farm_fertilizers"
+    __table_args__ = (
+        Index(
+            "ix_farm_fertilizers_farm_id",
+            "farm_id",
+            postgresql_where=text("deleted_at IS NULL"),
+        ),
+    )
 
     id = Column(GUID, primary_key=True)
     farm_id = Column(GUID, ForeignKey("farms.id"))
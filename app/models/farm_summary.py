@@ -0,0 +1,23 @@
+from sqlalchemy import Column, ForeignKey, DateTime
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql.functions import func
+from sqlalchemy import text
+from fastapi_users_db_sqlalchemy import GUID
+
+
+from app.db import Base
+
+
+class FarmSummary(Base):
+    """
+    Read model of a farm: its fertilizers, trees, RFID and resources as JSON,
+    kept up to date by `crud.farm.refresh_summary`
+    """
+    __tablename__ = "farm_summary"
+
+    farm_id = Column(GUID, ForeignKey("farms.id", ondelete="CASCADE"), primary_key=True)
+    fertilizers = Column(JSONB, nullable=False, server_default=text("'[]'::jsonb"))
+    trees = Column(JSONB, nullable=False, server_default=text("'[]'::jsonb"))
+    rfid = Column(JSONB)
+    resources = Column(JSONB, nullable=False, server_default=text("'[]'::jsonb"))
+    refreshed_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,6 +1,7 @@
 from sqlalchemy.sql.schema import Column, ForeignKey
 from sqlalchemy.sql.sqltypes import String, DateTime, DECIMAL, Text
 from sqlalchemy import func
+from sqlalchemy import Index, text
 from fastapi_users_db_sqlalchemy import GUID
 
 
@@ -9,6 +10,13 @@ from app.db import Base
 
 class Farms(Base):
     __tablename__ = "farms"
+    __table_args__ = (
+        Index(
+            "ix_farms_user_id",
+            "user_id",
+            postgresql_where=text("deleted_at IS NULL"),
+        ),
+    )
 
     id = Column(GUID, primary_key=True)
     name = Column(String(255))
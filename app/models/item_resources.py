@@ -1,5 +1,6 @@
 from sqlalchemy import Column, ForeignKey, DateTime, String
 from sqlalchemy.sql.functions import func
+from sqlalchemy import Index, text
 from fastapi_users_db_sqlalchemy import GUID
 
 
@@ -8,6 +9,13 @@ from app.db import Base
 
 class ItemResources(Base):
     __tablename__ = "item_resources"
+    __table_args__ = (
+        Index(
+            "ix_item_resources_item",
+            "item_id", "item_type",
+            postgresql_where=text("deleted_at IS NULL"),
+        ),
+    )
 
     id = Column(GUID, primary_key=True)
     item_type = Column(String(255))
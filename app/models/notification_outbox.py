@@ -0,0 +1,37 @@
+from sqlalchemy.sql.schema import Column, ForeignKey, Index
+from sqlalchemy.sql.sqltypes import String, DateTime, Text, Integer
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+from sqlalchemy import func, text
+from fastapi_users_db_sqlalchemy import GUID
+
+
+from app.db import Base
+
+
+class NotificationOutbox(Base):
+    __tablename__ = "notification_outbox"
+    __table_args__ = (
+        Index(
+            "ix_notification_outbox_pending",
+            "next_attempt_at",
+            postgresql_where=text("status = 'pending'"),
+        ),
+    )
+
+    id = Column(GUID, primary_key=True)
+    title = Column(String(255))
+    body = Column(Text)
+    data = Column(JSONB)
+    topics = Column(ARRAY(String(255)))
+    image_url = Column(Text)
+    status = Column(String(255), comment="pending/sent/failed")
+    attempts = Column(Integer, nullable=False, server_default="0")
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_error = Column(Text)
+    sent_at = Column(DateTime(timezone=True))
+    deleted_at = Column(DateTime(timezone=True))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
+    updated_by = Column(GUID, ForeignKey("users.id"))
@@ -1,4 +1,5 @@
 from sqlalchemy.sql.sqltypes import String, DECIMAL
+from sqlalchemy import Index, text
 from fastapi_users_db_sqlalchemy import GUID
 from sqlalchemy import Column, DateTime, ForeignKey
 from sqlalchemy.sql.functions import func
@@ -7,6 +8,13 @@ from app.db import Base
 
 class ProductHistory(Base):
     __tablename__ = "product_history"
+    __table_args__ = (
+        Index(
+            "ix_product_history_product_id",
+            "product_id",
+            postgresql_where=text("deleted_at IS NULL"),
+        ),
+    )
 
     id = Column(GUID, primary_key=True)
     product_id = Column(GUID, ForeignKey("products.id"))
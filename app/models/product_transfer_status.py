@@ -1,6 +1,7 @@
 from sqlalchemy.sql.schema import Column, ForeignKey
 from sqlalchemy.sql.sqltypes import String, DateTime, Text
 from sqlalchemy import func
+from sqlalchemy import Index
 from fastapi_users_db_sqlalchemy import GUID
 
 
@@ -9,6 +10,9 @@ from app.db import Base
 
 class ProductTransferStatus(Base):
     __tablename__ = "product_transfer_status"
+    __table_args__ = (
+        Index("ix_product_transfer_status_product_user", "product_id", "updated_by"),
+    )
 
     id = Column(GUID, primary_key=True)
     product_id = Column(GUID, ForeignKey("products.id"))
@@ -1,4 +1,6 @@
 from sqlalchemy import Column, DateTime, ForeignKey
+from sqlalchemy import Index, text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql.functions import func
 from sqlalchemy.sql.sqltypes import DECIMAL, String, Text
 from fastapi_users_db_sqlalchemy import GUID
@@ -9,12 +11,22 @@ from app.db import Base
 
 class Resource(Base):
     __tablename__ = "resource"
+    __table_args__ = (
+        Index(
+            "ix_resource_checksum",
+            "checksum",
+            postgresql_where=text("deleted_at IS NULL"),
+        ),
+    )
 
     id = Column(GUID, primary_key=True)
     name = Column(Text, unique=True)
     file_size = Column(DECIMAL(10,2))
     file_path = Column(Text)
     file_type = Column(String(255))
+    checksum = Column(String(64), comment="sha256 of the content")
+    storage = Column(String(32), nullable=False, server_default="local", comment="local/s3")
+    variants = Column(JSONB, comment="file path by image variant: thumb/medium/large")
     deleted_at = Column(DateTime(timezone=True))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(
@@ -1,14 +1,25 @@
 from sqlalchemy import Column, DateTime, ForeignKey
 from sqlalchemy.sql.functions import func
 from sqlalchemy.sql.sqltypes import String
+from sqlalchemy import Index, Sequence, text
 from fastapi_users_db_sqlalchemy import GUID
 
 
 from app.db import Base
 
+# Source of the item codes, see app/utils/codes.py
+rfid_code_seq = Sequence("rfid_code_seq", metadata=Base.metadata)
+
 
 class Rfids(Base):
     __tablename__ = "rfids"
+    __table_args__ = (
+        Index(
+            "ix_rfids_item",
+            "item_type", "item_id",
+            postgresql_where=text("deleted_at IS NULL"),
+        ),
+    )
 
     id = Column(GUID, primary_key=True)
     code = Column(String(255), unique=True)
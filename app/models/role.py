@@ -1,4 +1,3 @@
-from uuid import uuid4
 from sqlalchemy.sql.sqltypes import String, Text
 from fastapi_users_db_sqlalchemy import GUID
 from sqlalchemy import Column, DateTime, ForeignKey
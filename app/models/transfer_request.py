@@ -1,4 +1,5 @@
 from sqlalchemy.sql.sqltypes import Text
+from sqlalchemy import Index
 from fastapi_users_db_sqlalchemy import GUID
 from sqlalchemy import Column, DateTime, ForeignKey
 from sqlalchemy.sql.functions import func
@@ -7,6 +8,9 @@ from app.db import Base
 
 class TransferRequests(Base):
     __tablename__ = "transfer_requests"
+    __table_args__ = (
+        Index("ix_transfer_requests_product_status", "product_id", "transfer_status_id"),
+    )
 
     id = Column(GUID, primary_key=True)
     product_id = Column(GUID, ForeignKey("products.id"))
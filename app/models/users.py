@@ -2,12 +2,16 @@ from fastapi_users.db import SQLAlchemyBaseUserTable
 from sqlalchemy import Column, DateTime, ForeignKey
 from sqlalchemy.sql.functions import func
 from sqlalchemy.sql.sqltypes import String, Text
+from sqlalchemy import Index
 from fastapi_users_db_sqlalchemy import GUID
 from app.db import Base
 
 
 class User(Base, SQLAlchemyBaseUserTable):
     __tablename__ = "users"
+    __table_args__ = (
+        Index("ix_users_created_by", "created_by"),
+    )
 
     role_id = Column(GUID, ForeignKey("role.id"))
     name = Column(String(255))
@@ -0,0 +1,20 @@
+from typing import Dict, List, Optional
+import uuid
+from pydantic import BaseModel
+
+
+class NotificationCreate(BaseModel):
+    title: str
+    body: str
+    data: Dict[str, str] = {}
+    topics: List[str]
+    image_url: Optional[str]
+
+
+class Notification(NotificationCreate):
+    id: uuid.UUID
+    status: str
+    attempts: int
+
+    class Config:
+        orm_mode = True
@@ -8,6 +8,8 @@ class RequestParams(BaseModel):
     skip: int
     limit: int
     order_by: Any
+    cursor: Optional[str] = None
+    count: Literal["exact", "estimated"] = "exact"
 
 class RequestParamsUser(RequestParams):
     search: Optional[str]
@@ -43,6 +45,10 @@ class RequestParamsProduct(RequestParams):
     user_id: Optional[uuid.UUID]
     is_deleted: Optional[bool]
 
+class RequestParamsFarm(RequestParams):
+    search: Optional[str]
+    name: Optional[str]
+
 class RequestParamsTransferRequest(RequestParams):
     product_id: Optional[uuid.UUID]
     transfer_to_user_id: Optional[uuid.UUID]
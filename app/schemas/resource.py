@@ -1,5 +1,5 @@
 from decimal import Decimal
-from typing import Optional
+from typing import Dict, Optional
 import uuid
 from pydantic import BaseModel
 
@@ -10,6 +10,8 @@ class Resource(BaseModel):
     file_path: str
     file_type: str
     file_size:  Optional[Decimal]
+    storage: Optional[str] = "local"
+    variants: Optional[Dict[str, str]] = None
     updated_by: uuid.UUID
 
     class Config:
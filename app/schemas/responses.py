@@ -25,6 +25,18 @@ class ResponsePagination(BaseModel):
     page_size: int
     page: int
     data: List[Any]
+    next_cursor: Optional[str] = None
+
+
+class ImportRowError(BaseModel):
+    row: int
+    errors: List[Any]
+
+
+class ResponseImport(BaseModel):
+    imported: int
+    failed: int
+    errors: List[ImportRowError]
 
 
 class ResponseGeneric(GenericModel):
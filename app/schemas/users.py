@@ -2,10 +2,14 @@ from datetime import datetime
 import uuid
 from typing import Optional
 from fastapi_users import models
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
+
+from app.utils.ids import uuid7
 
 
 class BaseUserField(models.BaseUser):
+    # fastapi-users types the id as UUID4, user ids are UUIDv7
+    id: uuid.UUID = Field(default_factory=uuid7)
     role_id: Optional[uuid.UUID] = None
     name: Optional[str] = None
     dob: Optional[datetime] = None
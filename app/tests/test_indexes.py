@@ -0,0 +1,81 @@
+from typing import Any, Awaitable, Callable, List, Tuple
+
+import pytest
+from sqlalchemy import desc, event
+
+from app import crud
+from app.core.constants import resource_type
+from app.db import async_engine, async_session_maker, engine
+from app.models.product_history import ProductHistory
+from app.models.users import User
+from app.schemas.request_params import RequestParamsProductHistory, RequestParamsUser
+from app.utils.ids import uuid7
+
+# CRUD call that should use each index of the 8c41e5b0d2a7 migration
+INDEXED_CALLS = {
+    "ix_item_resources_item": lambda db: crud.product.get_resources_for_items(
+        db, [uuid7(), uuid7()], resource_type.PRODUCT
+    ),
+    "ix_rfids_item": lambda db: crud.tree.get_tree(db, uuid7()),
+    "ix_product_history_product_id": lambda db: crud.product_history.list_product_histories_by_product(
+        db,
+        RequestParamsProductHistory(
+            skip=0, limit=10, order_by=desc(ProductHistory.id), product_id=uuid7()
+        ),
+    ),
+    "ix_farms_user_id": lambda db: crud.farm.get_farms_by_user_id(db, uuid7()),
+    "ix_farm_fertilizers_farm_id": lambda db: crud.farm.refresh_summary(db, [uuid7()]),
+    "ix_farm_trees_farm_id": lambda db: crud.farm.refresh_summary(db, [uuid7()]),
+    "ix_product_transfer_status_product_user": lambda db: crud.product.get_product_transfer_status(
+        db, uuid7(), uuid7()
+    ),
+    "ix_transfer_requests_product_status": lambda db: crud.product.check_pending_product_status(
+        db, uuid7()
+    ),
+    "ix_users_created_by": lambda db: crud.user.get_sub_customers(
+        db, uuid7(), RequestParamsUser(skip=0, limit=10, order_by=desc(User.id))
+    ),
+}
+
+
+async def run_statements(call: Callable[[Any], Awaitable]) -> List[Tuple[str, Any]]:
+    """
+    Run `call` in a rolled back session and return the statements it ran
+    """
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        async with async_session_maker() as session:
+            await call(session)
+            await session.rollback()
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    return statements
+
+
+def explain(statements: List[Tuple[str, Any]]) -> List[str]:
+    """
+    Plans of `statements`, through the sync engine whose driver inlines the
+    parameters, asyncpg can not type them in an EXPLAIN. Sequential scans
+    are disabled so that the plan shows whether an index applies at all,
+    whatever the size of the tables.
+    """
+    plans = []
+    with engine.connect() as connection:
+        connection.exec_driver_sql("SET enable_seqscan = off")
+        for statement, parameters in statements:
+            result = connection.exec_driver_sql(f"EXPLAIN {statement}", parameters)
+            plans.append("\n".join(row[0] for row in result))
+        connection.rollback()
+    return plans
+
+
+@pytest.mark.parametrize("index", list(INDEXED_CALLS))
+def test_crud_queries_use_indexes(client, index):
+    plans = explain(client.portal.call(run_statements, INDEXED_CALLS[index]))
+
+    assert any(index in plan for plan in plans), "\n\n".join(plans)
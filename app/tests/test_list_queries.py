@@ -0,0 +1,112 @@
+from contextlib import contextmanager
+from typing import Iterator, List
+
+import pytest
+from sqlalchemy import event
+
+from app import crud
+from app.core.config import settings
+from app.core.constants import resource_type
+from app.db import async_engine, async_session_maker
+from app.models.farms import Farms
+from app.models.fertilizers import Fertilizers
+from app.models.item_resources import ItemResources
+from app.models.products import Products
+from app.models.resource import Resource
+from app.models.trees import Trees
+from app.utils.ids import uuid7
+
+LIST_URLS = {
+    resource_type.PRODUCT: f"{settings.API_PATH}/products?limit=50",
+    resource_type.TREE: f"{settings.API_PATH}/trees",
+    resource_type.FERTILIZER: f"{settings.API_PATH}/fertilizers",
+    resource_type.FARM: f"{settings.API_PATH}/farm/list?get_all=true&limit=50",
+}
+
+
+@contextmanager
+def count_statements() -> Iterator[List[str]]:
+    """
+    Collect the SQL statements the app runs inside the block
+    """
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+
+async def refresh_summaries(farm_ids):
+    async with async_session_maker() as session:
+        await crud.farm.refresh_summary(session, farm_ids)
+        await session.commit()
+
+
+def add_items(db, client, user, count: int) -> None:
+    """
+    Add `count` farms, trees, fertilizers and products, each with a resource
+    """
+    farms = [
+        Farms(id=uuid7(), name="farm", user_id=user.id, updated_by=user.id)
+        for _ in range(count)
+    ]
+    db.add_all(farms)
+    # No relationships between the models, flush in foreign key order
+    db.flush()
+    for farm in farms:
+        items = {
+            resource_type.FARM: farm,
+            resource_type.TREE: Trees(id=uuid7(), name="tree", updated_by=user.id),
+            resource_type.FERTILIZER: Fertilizers(id=uuid7(), name="fertilizer", updated_by=user.id),
+            resource_type.PRODUCT: Products(
+                id=uuid7(), name="product", farm_id=farm.id, updated_by=user.id
+            ),
+        }
+        resources = {
+            type: Resource(
+                id=uuid7(),
+                name=uuid7().hex,
+                file_path=f"/static/{type}.jpg",
+                file_type="image/jpeg",
+            )
+            for type in items
+        }
+        db.add_all([*items.values(), *resources.values()])
+        db.flush()
+        db.add_all(
+            ItemResources(
+                id=uuid7(), item_type=type, item_id=item.id, resource_id=resources[type].id
+            )
+            for type, item in items.items()
+        )
+    db.commit()
+    client.portal.call(refresh_summaries, [farm.id for farm in farms])
+
+
+def list_items(client, type: str) -> list:
+    response = client.get(LIST_URLS[type])
+    assert response.status_code == 200, response.text
+    body = response.json()
+    return body["data"] if isinstance(body, dict) else body
+
+
+@pytest.mark.parametrize("type", list(LIST_URLS))
+def test_list_statement_count_does_not_grow_with_rows(db, client, admin, type):
+    add_items(db, client, admin, 1)
+    with count_statements() as statements:
+        items = list_items(client, type)
+    few_rows = len(statements)
+    assert all(item["resources"] for item in items)
+
+    add_items(db, client, admin, 10)
+    with count_statements() as statements:
+        items = list_items(client, type)
+
+    assert len(items) >= 11
+    assert all(item["resources"] for item in items)
+    assert len(statements) == few_rows, statements
@@ -0,0 +1,135 @@
+import io
+import os
+import time
+
+import pytest
+import requests
+
+from app.utils.ids import uuid7
+from app.utils.storage import LocalStorage, S3Storage
+
+pytestmark = pytest.mark.anyio
+
+# S3 tests run against the MinIO service of docker-compose.override.yml, or
+# any S3-compatible endpoint, e.g. S3_TEST_ENDPOINT_URL=http://localhost:9100
+S3_TEST_ENDPOINT_URL = os.environ.get("S3_TEST_ENDPOINT_URL")
+# The smallest part size S3 accepts
+MULTIPART_CHUNK_SIZE = 5 * 1024 * 1024
+
+
+async def read(storage, key):
+    return b"".join([content async for content in storage.get(key)])
+
+
+@pytest.fixture
+def local_storage(tmp_path):
+    return LocalStorage(str(tmp_path), "/static")
+
+
+async def test_local_put_get_stat(local_storage):
+    await local_storage.put("blobs/ab/cd/abcd.txt", io.BytesIO(b"content"))
+
+    assert await read(local_storage, "blobs/ab/cd/abcd.txt") == b"content"
+    stored = await local_storage.stat("blobs/ab/cd/abcd.txt")
+    assert stored.key == "blobs/ab/cd/abcd.txt"
+    assert stored.size == 7
+    assert await local_storage.stat("blobs/ab/cd/missing.txt") is None
+    assert local_storage.url_path("blobs/ab/cd/abcd.txt") == "/static/blobs/ab/cd/abcd.txt"
+
+
+async def test_local_list_skips_partial_uploads(local_storage, tmp_path):
+    await local_storage.put("blobs/ab/cd/abcd.txt", io.BytesIO(b"content"))
+    await local_storage.put("other/file.txt", io.BytesIO(b"content"))
+    (tmp_path / "blobs/ab/cd/abcd.txt.0123.tmp").write_bytes(b"cont")
+
+    assert [stored.key for stored in local_storage.list("blobs")] == ["blobs/ab/cd/abcd.txt"]
+    assert list(local_storage.list("missing")) == []
+
+
+async def test_local_touch_and_delete(local_storage):
+    await local_storage.put("blobs/ab/cd/abcd.txt", io.BytesIO(b"content"))
+    os.utime(local_storage.path("blobs/ab/cd/abcd.txt"), (0, 0))
+
+    await local_storage.touch("blobs/ab/cd/abcd.txt")
+    assert (await local_storage.stat("blobs/ab/cd/abcd.txt")).modified > time.time() - 60
+
+    await local_storage.delete("blobs/ab/cd/abcd.txt")
+    assert await local_storage.stat("blobs/ab/cd/abcd.txt") is None
+    # Deleting twice is not an error, the garbage collector may race a delete
+    await local_storage.delete("blobs/ab/cd/abcd.txt")
+
+
+@pytest.fixture
+def s3_storage():
+    if not S3_TEST_ENDPOINT_URL:
+        pytest.skip("S3_TEST_ENDPOINT_URL is not set")
+    storage = S3Storage(
+        bucket=f"agri-test-{uuid7().hex}",
+        endpoint_url=S3_TEST_ENDPOINT_URL,
+        region="us-east-1",
+        access_key_id=os.environ.get("S3_TEST_ACCESS_KEY_ID", "minioadmin"),
+        secret_access_key=os.environ.get("S3_TEST_SECRET_ACCESS_KEY", "minioadmin"),
+        chunk_size=MULTIPART_CHUNK_SIZE,
+    )
+    storage.client.create_bucket(Bucket=storage.bucket)
+    yield storage
+    for stored in storage.list(""):
+        storage.client.delete_object(Bucket=storage.bucket, Key=stored.key)
+    storage.client.delete_bucket(Bucket=storage.bucket)
+
+
+async def test_s3_put_get_stat_delete(s3_storage):
+    await s3_storage.put("blobs/ab/cd/abcd.txt", io.BytesIO(b"content"), "text/plain")
+
+    assert await read(s3_storage, "blobs/ab/cd/abcd.txt") == b"content"
+    stored = await s3_storage.stat("blobs/ab/cd/abcd.txt")
+    assert stored.key == "blobs/ab/cd/abcd.txt"
+    assert stored.size == 7
+    head = s3_storage.client.head_object(Bucket=s3_storage.bucket, Key="blobs/ab/cd/abcd.txt")
+    assert head["ContentType"] == "text/plain"
+
+    await s3_storage.delete("blobs/ab/cd/abcd.txt")
+    assert await s3_storage.stat("blobs/ab/cd/abcd.txt") is None
+
+
+async def test_s3_multipart_upload(s3_storage):
+    content = os.urandom(2 * MULTIPART_CHUNK_SIZE + 1024)
+
+    await s3_storage.put("blobs/ab/cd/large.bin", io.BytesIO(content))
+
+    head = s3_storage.client.head_object(Bucket=s3_storage.bucket, Key="blobs/ab/cd/large.bin")
+    # Multipart ETags end with the number of parts
+    assert head["ETag"].strip('"').endswith("-3")
+    assert await read(s3_storage, "blobs/ab/cd/large.bin") == content
+
+
+async def test_s3_list(s3_storage):
+    for key in ("blobs/ab/cd/abcd.txt", "blobs/ef/01/ef01.txt", "uploads/upload.txt"):
+        await s3_storage.put(key, io.BytesIO(b"content"))
+
+    keys = sorted(stored.key for stored in s3_storage.list("blobs/"))
+    assert keys == ["blobs/ab/cd/abcd.txt", "blobs/ef/01/ef01.txt"]
+
+
+async def test_s3_presigned_upload(s3_storage):
+    upload = await s3_storage.presign("uploads/upload.txt", "text/plain")
+
+    response = requests.put(upload["url"], data=b"content", headers=upload["headers"])
+
+    assert response.status_code == 200
+    assert upload["method"] == "PUT"
+    assert (await s3_storage.stat("uploads/upload.txt")).size == 7
+
+
+async def test_s3_touch_keeps_content_type(s3_storage):
+    await s3_storage.put("blobs/ab/cd/abcd.txt", io.BytesIO(b"content"), "text/plain")
+    before = await s3_storage.stat("blobs/ab/cd/abcd.txt")
+    # LastModified has a one second resolution
+    time.sleep(1.1)
+
+    await s3_storage.touch("blobs/ab/cd/abcd.txt")
+
+    assert (await s3_storage.stat("blobs/ab/cd/abcd.txt")).modified > before.modified
+    head = s3_storage.client.head_object(Bucket=s3_storage.bucket, Key="blobs/ab/cd/abcd.txt")
+    assert head["ContentType"] == "text/plain"
+    assert await read(s3_storage, "blobs/ab/cd/abcd.txt") == b"content"
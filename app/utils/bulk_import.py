@@ -0,0 +1,150 @@
+import asyncio
+import codecs
+import csv
+import json
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Literal, Tuple, Type
+
+from fastapi import UploadFile
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.exc import DataError, DBAPIError, IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+
+ImportFormat = Literal["csv", "ndjson"]
+
+
+def iter_rows(file: UploadFile, format: ImportFormat) -> Iterator[Tuple[int, Any]]:
+    """
+    Yield (line number, row) from an uploaded CSV or NDJSON file without
+    loading it whole. Empty CSV cells become None. A malformed line, an
+    NDJSON line that is not valid JSON or a CSV row with more cells than
+    the header, is yielded as a ValueError.
+    """
+    file.file.seek(0)
+    # SpooledTemporaryFile can not be wrapped in a TextIOWrapper before
+    # Python 3.11, decode its lines instead
+    lines = codecs.iterdecode(file.file, "utf-8-sig")
+    if format == "csv":
+        reader = csv.DictReader(lines)
+        for row in reader:
+            if None in row:
+                # DictReader files the extra cells under the None restkey
+                yield reader.line_num, ValueError(
+                    f"Row has {len(row[None])} more cells than the header"
+                )
+                continue
+            yield reader.line_num, {key: value or None for key, value in row.items()}
+        return
+    for line_num, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_num, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_num, e
+
+
+def _row_error(e: Exception, type: str) -> List[Dict[str, Any]]:
+    return [{"loc": ["__root__"], "msg": str(e), "type": type}]
+
+
+def _db_error(e: DBAPIError) -> List[Dict[str, Any]]:
+    message = str(e.orig)
+    if message.startswith("<class "):
+        # asyncpg errors read "<class '...'>: message"
+        message = message.split(": ", 1)[-1]
+    return [{"loc": ["__root__"], "msg": message, "type": "value_error.db"}]
+
+
+def parse_batch(
+    rows: Iterator[Tuple[int, Any]], schema: Type[BaseModel], size: int
+) -> Tuple[List[Tuple[int, BaseModel]], List[Tuple[int, List[Any]]], bool]:
+    """
+    Read and validate up to `size` valid rows from `rows`. Return the
+    (line number, object) of the valid rows, the (line number, errors) of
+    the invalid rows and whether `rows` is exhausted. Blocking, run it in
+    an executor.
+    """
+    batch: List[Tuple[int, BaseModel]] = []
+    invalid: List[Tuple[int, List[Any]]] = []
+    for line_num, row in rows:
+        if isinstance(row, json.JSONDecodeError):
+            invalid.append((line_num, _row_error(row, "value_error.json")))
+            continue
+        if isinstance(row, ValueError):
+            invalid.append((line_num, _row_error(row, "value_error.csv")))
+            continue
+        try:
+            batch.append((line_num, schema.parse_obj(row)))
+        except ValidationError as e:
+            invalid.append((line_num, e.errors()))
+            continue
+        except (TypeError, ValueError) as e:
+            invalid.append((line_num, _row_error(e, "type_error")))
+            continue
+        if len(batch) >= size:
+            return batch, invalid, False
+    return batch, invalid, True
+
+
+async def _write_batch(
+    db: AsyncSession,
+    batch: List[Tuple[int, BaseModel]],
+    create_many: Callable[[AsyncSession, List[BaseModel]], Awaitable[Any]],
+) -> List[Tuple[int, List[Any]]]:
+    """
+    Write `batch` in a SAVEPOINT. When the database rejects it, e.g. an
+    unknown foreign key, write its rows one by one to find the failing
+    ones. Return the (line number, errors) of the rejected rows.
+    """
+    try:
+        async with db.begin_nested():
+            await create_many(db, [obj_in for _, obj_in in batch])
+        return []
+    except (IntegrityError, DataError) as e:
+        if len(batch) == 1:
+            return [(batch[0][0], _db_error(e))]
+    rejected = []
+    for line_num, obj_in in batch:
+        try:
+            async with db.begin_nested():
+                await create_many(db, [obj_in])
+        except (IntegrityError, DataError) as e:
+            rejected.append((line_num, _db_error(e)))
+    return rejected
+
+
+async def import_rows(
+    db: AsyncSession,
+    file: UploadFile,
+    format: ImportFormat,
+    schema: Type[BaseModel],
+    create_many: Callable[[AsyncSession, List[BaseModel]], Awaitable[Any]],
+) -> Dict[str, Any]:
+    """
+    Validate each row against `schema` and write the valid ones with
+    `create_many` in batches of IMPORT_BATCH_SIZE, in a single transaction.
+    Invalid rows, and rows the database rejects, are skipped and reported
+    with their line number. Reading and validation run in the default
+    executor, off the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    rows = iter_rows(file, format)
+    imported, failed = 0, 0
+    errors: List[Dict[str, Any]] = []
+    done = False
+    while not done:
+        batch, invalid, done = await loop.run_in_executor(
+            None, parse_batch, rows, schema, settings.IMPORT_BATCH_SIZE
+        )
+        if batch:
+            rejected = await _write_batch(db, batch, create_many)
+            imported += len(batch) - len(rejected)
+            invalid = sorted(invalid + rejected, key=lambda error: error[0])
+        failed += len(invalid)
+        for line_num, row_errors in invalid:
+            if len(errors) < settings.IMPORT_MAX_ERRORS:
+                errors.append({"row": line_num, "errors": row_errors})
+    await db.commit()
+    return {"imported": imported, "failed": failed, "errors": errors}
@@ -0,0 +1,66 @@
+ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+BASE = len(ALPHABET)
+
+# Sequence values are scrambled inside blocks of BASE ** BLOCK_WIDTH with
+# n -> (n * MULTIPLIER + OFFSET) mod BLOCK_SIZE. MULTIPLIER is coprime to 36,
+# so the mapping is a bijection and consecutive codes look unrelated.
+BLOCK_WIDTH = 5
+BLOCK_SIZE = BASE ** BLOCK_WIDTH
+MULTIPLIER = 28629151
+OFFSET = 13845997
+INVERSE = pow(MULTIPLIER, -1, BLOCK_SIZE)
+
+
+def _to_base36(value: int, width: int = 0) -> str:
+    digits = []
+    while value:
+        value, digit = divmod(value, BASE)
+        digits.append(ALPHABET[digit])
+    return "".join(reversed(digits)).rjust(width, ALPHABET[0])
+
+
+def _from_base36(value: str) -> int:
+    result = 0
+    for char in value:
+        result = result * BASE + ALPHABET.index(char)
+    return result
+
+
+def check_char(payload: str) -> str:
+    """
+    ISO 7064 MOD 37,36 check character, catches any single wrong character
+    and most swapped pairs
+    """
+    p = BASE
+    for char in payload:
+        p = (p + ALPHABET.index(char)) % BASE or BASE
+        p = (p * 2) % (BASE + 1)
+    return ALPHABET[(BASE + 1 - p) % BASE]
+
+
+def encode_code(number: int) -> str:
+    """
+    Turn a sequence value into a code: 5 scrambled Base36 characters and a
+    check character. Past 36^5 values the block number is prepended, so
+    codes grow instead of wrapping around.
+    """
+    block, position = divmod(number, BLOCK_SIZE)
+    scrambled = (position * MULTIPLIER + OFFSET) % BLOCK_SIZE
+    payload = (_to_base36(block) if block else "") + _to_base36(scrambled, BLOCK_WIDTH)
+    return payload + check_char(payload)
+
+
+def decode_code(code: str) -> int:
+    """
+    Inverse of `encode_code`, raise ValueError on a malformed code
+    """
+    code = code.upper()
+    if len(code) <= BLOCK_WIDTH or any(char not in ALPHABET for char in code):
+        raise ValueError(f"Invalid code {code}")
+    payload, check = code[:-1], code[-1]
+    if check_char(payload) != check:
+        raise ValueError(f"Invalid check character in code {code}")
+    block = _from_base36(payload[:-BLOCK_WIDTH]) if len(payload) > BLOCK_WIDTH else 0
+    scrambled = _from_base36(payload[-BLOCK_WIDTH:])
+    position = ((scrambled - OFFSET) * INVERSE) % BLOCK_SIZE
+    return block * BLOCK_SIZE + position
@@ -0,0 +1,94 @@
+import csv
+import io
+import json
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional, Tuple
+
+from fastapi.responses import StreamingResponse
+
+from app.core.config import settings
+from app.db import Base, async_session_maker
+
+ExportFormat = Literal["csv", "ndjson"]
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _layout(query) -> List[Tuple[str, Optional[List[str]]]]:
+    """
+    Output columns of each selected element: the column keys for an ORM
+    entity, None for a single column. Entities after the first one get
+    their table name as prefix so that `id`, `name`... do not collide.
+    """
+    layout = []
+    first_entity = True
+    for description in query.column_descriptions:
+        expr = description["expr"]
+        if isinstance(expr, type) and issubclass(expr, Base):
+            prefix = "" if first_entity else f"{expr.__tablename__}_"
+            first_entity = False
+            layout.append((prefix, [column.key for column in expr.__table__.columns]))
+        else:
+            layout.append((description["name"], None))
+    return layout
+
+
+def flatten_row(layout, row: Any) -> Dict[str, Any]:
+    data = {}
+    for (name, columns), value in zip(layout, row):
+        if columns is None:
+            data[name] = value
+            continue
+        for column in columns:
+            # Outer joined entities come back as None
+            data[name + column] = getattr(value, column) if value is not None else None
+    return data
+
+
+async def stream_rows(query) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Stream the rows of `query` through a server-side cursor, holding at most
+    EXPORT_YIELD_PER rows in memory. Runs in its own session since the
+    response body is sent after the request handler returned.
+    """
+    layout = _layout(query)
+    async with async_session_maker() as session:
+        result = await session.stream(
+            query.execution_options(yield_per=settings.EXPORT_YIELD_PER)
+        )
+        async for partition in result.partitions():
+            for row in partition:
+                yield flatten_row(layout, row)
+
+
+async def _csv_lines(rows: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = None
+    async for row in rows:
+        if writer is None:
+            writer = csv.DictWriter(buffer, fieldnames=list(row))
+            writer.writeheader()
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+async def _ndjson_lines(rows: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    async for row in rows:
+        yield json.dumps(row, default=str) + "\n"
+
+
+def export_response(query, format: ExportFormat, filename: str) -> StreamingResponse:
+    """
+    Stream every row of `query` as a CSV or NDJSON file download
+    """
+    rows = stream_rows(query)
+    lines = _csv_lines(rows) if format == "csv" else _ndjson_lines(rows)
+    return StreamingResponse(
+        lines,
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{format}"'},
+    )
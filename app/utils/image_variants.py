@@ -0,0 +1,125 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+import io
+from typing import Any, BinaryIO, Dict, List, Optional
+
+from PIL import Image, ImageOps
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.utils.media_store import blob_key
+from app.utils.storage import Storage, media_url
+
+# Longest side in pixels, images are never upscaled
+VARIANT_SIZES = {
+    "thumb": 256,
+    "medium": 1024,
+    "large": 2048,
+}
+CONTENT_TYPES = {
+    "WEBP": "image/webp",
+    "JPEG": "image/jpeg",
+}
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.IMAGE_VARIANT_WORKERS)
+    return _executor
+
+
+def shutdown() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
+
+
+def render_variants(data: bytes, image_format: str, quality: int) -> Dict[str, bytes]:
+    """
+    Encode every VARIANT_SIZES variant of an image. Runs in a worker process.
+    """
+    variants = {}
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        if image_format == "JPEG":
+            image = image.convert("RGB")
+        elif image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+        for name, size in VARIANT_SIZES.items():
+            variant = image.copy()
+            variant.thumbnail((size, size), Image.Resampling.LANCZOS)
+            buffer = io.BytesIO()
+            variant.save(buffer, format=image_format, quality=quality)
+            variants[name] = buffer.getvalue()
+    return variants
+
+
+def variant_key(checksum: str, name: str) -> str:
+    """
+    Variants sit next to their original blob, `blobs/ab/cd/<sha256>_thumb.webp`
+    """
+    return f"{blob_key(checksum)}_{name}.{settings.IMAGE_VARIANT_FORMAT.lower()}"
+
+
+def _read(source: BinaryIO) -> bytes:
+    source.seek(0)
+    return source.read()
+
+
+async def make_variants(
+    source: BinaryIO, checksum: str, storage: Storage
+) -> Optional[Dict[str, str]]:
+    """
+    Store the variants of an uploaded image and return their file paths by
+    variant name, None when the file can not be decoded as an image.
+    Variants of a content already stored are reused.
+    """
+    keys = {name: variant_key(checksum, name) for name in VARIANT_SIZES}
+    paths = {name: storage.url_path(key) for name, key in keys.items()}
+    if await storage.stat(keys["thumb"]) is not None:
+        for key in keys.values():
+            await storage.touch(key)
+        return paths
+
+    loop = asyncio.get_running_loop()
+    data = await loop.run_in_executor(None, _read, source)
+    try:
+        rendered = await loop.run_in_executor(
+            _get_executor(),
+            render_variants,
+            data,
+            settings.IMAGE_VARIANT_FORMAT,
+            settings.IMAGE_VARIANT_QUALITY,
+        )
+    except Exception:
+        logger.warning(f"Could not make image variants of {checksum}", exc_info=True)
+        return None
+    content_type = CONTENT_TYPES.get(settings.IMAGE_VARIANT_FORMAT)
+    # The thumb is written last, its presence means the set is complete
+    for name in sorted(rendered, key=lambda name: name == "thumb"):
+        await storage.put(keys[name], io.BytesIO(rendered[name]), content_type)
+    return paths
+
+
+def _field(resource: Any, name: str) -> Any:
+    if isinstance(resource, dict):
+        return resource.get(name)
+    return getattr(resource, name, None)
+
+
+def thumbnail(resources: List[Any]) -> Optional[str]:
+    """
+    Thumbnail URL of a list of resources (ORM rows or dicts): the thumb
+    variant of the first image, else the first file
+    """
+    for resource in resources or []:
+        variants = _field(resource, "variants")
+        if variants and variants.get("thumb"):
+            return media_url(variants["thumb"], _field(resource, "storage"))
+    if resources:
+        return media_url(_field(resources[0], "file_path"), _field(resources[0], "storage"))
+    return None
@@ -0,0 +1,216 @@
+import asyncio
+import hashlib
+import mimetypes
+import time
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.models.resource import Resource
+from app.utils.storage import STATIC_URL, Storage, get_storage
+
+BLOB_FOLDER = "blobs"
+# Presigned uploads land here until `/resources/confirm` moves them to a blob
+PRESIGNED_FOLDER = "uploads"
+
+# mimetypes picks uncommon extensions (.jpe, .qt...) for some types
+_EXTENSIONS = {
+    "image/jpeg": ".jpg",
+    "image/tiff": ".tif",
+    "video/quicktime": ".mov",
+}
+
+# Bounds the number of files hashed or copied at the same time by this process
+_io_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _get_io_semaphore() -> asyncio.Semaphore:
+    # Created lazily so it binds to the running event loop
+    global _io_semaphore
+    if _io_semaphore is None:
+        _io_semaphore = asyncio.Semaphore(settings.UPLOAD_MAX_CONCURRENCY)
+    return _io_semaphore
+
+
+def extension(content_type: Optional[str]) -> str:
+    """
+    Normalized file extension of a content type, "" when unknown
+    """
+    if not content_type:
+        return ""
+    content_type = content_type.split(";", 1)[0].strip().lower()
+    return _EXTENSIONS.get(content_type) or mimetypes.guess_extension(content_type) or ""
+
+
+def blob_key(checksum: str, ext: str = "") -> str:
+    """
+    Blobs are fanned out by hash prefix, `blobs/ab/cd/abcd....jpg`, so that
+    no directory holds more than a few thousand entries. The extension lets
+    StaticFiles serve the right Content-Type.
+    """
+    return f"{BLOB_FOLDER}/{checksum[:2]}/{checksum[2:4]}/{checksum}{ext}"
+
+
+def blob_checksum(key: str) -> str:
+    """
+    Checksum of a blob or image variant key, `blobs/ab/cd/<sha256>_thumb.webp`
+    """
+    name = key.rsplit("/", 1)[-1]
+    return name.split("_", 1)[0].split(".", 1)[0]
+
+
+def disk_path(file_path: str) -> str:
+    """
+    Location on disk of a local `Resource.file_path`
+    """
+    if file_path.startswith(STATIC_URL + "/"):
+        file_path = file_path[len(STATIC_URL):]
+    return f"{settings.STATIC_PATH}{file_path}"
+
+
+def hash_content(source: BinaryIO) -> Tuple[int, str]:
+    """
+    Byte count and SHA-256 of `source`, read in UPLOAD_CHUNK_SIZE chunks
+    """
+    sha256 = hashlib.sha256()
+    size = 0
+    source.seek(0)
+    while content := source.read(settings.UPLOAD_CHUNK_SIZE):
+        sha256.update(content)
+        size += len(content)
+    return size, sha256.hexdigest()
+
+
+async def put(
+    source: BinaryIO, storage: Storage, content_type: Optional[str] = None
+) -> Tuple[int, str, str]:
+    """
+    Store the content of `source` under its SHA-256 and return its byte
+    count, checksum and key. A content already stored costs a hash and a
+    stat, no write.
+    """
+    loop = asyncio.get_running_loop()
+    async with _get_io_semaphore():
+        size, checksum = await loop.run_in_executor(None, hash_content, source)
+        key = blob_key(checksum, extension(content_type))
+        if await storage.stat(key) is None:
+            await storage.put(key, source, content_type)
+        else:
+            # Refresh the blob so the garbage collector grace period covers
+            # the Resource row about to reference it
+            await storage.touch(key)
+    return size, checksum, key
+
+
+def _candidates(storage: Storage) -> Dict[str, List[str]]:
+    """
+    Keys of the blobs older than MEDIA_GC_GRACE_SECONDS by checksum, image
+    variants (`<sha256>_thumb.webp`...) go with their original
+    """
+    deadline = time.time() - settings.MEDIA_GC_GRACE_SECONDS
+    candidates: Dict[str, List[str]] = {}
+    for stored in storage.list(BLOB_FOLDER + "/"):
+        if stored.modified < deadline:
+            candidates.setdefault(blob_checksum(stored.key), []).append(stored.key)
+    return candidates
+
+
+def _stale_uploads(storage: Storage) -> List[str]:
+    """
+    Keys of the presigned uploads a client could no longer confirm
+    """
+    deadline = (
+        time.time() - settings.MEDIA_GC_GRACE_SECONDS - settings.S3_PRESIGN_EXPIRES_SECONDS
+    )
+    return [
+        stored.key
+        for stored in storage.list(PRESIGNED_FOLDER + "/")
+        if stored.modified < deadline
+    ]
+
+
+async def _touched_since_listing(storage: Storage, keys: List[str]) -> bool:
+    """
+    Whether a deduplicated put touched one of `keys` after `_candidates`
+    listed them, its Resource may not be committed yet
+    """
+    deadline = time.time() - settings.MEDIA_GC_GRACE_SECONDS
+    for key in keys:
+        stored = await storage.stat(key)
+        if stored is not None and stored.modified >= deadline:
+            return True
+    return False
+
+
+async def _collect_uploads(db: AsyncSession, storage: Storage) -> int:
+    """
+    Delete the presigned uploads never confirmed, or registered as is
+    before confirm moved them to a blob and no longer referenced
+    """
+    loop = asyncio.get_running_loop()
+    keys = await loop.run_in_executor(None, _stale_uploads, storage)
+    deleted = 0
+    for start in range(0, len(keys), settings.MEDIA_GC_BATCH_SIZE):
+        batch = {
+            storage.url_path(key): key
+            for key in keys[start:start + settings.MEDIA_GC_BATCH_SIZE]
+        }
+        referenced = set(
+            (
+                await db.execute(
+                    select(Resource.file_path)
+                    .filter(Resource.file_path.in_(list(batch)))
+                    .filter(Resource.storage == storage.name)
+                    .filter(Resource.deleted_at == None)
+                )
+            ).scalars().all()
+        )
+        for file_path, key in batch.items():
+            if file_path not in referenced:
+                await storage.delete(key)
+                deleted += 1
+    return deleted
+
+
+async def collect_garbage(db: AsyncSession, storage: Storage) -> int:
+    """
+    Delete the blobs of `storage` no live Resource references any more,
+    i.e. whose reference count (live `resource` rows with that checksum)
+    is zero, and the stale presigned uploads. Soft deleted resources are
+    not served, see CRUDBase.get_resources. Every blob is stat-ed again
+    right before its deletion. Return the number of deleted
+    objects.
+    """
+    loop = asyncio.get_running_loop()
+    candidates = await loop.run_in_executor(None, _candidates, storage)
+    checksums = list(candidates)
+    deleted = 0
+    for start in range(0, len(checksums), settings.MEDIA_GC_BATCH_SIZE):
+        batch = checksums[start:start + settings.MEDIA_GC_BATCH_SIZE]
+        referenced = set(
+            (
+                await db.execute(
+                    select(Resource.checksum)
+                    .filter(Resource.checksum.in_(batch))
+                    .filter(Resource.storage == storage.name)
+                    .filter(Resource.deleted_at == None)
+                    .group_by(Resource.checksum)
+                    .having(func.count() > 0)
+                )
+            ).scalars().all()
+        )
+        for checksum in batch:
+            if checksum in referenced:
+                continue
+            if await _touched_since_listing(storage, candidates[checksum]):
+                continue
+            for key in candidates[checksum]:
+                await storage.delete(key)
+            deleted += 1
+    deleted += await _collect_uploads(db, storage)
+    if deleted:
+        logger.info(f"Media garbage collector deleted {deleted} {storage.name} blobs")
+    return deleted
@@ -0,0 +1,109 @@
+import asyncio
+import os
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import select
+
+from app import crud
+from app.core.constants import resource_type
+from app.core.logger import logger
+from app.db import async_session_maker
+from app.models.item_resources import ItemResources
+from app.models.resource import Resource
+from app.utils import media_store
+from app.utils.storage import STATIC_URL, get_storage
+
+BATCH_SIZE = 500
+
+
+def _move_to_blob(
+    file_path: str, file_type: Optional[str], checksum: Optional[str]
+) -> Optional[str]:
+    """
+    Move the file of a legacy `Resource.file_path` to its sharded blob and
+    return its key, None when the file is gone and its blob unknown
+    """
+    ext = media_store.extension(file_type) or os.path.splitext(file_path)[1].lower()
+    source = media_store.disk_path(file_path)
+    if not os.path.exists(source):
+        if checksum:
+            key = media_store.blob_key(checksum, ext)
+            if os.path.exists(get_storage("local").path(key)):
+                # Already moved for another resource sharing the content
+                return key
+        return None
+    if not checksum:
+        with open(source, "rb") as file:
+            _, checksum = media_store.hash_content(file)
+    key = media_store.blob_key(checksum, ext)
+    destination = get_storage("local").path(key)
+    if os.path.abspath(destination) == os.path.abspath(source):
+        return key
+    if os.path.exists(destination):
+        os.unlink(source)
+    else:
+        Path(destination).parent.mkdir(parents=True, exist_ok=True)
+        os.replace(source, destination)
+    return key
+
+
+async def shard_media() -> None:
+    """
+    One-shot move of the files uploaded before the sharded layout, from
+    `static/`, `static/media/`, the flat `static/blobs/` or a sharded blob
+    without extension, to `static/blobs/ab/cd/<sha256>.<ext>`.
+    `Resource.file_path` and `checksum`, and the farm summaries embedding
+    them, are rewritten batch by batch, the script can be stopped and run
+    again.
+    """
+    prefix = STATIC_URL + "/" + media_store.BLOB_FOLDER + "/__/__/"
+    moved, missing = 0, 0
+    last_id = None
+    async with async_session_maker() as session:
+        while True:
+            query = (
+                select(Resource)
+                .filter(Resource.file_path != None)
+                .filter(Resource.storage == "local")
+                .filter(~Resource.file_path.like(prefix + "%.%"))
+                .order_by(Resource.id)
+                .limit(BATCH_SIZE)
+            )
+            if last_id is not None:
+                query = query.filter(Resource.id > last_id)
+            resources = (await session.execute(query)).scalars().all()
+            if not resources:
+                break
+            moved_ids = []
+            for resource in resources:
+                key = await asyncio.get_running_loop().run_in_executor(
+                    None, _move_to_blob, resource.file_path, resource.file_type, resource.checksum
+                )
+                if key is None:
+                    logger.warning(f"File of resource {resource.id} not found: {resource.file_path}")
+                    missing += 1
+                    continue
+                resource.checksum = media_store.blob_checksum(key)
+                resource.storage = "local"
+                resource.file_path = get_storage("local").url_path(key)
+                moved_ids.append(resource.id)
+                moved += 1
+            if moved_ids:
+                await session.flush()
+                # Farm summaries embed the file paths
+                await crud.farm.refresh_summary(
+                    session,
+                    select(ItemResources.item_id)
+                    .filter(ItemResources.resource_id.in_(moved_ids))
+                    .filter(ItemResources.item_type == resource_type.FARM)
+                    .filter(ItemResources.deleted_at == None),
+                )
+            await session.commit()
+            last_id = resources[-1].id
+    logger.info(f"Sharded {moved} resources, {missing} files missing")
+
+
+if __name__ == "__main__":
+    # python -m app.utils.shard_media
+    asyncio.run(shard_media())
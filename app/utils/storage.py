@@ -0,0 +1,275 @@
+import asyncio
+import os
+from functools import partial
+from pathlib import Path
+from typing import Any, AsyncIterator, BinaryIO, Dict, Iterator, NamedTuple, Optional
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
+
+from app.core.config import settings
+from app.utils.ids import uuid7
+
+
+# URL prefix the static directory is mounted on, see factory.serve_static_app
+STATIC_URL = "/static"
+
+
+def media_url(file_path: Optional[str], storage: Optional[str] = None) -> Optional[str]:
+    """
+    Absolute URL of a `Resource.file_path` of `storage`, served from
+    `settings.MEDIA_HOSTS[storage]`
+    """
+    if not file_path:
+        return file_path
+    host = str(settings.MEDIA_HOSTS.get(storage or "local") or "")
+    return f"{host.rstrip('/')}{file_path}"
+
+
+class StoredObject(NamedTuple):
+    key: str
+    size: int
+    modified: float  # unix timestamp
+
+
+async def _run(func, *args: Any, **kwargs: Any) -> Any:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, partial(func, *args, **kwargs))
+
+
+class Storage():
+    """
+    Where media bytes live. Keys are relative paths such as
+    `blobs/ab/cd/<sha256>`, `url_path(key)` is what `Resource.file_path`
+    stores and is served from `settings.MEDIA_HOSTS[name]`.
+    """
+
+    name: str = ""
+
+    async def put(self, key: str, source: BinaryIO, content_type: Optional[str] = None) -> None:
+        raise NotImplementedError
+
+    async def get(self, key: str) -> AsyncIterator[bytes]:
+        raise NotImplementedError
+
+    async def stat(self, key: str) -> Optional[StoredObject]:
+        raise NotImplementedError
+
+    async def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    async def presign(self, key: str, content_type: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Let a client upload `key` directly, without going through the API
+        """
+        raise NotImplementedError(f"{self.name} storage does not support presigned uploads")
+
+    def list(self, prefix: str) -> Iterator[StoredObject]:
+        """
+        Blocking iteration over the objects under `prefix`
+        """
+        raise NotImplementedError
+
+    async def touch(self, key: str) -> None:
+        """
+        Mark `key` as just used, see the media garbage collector grace period
+        """
+        raise NotImplementedError
+
+    def url_path(self, key: str) -> str:
+        return f"/{key}"
+
+
+class LocalStorage(Storage):
+    name = "local"
+
+    def __init__(self, root: str, url_prefix: str) -> None:
+        self.root = root
+        self.url_prefix = url_prefix
+
+    def path(self, key: str) -> str:
+        return f"{self.root}/{key}"
+
+    def _put(self, key: str, source: BinaryIO) -> None:
+        destination = self.path(key)
+        Path(destination).parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = f"{destination}.{uuid7().hex}.tmp"
+        source.seek(0)
+        with open(tmp_path, "wb") as out_file:
+            while content := source.read(settings.UPLOAD_CHUNK_SIZE):
+                out_file.write(content)
+        # Atomic, readers never see a partial file
+        os.replace(tmp_path, destination)
+
+    async def put(self, key: str, source: BinaryIO, content_type: Optional[str] = None) -> None:
+        await _run(self._put, key, source)
+
+    async def get(self, key: str) -> AsyncIterator[bytes]:
+        with open(self.path(key), "rb") as file:
+            while content := await _run(file.read, settings.UPLOAD_CHUNK_SIZE):
+                yield content
+
+    def _stat(self, key: str) -> Optional[StoredObject]:
+        try:
+            stat = os.stat(self.path(key))
+        except FileNotFoundError:
+            return None
+        return StoredObject(key, stat.st_size, stat.st_mtime)
+
+    async def stat(self, key: str) -> Optional[StoredObject]:
+        return await _run(self._stat, key)
+
+    async def delete(self, key: str) -> None:
+        await _run(Path(self.path(key)).unlink, missing_ok=True)
+
+    def list(self, prefix: str) -> Iterator[StoredObject]:
+        directory = Path(self.path(prefix))
+        if not directory.exists():
+            return
+        for path in directory.rglob("*"):
+            if path.is_file() and not path.name.endswith(".tmp"):
+                key = path.relative_to(self.root).as_posix()
+                stat = path.stat()
+                yield StoredObject(key, stat.st_size, stat.st_mtime)
+
+    async def touch(self, key: str) -> None:
+        await _run(os.utime, self.path(key))
+
+    def url_path(self, key: str) -> str:
+        return f"{self.url_prefix}/{key}"
+
+
+class S3Storage(Storage):
+    """
+    Amazon S3 or any S3-compatible service (MinIO, R2...). Uploads larger
+    than S3_MULTIPART_CHUNK_SIZE are sent as multipart in chunks of that size.
+    """
+
+    name = "s3"
+
+    def __init__(
+        self,
+        bucket: str,
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+        access_key_id: Optional[str] = None,
+        secret_access_key: Optional[str] = None,
+        chunk_size: int = 8 * 1024 * 1024,
+        presign_expires: int = 3600,
+    ) -> None:
+        self.bucket = bucket
+        self.presign_expires = presign_expires
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=access_key_id,
+            aws_secret_access_key=secret_access_key,
+        )
+        self.transfer_config = TransferConfig(
+            multipart_threshold=chunk_size, multipart_chunksize=chunk_size
+        )
+
+    async def put(self, key: str, source: BinaryIO, content_type: Optional[str] = None) -> None:
+        source.seek(0)
+        await _run(
+            self.client.upload_fileobj,
+            source,
+            self.bucket,
+            key,
+            ExtraArgs={"ContentType": content_type} if content_type else None,
+            Config=self.transfer_config,
+        )
+
+    async def get(self, key: str) -> AsyncIterator[bytes]:
+        response = await _run(self.client.get_object, Bucket=self.bucket, Key=key)
+        body = response["Body"]
+        try:
+            while content := await _run(body.read, settings.UPLOAD_CHUNK_SIZE):
+                yield content
+        finally:
+            body.close()
+
+    async def stat(self, key: str) -> Optional[StoredObject]:
+        try:
+            response = await _run(self.client.head_object, Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return StoredObject(
+            key, response["ContentLength"], response["LastModified"].timestamp()
+        )
+
+    async def delete(self, key: str) -> None:
+        await _run(self.client.delete_object, Bucket=self.bucket, Key=key)
+
+    async def presign(self, key: str, content_type: Optional[str] = None) -> Dict[str, Any]:
+        params = {"Bucket": self.bucket, "Key": key}
+        headers = {}
+        if content_type:
+            params["ContentType"] = content_type
+            headers["Content-Type"] = content_type
+        url = await _run(
+            self.client.generate_presigned_url,
+            "put_object",
+            Params=params,
+            ExpiresIn=self.presign_expires,
+        )
+        return {
+            "method": "PUT",
+            "url": url,
+            "headers": headers,
+            "expires_in": self.presign_expires,
+        }
+
+    async def touch(self, key: str) -> None:
+        # S3 has no utime, copying the object onto itself with its metadata
+        # replaced refreshes LastModified
+        head = await _run(self.client.head_object, Bucket=self.bucket, Key=key)
+        extra = {"ContentType": head["ContentType"]} if head.get("ContentType") else {}
+        await _run(
+            self.client.copy_object,
+            Bucket=self.bucket,
+            Key=key,
+            CopySource={"Bucket": self.bucket, "Key": key},
+            Metadata=head.get("Metadata", {}),
+            MetadataDirective="REPLACE",
+            **extra,
+        )
+
+    def list(self, prefix: str) -> Iterator[StoredObject]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            for item in page.get("Contents", []):
+                yield StoredObject(
+                    item["Key"], item["Size"], item["LastModified"].timestamp()
+                )
+
+
+_storages: Dict[str, Storage] = {}
+
+
+def get_storage(name: Optional[str] = None) -> Storage:
+    """
+    Storage backend `name`, STORAGE_BACKEND by default. Backends are built
+    on first use.
+    """
+    name = name or settings.STORAGE_BACKEND
+    if name not in _storages:
+        if name == "local":
+            _storages[name] = LocalStorage(settings.STATIC_PATH, STATIC_URL)
+        elif name == "s3":
+            _storages[name] = S3Storage(
+                bucket=settings.S3_BUCKET,
+                endpoint_url=settings.S3_ENDPOINT_URL,
+                region=settings.S3_REGION,
+                access_key_id=settings.S3_ACCESS_KEY_ID,
+                secret_access_key=settings.S3_SECRET_ACCESS_KEY,
+                chunk_size=settings.S3_MULTIPART_CHUNK_SIZE,
+                presign_expires=settings.S3_PRESIGN_EXPIRES_SECONDS,
+            )
+        else:
+            raise ValueError(f"Unknown storage backend {name}")
+    return _storages[name]
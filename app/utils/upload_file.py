@@ -1,14 +1,21 @@
+import asyncio
 from datetime import datetime
 import decimal
-from pathlib import Path
-from typing import List, Optional
+from pathlib import PurePosixPath
+import tempfile
+from typing import BinaryIO, List, Optional
 import uuid
-import aiofiles
 from fastapi import UploadFile
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
 from app.models.resource import Resource
+from app.utils import image_variants, media_store
+from app.utils.ids import uuid7
+from app.utils.storage import Storage, get_storage
+
+# Same threshold as starlette uses for UploadFile
+SPOOL_MAX_SIZE = 1024 * 1024
 
 
 def remove_dot_in_path(value: str) -> str:
@@ -17,64 +24,88 @@ def remove_dot_in_path(value: str) -> str:
     return value
 
 
-async def upload_single_file(
-    db: AsyncSession, file: UploadFile, updated_by: uuid.UUID
-) -> Resource:
+def size_in_kb(size: int) -> decimal.Decimal:
     """
-    Upload Single File
+    `Resource.file_size` is stored in KiB with 2 decimals
     """
+    return (decimal.Decimal(size) / 1024).quantize(decimal.Decimal("0.01"))
+
+
+async def _store(
+    source: BinaryIO,
+    file_name: str,
+    content_type: Optional[str],
+    storage: Storage,
+    updated_by: uuid.UUID,
+) -> Resource:
     dt = datetime.now()
     ts = datetime.timestamp(dt)
-    file_name = f"{ts}_{file.filename}"
-    Path(f"{settings.STATIC_PATH}").mkdir(parents=True, exist_ok=True)
-    destination_file_path = f"{settings.STATIC_PATH}/{file_name}"
-    _size: decimal.Decimal = 0
-    async with aiofiles.open(destination_file_path, 'wb') as out_file:
-        while content := await file.read(1024):  # async read file chunk
-            _size += (len(content)/1024)
-            await out_file.write(content)  # async write file chunk
-
-    resource = Resource(
-        id=uuid.uuid4(),
-        name=file_name,
-        file_path=remove_dot_in_path(destination_file_path),
-        file_type=file.content_type,
-        file_size=_size,      # size of original file
+    size, checksum, key = await media_store.put(source, storage, content_type)
+    variants = None
+    if settings.IMAGE_VARIANTS_ENABLED and (content_type or "").startswith("image/"):
+        variants = await image_variants.make_variants(source, checksum, storage)
+
+    return Resource(
+        id=uuid7(),
+        name=f"{ts}_{file_name}",
+        file_path=storage.url_path(key),
+        file_type=content_type,
+        file_size=size_in_kb(size),      # size of original file
+        checksum=checksum,
+        storage=storage.name,
+        variants=variants,
         updated_by=updated_by,
     )
+
+
+async def save_upload(file: UploadFile, updated_by: uuid.UUID) -> Resource:
+    """
+    Store an upload in the content-addressed media store of the
+    STORAGE_BACKEND and build its Resource, without adding it to the
+    session. Identical contents share one blob, each upload still gets its
+    own Resource row.
+    """
+    return await _store(file.file, file.filename, file.content_type, get_storage(), updated_by)
+
+
+async def adopt_upload(
+    storage: Storage, key: str, content_type: Optional[str], updated_by: uuid.UUID
+) -> Resource:
+    """
+    Like `save_upload` for a file a client uploaded to `key` with a
+    presigned URL. The caller deletes `key` once the Resource is committed.
+    """
+    loop = asyncio.get_running_loop()
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as source:
+        async for content in storage.get(key):
+            await loop.run_in_executor(None, source.write, content)
+        return await _store(source, PurePosixPath(key).name, content_type, storage, updated_by)
+
+
+async def upload_single_file(
+    db: AsyncSession, file: UploadFile, updated_by: uuid.UUID
+) -> Resource:
+    """
+    Upload Single File
+    """
+    resource = await save_upload(file, updated_by)
     db.add(resource)
     await db.commit()
     return resource
 
 
 async def upload_multiple_file(
-    db: AsyncSession, files: List[UploadFile], updated_by: uuid.UUID
+    db: AsyncSession, files: List[UploadFile], updated_by: uuid.UUID, commit: bool = True
 ) -> List[Resource]:
     """
-    Upload Multiple File
+    Upload Multiple File, the files are written concurrently
     """
-    resources = []
-    for file in files:
-        dt = datetime.now()
-        ts = datetime.timestamp(dt)
-        file_name = f"{ts}_{file.filename}"
-        Path(f"{settings.STATIC_PATH}").mkdir(parents=True, exist_ok=True)
-        destination_file_path = f"{settings.STATIC_PATH}/{file_name}"
-        _size: decimal.Decimal = 0
-        async with aiofiles.open(destination_file_path, 'wb') as out_file:
-            while content := await file.read(1024):  # async read file chunk
-                _size += (len(content)/1024)
-                await out_file.write(content)  # async write file chunk
-
-        resource = Resource(
-            id=uuid.uuid4(),
-            name=file_name,
-            file_path=remove_dot_in_path(destination_file_path),
-            file_type=file.content_type,
-            file_size=_size,      # size of original file
-            updated_by=updated_by,
-        )
-        resources.append(resource)
+    resources = list(
+        await asyncio.gather(*[save_upload(file, updated_by) for file in files])
+    )
     db.add_all(resources)
-    await db.commit()
+    if commit:
+        await db.commit()
+    else:
+        await db.flush()
     return resources
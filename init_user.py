@@ -1,4 +1,3 @@
-import uuid
 from app.core.config import settings
 from sqlalchemy.future import select
 from app.deps.users import get_user_manager
@@ -14,6 +13,7 @@ from app.core.config import settings
 from app.deps.users import get_user_manager
 from app.models.users import User 
 from app.schemas.users import UserCreate
+from app.utils.ids import uuid7
 
 engine = create_engine(
     settings.DATABASE_URL,
@@ -49,7 +49,7 @@ user = result.scalars().first()
 if not user:
     role = (session.execute(select(Role).where(Role.key == ADMIN))).scalars().first()
     user_in = User(
-        id=uuid.uuid4(),
+        id=uuid7(),
         email = ADMIN_EMAIL,
         hashed_password = user_manager.password_helper.hash(ADMIN_PASSWORD),
         role_id=role.id,
@@ -68,7 +68,7 @@ user = result.scalars().first()
 if not user:
     role = (session.execute(select(Role).where(Role.key == OWNER))).scalars().first()
     user_in = User(
-        id=uuid.uuid4(),
+        id=uuid7(),
         email = OWNER_EMAIL,
         hashed_password = user_manager.password_helper.hash(OWNER_PASSWORD),
         role_id=role.id,
@@ -85,7 +85,7 @@ user = result.scalars().first()
 if not user:
     role = (session.execute(select(Role).where(Role.key == CUSTOMER))).scalars().first()
     user_in = User(
-        id=uuid.uuid4(),
+        id=uuid7(),
         email = CUSTOMER_EMAIL,
         hashed_password = user_manager.password_helper.hash(CUSTOMER_PASSWORD),
         role_id=role.id,
@@ -105,7 +105,7 @@ user = result.scalars().first()
 if not user:
     role = (session.execute(select(Role).where(Role.key == CUSTOMER))).scalars().first()
     user_in = User(
-        id=uuid.uuid4(),
+        id=uuid7(),
         email = SUB_CUSTOMER_EMAIL,
         hashed_password = user_manager.password_helper.hash(SUB_CUSTOMER_PASSWORD),
         role_id=role.id,
@@ -0,0 +1,38 @@
+"""add_resource_checksum_index
+
+Revision ID: 1a6c8d0f2e57
+Revises: 9b3f6e2d4c18
+Create Date: 2026-10-18 15:10:33.581276
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1a6c8d0f2e57'
+down_revision = '9b3f6e2d4c18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY can not run inside a transaction
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_resource_checksum',
+            'resource',
+            ['checksum'],
+            unique=False,
+            postgresql_concurrently=True,
+            postgresql_where=sa.text('deleted_at IS NULL'),
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_resource_checksum',
+            table_name='resource',
+            postgresql_concurrently=True,
+        )
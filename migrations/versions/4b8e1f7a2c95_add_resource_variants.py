@@ -0,0 +1,25 @@
+"""add_resource_variants
+
+Revision ID: 4b8e1f7a2c95
+Revises: 7e2a4c9b1d63
+Create Date: 2026-10-18 17:24:41.503218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '4b8e1f7a2c95'
+down_revision = '7e2a4c9b1d63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('resource', sa.Column('variants', postgresql.JSONB(astext_type=sa.Text()), nullable=True, comment='file path by image variant: thumb/medium/large'))
+
+
+def downgrade() -> None:
+    op.drop_column('resource', 'variants')
@@ -0,0 +1,89 @@
+"""add_farm_summary
+
+Revision ID: 5d7e9a1c3b20
+Revises: e2b8f4c61a09
+Create Date: 2026-10-18 13:05:21.318442
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+import fastapi_users_db_sqlalchemy
+
+
+# revision identifiers, used by Alembic.
+revision = '5d7e9a1c3b20'
+down_revision = 'e2b8f4c61a09'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('farm_summary',
+    sa.Column('farm_id', fastapi_users_db_sqlalchemy.generics.GUID(), nullable=False),
+    sa.Column('fertilizers', postgresql.JSONB(astext_type=sa.Text()), server_default=sa.text("'[]'::jsonb"), nullable=False),
+    sa.Column('trees', postgresql.JSONB(astext_type=sa.Text()), server_default=sa.text("'[]'::jsonb"), nullable=False),
+    sa.Column('rfid', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('resources', postgresql.JSONB(astext_type=sa.Text()), server_default=sa.text("'[]'::jsonb"), nullable=False),
+    sa.Column('refreshed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['farm_id'], ['farms.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('farm_id'),
+    )
+    # Backfill every farm, same projection as crud.farm.refresh_summary
+    op.execute("""
+        INSERT INTO farm_summary (farm_id, fertilizers, trees, rfid, resources)
+        SELECT
+            farms.id,
+            (
+                SELECT coalesce(jsonb_agg(DISTINCT jsonb_build_object('id', fertilizers.id, 'name', fertilizers.name)), '[]'::jsonb)
+                FROM farm_fertilizers
+                JOIN fertilizers ON fertilizers.id = farm_fertilizers.fertilizer_id
+                WHERE farm_fertilizers.farm_id = farms.id
+                    AND farm_fertilizers.deleted_at IS NULL
+                    AND fertilizers.deleted_at IS NULL
+            ),
+            (
+                SELECT coalesce(jsonb_agg(DISTINCT jsonb_build_object('id', trees.id, 'name', trees.name)), '[]'::jsonb)
+                FROM farm_trees
+                JOIN trees ON trees.id = farm_trees.tree_id
+                WHERE farm_trees.farm_id = farms.id
+                    AND farm_trees.deleted_at IS NULL
+                    AND trees.deleted_at IS NULL
+            ),
+            (
+                SELECT jsonb_build_object('id', rfids.id, 'code', rfids.code, 'item_id', rfids.item_id, 'item_type', rfids.item_type)
+                FROM rfids
+                WHERE rfids.item_type = 'farm'
+                    AND rfids.item_id = farms.id
+                    AND rfids.deleted_at IS NULL
+                LIMIT 1
+            ),
+            (
+                SELECT coalesce(jsonb_agg(jsonb_build_object(
+                    'id', resource.id,
+                    'name', resource.name,
+                    'file_size', resource.file_size,
+                    'file_path', resource.file_path,
+                    'file_type', resource.file_type,
+                    -- resource.storage and resource.variants come in later
+                    -- revisions, every resource is local and has no variants yet
+                    'storage', 'local',
+                    'variants', NULL,
+                    'deleted_at', resource.deleted_at,
+                    'created_at', resource.created_at,
+                    'updated_at', resource.updated_at,
+                    'updated_by', resource.updated_by
+                )), '[]'::jsonb)
+                FROM item_resources
+                JOIN resource ON resource.id = item_resources.resource_id
+                WHERE item_resources.item_id = farms.id
+                    AND item_resources.item_type = 'farm'
+                    AND item_resources.deleted_at IS NULL
+                    AND resource.deleted_at IS NULL
+            )
+        FROM farms
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('farm_summary')
@@ -0,0 +1,50 @@
+"""refresh_farm_summary_resources
+
+Revision ID: 6f1d3a8e5b72
+Revises: 4b8e1f7a2c95
+Create Date: 2026-10-18 19:12:40.226817
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6f1d3a8e5b72'
+down_revision = '4b8e1f7a2c95'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Summaries backfilled before the storage/variants keys existed, same
+    # projection as crud.farm.refresh_summary
+    op.execute("""
+        UPDATE farm_summary
+        SET resources = (
+            SELECT coalesce(jsonb_agg(jsonb_build_object(
+                'id', resource.id,
+                'name', resource.name,
+                'file_size', resource.file_size,
+                'file_path', resource.file_path,
+                'file_type', resource.file_type,
+                'storage', resource.storage,
+                'variants', resource.variants,
+                'deleted_at', resource.deleted_at,
+                'created_at', resource.created_at,
+                'updated_at', resource.updated_at,
+                'updated_by', resource.updated_by
+            )), '[]'::jsonb)
+            FROM item_resources
+            JOIN resource ON resource.id = item_resources.resource_id
+            WHERE item_resources.item_id = farm_summary.farm_id
+                AND item_resources.item_type = 'farm'
+                AND item_resources.deleted_at IS NULL
+                AND resource.deleted_at IS NULL
+        ),
+        refreshed_at = now()
+    """)
+
+
+def downgrade() -> None:
+    pass
@@ -0,0 +1,24 @@
+"""add_resource_storage
+
+Revision ID: 7e2a4c9b1d63
+Revises: 1a6c8d0f2e57
+Create Date: 2026-10-18 16:02:57.120394
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7e2a4c9b1d63'
+down_revision = '1a6c8d0f2e57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('resource', sa.Column('storage', sa.String(length=32), server_default='local', nullable=False, comment='local/s3'))
+
+
+def downgrade() -> None:
+    op.drop_column('resource', 'storage')
@@ -0,0 +1,54 @@
+"""add_hot_filter_indexes
+
+Revision ID: 8c41e5b0d2a7
+Revises: 3f0c2a7d9e41
+Create Date: 2026-10-18 10:03:11.274506
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c41e5b0d2a7'
+down_revision = '3f0c2a7d9e41'
+branch_labels = None
+depends_on = None
+
+
+# (name, table, columns, partial on live rows)
+INDEXES = [
+    ('ix_item_resources_item', 'item_resources', ['item_id', 'item_type'], True),
+    ('ix_rfids_item', 'rfids', ['item_type', 'item_id'], True),
+    ('ix_product_history_product_id', 'product_history', ['product_id'], True),
+    ('ix_farms_user_id', 'farms', ['user_id'], True),
+    ('ix_farm_fertilizers_farm_id', 'farm_fertilizers', ['farm_id'], True),
+    ('ix_farm_trees_farm_id', 'farm_trees', ['farm_id'], True),
+    ('ix_product_transfer_status_product_user', 'product_transfer_status', ['product_id', 'updated_by'], False),
+    ('ix_transfer_requests_product_status', 'transfer_requests', ['product_id', 'transfer_status_id'], False),
+    ('ix_users_created_by', 'users', ['created_by'], False),
+]
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY can not run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns, partial in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                unique=False,
+                postgresql_concurrently=True,
+                postgresql_where=sa.text('deleted_at IS NULL') if partial else None,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns, partial in reversed(INDEXES):
+            op.drop_index(
+                name,
+                table_name=table,
+                postgresql_concurrently=True,
+            )
@@ -0,0 +1,24 @@
+"""add_resource_checksum
+
+Revision ID: 9b3f6e2d4c18
+Revises: 5d7e9a1c3b20
+Create Date: 2026-10-18 14:22:48.904117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b3f6e2d4c18'
+down_revision = '5d7e9a1c3b20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('resource', sa.Column('checksum', sa.String(length=64), nullable=True, comment='sha256 of the content'))
+
+
+def downgrade() -> None:
+    op.drop_column('resource', 'checksum')
@@ -0,0 +1,59 @@
+"""add_search_indexes
+
+Revision ID: c7d19a3e6f52
+Revises: 8c41e5b0d2a7
+Create Date: 2026-10-18 10:41:55.918233
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d19a3e6f52'
+down_revision = '8c41e5b0d2a7'
+branch_labels = None
+depends_on = None
+
+
+# (table, column) pairs matched by `search` in app/crud/search.py
+SEARCH_COLUMNS = [
+    ('products', 'name'),
+    ('products', 'code'),
+    ('fertilizers', 'code'),
+    ('fertilizers', 'name'),
+    ('fertilizers', 'manufacturer'),
+    ('trees', 'code'),
+    ('trees', 'name'),
+    ('users', 'name'),
+    ('users', 'address'),
+    ('users', 'email'),
+]
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.execute('CREATE EXTENSION IF NOT EXISTS unaccent')
+    # unaccent() is only STABLE, an index expression needs an IMMUTABLE
+    # function, so pin the dictionary and wrap it
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION immutable_unaccent(text)
+        RETURNS text AS
+        $$ SELECT public.unaccent('public.unaccent', $1) $$
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+        """
+    )
+    # CREATE INDEX CONCURRENTLY can not run inside a transaction
+    with op.get_context().autocommit_block():
+        for table, column in SEARCH_COLUMNS:
+            op.execute(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{table}_{column}_trgm '
+                f'ON {table} USING gin (immutable_unaccent(lower({column})) gin_trgm_ops)'
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for table, column in reversed(SEARCH_COLUMNS):
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS ix_{table}_{column}_trgm')
+    op.execute('DROP FUNCTION IF EXISTS immutable_unaccent(text)')
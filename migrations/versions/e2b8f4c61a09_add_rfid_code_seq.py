@@ -0,0 +1,24 @@
+"""add_rfid_code_seq
+
+Revision ID: e2b8f4c61a09
+Revises: c7d19a3e6f52
+Create Date: 2026-10-18 11:37:02.660184
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b8f4c61a09'
+down_revision = 'c7d19a3e6f52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(sa.schema.CreateSequence(sa.Sequence('rfid_code_seq')))
+
+
+def downgrade() -> None:
+    op.execute(sa.schema.DropSequence(sa.Sequence('rfid_code_seq')))